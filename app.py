@@ -2,6 +2,7 @@ from flask import Flask
 import os
 from dotenv import load_dotenv
 from database import db, migrate, login_manager, mail
+from metrics import TimedQueuePool
 
 load_dotenv()
 
@@ -12,17 +13,53 @@ def create_app():
     app.config['SECRET_KEY'] = os.environ.get('SECRET_KEY', 'dev-secret-key-change-in-production')
     app.config['SQLALCHEMY_DATABASE_URI'] = os.environ.get('DATABASE_URL', 'sqlite:///crm.db')
     app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+    # Pool que mede a espera por conexão (/metrics); SQLite em memória mantém o pool padrão
+    if app.config['SQLALCHEMY_DATABASE_URI'] not in ('sqlite://', 'sqlite:///:memory:'):
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {'poolclass': TimedQueuePool}
+    # Réplica somente leitura opcional para análises e relatórios
+    if os.environ.get('DATABASE_READ_URL'):
+        app.config['SQLALCHEMY_BINDS'] = {'replica': os.environ['DATABASE_READ_URL']}
+    app.config['DATABASE_READ_MAX_LAG'] = float(os.environ.get('DATABASE_READ_MAX_LAG', 30))  # segundos
+    app.config['DATABASE_READ_CHECK_INTERVAL'] = float(os.environ.get('DATABASE_READ_CHECK_INTERVAL', 5))
+    app.config['DASHBOARD_CACHE_TTL'] = int(os.environ.get('DASHBOARD_CACHE_TTL', 60))
+    app.config['PAGINATION_MODE'] = os.environ.get('PAGINATION_MODE', 'offset')  # offset ou keyset
+    app.config['QUERY_BUDGET_MODE'] = os.environ.get('QUERY_BUDGET_MODE', 'warn')  # off, warn ou strict
+    app.config['PROFILER_ENABLED'] = os.environ.get('PROFILER_ENABLED', 'false').lower() == 'true'  # Server-Timing e /debug/perf
+    app.config['PROFILER_HISTORY'] = int(os.environ.get('PROFILER_HISTORY', 50))  # requisições guardadas por rota
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')  # Bearer exigido em /metrics; sem ele, só em debug
+    app.config['TASK_TEMPLATES_FILE'] = os.environ.get('TASK_TEMPLATES_FILE')
+    app.config['TASK_TEMPLATES_CHECK_INTERVAL'] = int(os.environ.get('TASK_TEMPLATES_CHECK_INTERVAL', 30))
+    app.config['LEAD_DEDUP_SIMILARITY'] = float(os.environ.get('LEAD_DEDUP_SIMILARITY', 0))  # 0 = só títulos equivalentes
+    # Fila de jobs (automações do workflow): thread no próprio app e/ou processos `flask run-jobs`
+    app.config['JOBS_IN_PROCESS'] = os.environ.get('JOBS_IN_PROCESS', 'true').lower() == 'true'
+    app.config['JOBS_BATCH_SIZE'] = int(os.environ.get('JOBS_BATCH_SIZE', 20))
+    app.config['JOBS_MAX_ATTEMPTS'] = int(os.environ.get('JOBS_MAX_ATTEMPTS', 5))
+    app.config['JOBS_RETRY_DELAY'] = int(os.environ.get('JOBS_RETRY_DELAY', 30))  # segundos, dobra a cada falha
+    app.config['JOBS_MAX_RETRY_DELAY'] = int(os.environ.get('JOBS_MAX_RETRY_DELAY', 3600))
+    app.config['JOBS_LOCK_TIMEOUT'] = int(os.environ.get('JOBS_LOCK_TIMEOUT', 300))
+    app.config['JOBS_POLL_INTERVAL'] = float(os.environ.get('JOBS_POLL_INTERVAL', 5))
+    app.config['JOBS_RETENTION_DAYS'] = int(os.environ.get('JOBS_RETENTION_DAYS', 7))  # concluídos/falhos; 0 = manter
     
     # Mail configuration
     app.config['MAIL_SERVER'] = os.environ.get('MAIL_SERVER', 'smtp.gmail.com')
     app.config['MAIL_PORT'] = int(os.environ.get('MAIL_PORT', 587))
-    app.config['MAIL_USE_TLS'] = True
+    app.config['MAIL_USE_TLS'] = os.environ.get('MAIL_USE_TLS', 'true').lower() == 'true'
+    app.config['MAIL_USE_SSL'] = os.environ.get('MAIL_USE_SSL', 'false').lower() == 'true'
     app.config['MAIL_USERNAME'] = os.environ.get('MAIL_USERNAME')
     app.config['MAIL_PASSWORD'] = os.environ.get('MAIL_PASSWORD')
+    app.config['MAIL_DEFAULT_SENDER'] = os.environ.get('MAIL_DEFAULT_SENDER', os.environ.get('MAIL_USERNAME'))
+    # Fila de saída (flask send-mail)
+    app.config['MAIL_OUTBOX_BATCH_SIZE'] = int(os.environ.get('MAIL_OUTBOX_BATCH_SIZE', 50))  # e-mails por conexão SMTP
+    app.config['MAIL_OUTBOX_MAX_ATTEMPTS'] = int(os.environ.get('MAIL_OUTBOX_MAX_ATTEMPTS', 5))
+    app.config['MAIL_OUTBOX_RETRY_DELAY'] = int(os.environ.get('MAIL_OUTBOX_RETRY_DELAY', 60))  # segundos, dobra a cada falha
+    app.config['MAIL_OUTBOX_MAX_RETRY_DELAY'] = int(os.environ.get('MAIL_OUTBOX_MAX_RETRY_DELAY', 3600))
+    app.config['MAIL_OUTBOX_LOCK_TIMEOUT'] = int(os.environ.get('MAIL_OUTBOX_LOCK_TIMEOUT', 300))
+    app.config['MAIL_OUTBOX_POLL_INTERVAL'] = float(os.environ.get('MAIL_OUTBOX_POLL_INTERVAL', 10))
     
     # Initialize extensions with app
     db.init_app(app)
-    migrate.init_app(app, db)
+    from search import exclude_search_tables
+    migrate.init_app(app, db, include_name=exclude_search_tables)
     login_manager.init_app(app)
     login_manager.login_view = 'login'
     login_manager.login_message = 'Por favor, faça login para acessar esta página.'
@@ -31,13 +68,34 @@ def create_app():
     # Import models and routes after app creation
     from models import User
     from routes import register_routes
+    from commands import register_commands
+    from dashboard_cache import dashboard_cache
+    from query_budget import query_budget
+    from workflow_templates import task_templates
+    from lead_rollups import lead_rollups
+    from db_routing import read_replica
+    from mail_outbox import mail_outbox
+    from jobs import job_queue
+    from profiler import request_profiler
+    from metrics import metrics
     
     @login_manager.user_loader
     def load_user(user_id):
         return User.query.get(int(user_id))
     
+    metrics.init_app(app)
+    request_profiler.init_app(app)
+    dashboard_cache.init_app(app)
+    query_budget.init_app(app)
+    task_templates.init_app(app)
+    lead_rollups.init_app(app)
+    read_replica.init_app(app)
+    mail_outbox.init_app(app)
+    job_queue.init_app(app)
+    
     # Register routes
     register_routes(app)
+    register_commands(app)
     
     return app
 
@@ -101,16 +159,44 @@ def create_default_users():
         print(f"❌ Erro ao criar usuários padrão: {e}")
         db.session.rollback()
 
+# Revisão do esquema inicial (bancos criados com db.create_all() antes das migrações)
+INITIAL_REVISION = 'e14f41125261'
+
+def init_database(seed=True):
+    """
+    Prepara o banco: execução única por deploy, antes de subir os workers
+    
+    Aplica as migrações (marcando o esquema inicial em bancos criados com
+    db.create_all()), constrói os totais diários de leads se ainda não
+    existirem e cria os usuários padrão.
+    """
+    from flask_migrate import upgrade, stamp
+    from sqlalchemy import inspect
+    from lead_rollups import lead_rollups
+    
+    directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+    tables = inspect(db.engine).get_table_names()
+    if 'users' in tables and 'alembic_version' not in tables:
+        print("🔄 Banco sem controle de migrações: marcando o esquema inicial...")
+        stamp(directory=directory, revision=INITIAL_REVISION)
+    
+    print("🔄 Aplicando migrações...")
+    upgrade(directory=directory)
+    
+    if lead_rollups.closed_through() is None:
+        print("🔄 Construindo totais diários de leads...")
+        lead_rollups.rebuild()
+    
+    if seed:
+        create_default_users()
+
 app = create_app()
 
 if __name__ == '__main__':
+    # Servidor de desenvolvimento; em produção use wsgi.py (gunicorn/waitress)
     with app.app_context():
         print("🔄 Inicializando banco de dados...")
-        db.create_all()
-        print("✅ Tabelas criadas!")
-        
-        # Criar usuários padrão automaticamente
-        create_default_users()
+        init_database()
         
         print("🚀 Iniciando servidor...")
         print("📱 Acesse: http://localhost:5000")
@@ -0,0 +1,467 @@
+"""
+Benchmarks das rotas e do LeadManager
+Sistema CRM Profissional
+
+`flask benchmark` mede cada rota de routes.py (pelo cliente de testes do
+Flask, com a sessão de um usuário do banco) e cada método público do
+LeadManager (chamado diretamente, dentro de uma requisição de teste). Cada
+benchmark roda `warmup` vezes sem medir e `repeat` vezes medindo; o
+resultado guarda mediana, mínimo e máximo (ms) e as consultas SQL da
+última execução. Preparação e limpeza (setup/teardown) ficam fora do tempo.
+
+Os resultados são gravados em JSON (--save) e comparados com uma linha de
+base (--compare): é regressão uma mediana acima de (1 + threshold) vezes a
+da base e ao menos BENCHMARK_MIN_DELTA_MS mais lenta, ou um benchmark que
+passou a falhar.
+
+Os benchmarks de escrita (mudanças de status, criação de leads, importação)
+gravam no banco: rode contra uma base de benchmark (`flask generate-data`)
+ou use --skip-writes.
+"""
+
+import contextvars
+import io
+import os
+import platform
+import statistics
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from database import db
+from jobs import job_queue
+from lead_functions import LeadManager
+from models import Client, Lead, User
+
+BENCHMARK_REPEAT = 5
+BENCHMARK_WARMUP = 1
+BENCHMARK_THRESHOLD = 0.25
+# Diferenças menores que isso são ruído de medição, qualquer que seja a proporção
+BENCHMARK_MIN_DELTA_MS = 2.0
+
+# Leads alterados de uma vez no benchmark de mudança de status em lote
+BULK_BENCHMARK_SIZE = 50
+IMPORT_BENCHMARK_ROWS = 100
+IMPORT_BENCHMARK_DOMAIN = 'benchmark.invalid'
+REJECTS_BENCHMARK_FILE = 'benchmark-rejeitados.csv'
+
+# Rotas que não fazem sentido medir
+SKIPPED_ENDPOINTS = frozenset({'static'})
+
+
+def _other_status(status):
+    """Status alternado a cada execução dos benchmarks de mudança de status"""
+    return 'proposta' if status == 'qualificado' else 'qualificado'
+
+
+def _consume(result):
+    """Esgota geradores (respostas em streaming) para medir o trabalho completo"""
+    if hasattr(result, '__next__'):
+        for _ in result:
+            pass
+        return None
+    return result
+
+
+class Benchmark:
+    """Um cenário medido: run(state) é cronometrado, setup()/teardown(state) não"""
+
+    def __init__(self, name, target, run, setup=None, teardown=None, in_request=False, writes=False):
+        self.name = name
+        self.target = target  # endpoint ou método do LeadManager coberto
+        self.run = run
+        self.setup = setup
+        self.teardown = teardown
+        self.in_request = in_request
+        self.writes = writes
+
+
+class BenchmarkSuite:
+    """Monta e executa os benchmarks das rotas e do LeadManager"""
+
+    def __init__(self, app, username='admin', repeat=BENCHMARK_REPEAT, warmup=BENCHMARK_WARMUP,
+                 skip_writes=False, progress=None):
+        self.app = app
+        self.username = username
+        self.repeat = repeat
+        self.warmup = warmup
+        self.skip_writes = skip_writes
+        self.progress = progress or (lambda message: None)
+        self._queries = 0
+        self.sample = {}
+
+    # Execução
+    def run(self, only=None):
+        """
+        Executa os benchmarks (todos ou os que contêm `only` no nome)
+
+        Retorna {'meta': ..., 'results': {nome: medidas}, 'uncovered': ...}.
+        """
+        # Contexto vazio: cada requisição de teste cria o próprio app context (g e sessão do banco),
+        # mesmo quando chamado de dentro do app context do CLI
+        return contextvars.Context().run(self._run, only)
+
+    def _run(self, only):
+        with self._benchmark_settings():
+            with self.app.app_context():
+                self._load_sample()
+            benchmarks = self.benchmarks()
+            uncovered = self.uncovered(benchmarks)
+            if only:
+                benchmarks = [benchmark for benchmark in benchmarks if only in benchmark.name]
+            if self.skip_writes:
+                benchmarks = [benchmark for benchmark in benchmarks if not benchmark.writes]
+
+            results = {}
+            for benchmark in benchmarks:
+                results[benchmark.name] = self.measure(benchmark)
+                result = results[benchmark.name]
+                if result.get('error'):
+                    self.progress(f"❌ {benchmark.name}: {result['error']}")
+                else:
+                    self.progress(f"✅ {benchmark.name}: {result['median_ms']:.2f} ms ({result['queries']} consultas)")
+
+        return {'meta': self.meta(), 'results': results, 'uncovered': uncovered}
+
+    def measure(self, benchmark):
+        durations = []
+        queries = 0
+        for iteration in range(self.warmup + self.repeat):
+            try:
+                elapsed, queries = self._iteration(benchmark)
+            except Exception as exc:
+                return {'error': f'{type(exc).__name__}: {exc}'[:500]}
+            if iteration >= self.warmup:
+                durations.append(elapsed)
+        return {
+            'median_ms': round(statistics.median(durations), 3),
+            'min_ms': round(min(durations), 3),
+            'max_ms': round(max(durations), 3),
+            'queries': queries,
+            'runs': len(durations)
+        }
+
+    def _iteration(self, benchmark):
+        """Uma execução: (ms, consultas SQL); exceção se o resultado indicar falha"""
+        if benchmark.in_request:
+            # Contexto novo por execução: identity map vazio e escritas sem commit desfeitas no final
+            with self.app.test_request_context():
+                state = benchmark.setup() if benchmark.setup else None
+                try:
+                    return self._timed(benchmark, state)
+                finally:
+                    if benchmark.teardown:
+                        benchmark.teardown(state)
+
+        state = None
+        if benchmark.setup:
+            with self.app.app_context():
+                state = benchmark.setup()
+        try:
+            return self._timed(benchmark, state)
+        finally:
+            if benchmark.teardown:
+                with self.app.app_context():
+                    benchmark.teardown(state)
+
+    def _timed(self, benchmark, state):
+        self._queries = 0
+        started = time.perf_counter()
+        outcome = benchmark.run(state)
+        elapsed = (time.perf_counter() - started) * 1000
+        if isinstance(outcome, int) and outcome >= 400:
+            raise RuntimeError(f'HTTP {outcome}')
+        if isinstance(outcome, dict) and outcome.get('success') is False:
+            raise RuntimeError(outcome.get('error') or 'success=False')
+        return elapsed, self._queries
+
+    def _count_query(self, conn, cursor, statement, parameters, context, executemany):
+        self._queries += 1
+
+    @contextmanager
+    def _benchmark_settings(self):
+        app = self.app
+        # Sem CSRF nos POSTs, sem avisos de orçamento, exceções das rotas com a mensagem
+        # original e /metrics sem token
+        overrides = {
+            'WTF_CSRF_ENABLED': False, 'QUERY_BUDGET_MODE': 'off', 'PROPAGATE_EXCEPTIONS': True,
+            'METRICS_OPEN_ACCESS': True
+        }
+        saved = {key: app.config.get(key) for key in overrides}
+        app.config.update(overrides)
+        # Jobs não rodam em paralelo com as medições
+        in_process, job_queue.in_process = job_queue.in_process, False
+        event.listen(Engine, 'before_cursor_execute', self._count_query)
+        try:
+            yield
+        finally:
+            event.remove(Engine, 'before_cursor_execute', self._count_query)
+            job_queue.in_process = in_process
+            app.config.update(saved)
+
+    # Dados de referência
+    def _load_sample(self):
+        user = User.query.filter_by(username=self.username).first()
+        if user is None:
+            raise ValueError(f'Usuário {self.username} não encontrado')
+        lead = Lead.query.order_by(Lead.id.desc()).first()
+        client = Client.query.order_by(Client.id.desc()).first()
+        if lead is None or client is None:
+            raise ValueError('Banco sem clientes ou leads (use flask generate-data)')
+
+        self.sample = {
+            'user_id': user.id,
+            'lead_id': lead.id,
+            'lead_title': lead.title,
+            'lead_client_id': lead.client_id,
+            'client_id': client.id,
+            'bulk_ids': [lead_id for lead_id, in db.session.query(Lead.id).order_by(Lead.id.desc())
+                         .limit(BULK_BENCHMARK_SIZE)]
+        }
+
+    def _next_lead_status(self):
+        lead = db.session.get(Lead, self.sample['lead_id'])
+        return _other_status(lead.status)
+
+    def _next_bulk_status(self):
+        lead = db.session.get(Lead, self.sample['bulk_ids'][0])
+        return _other_status(lead.status)
+
+    def meta(self):
+        return {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'database': self.app.config['SQLALCHEMY_DATABASE_URI'].split('://', 1)[0],
+            'python': platform.python_version(),
+            'machine': platform.machine(),
+            'repeat': self.repeat,
+            'warmup': self.warmup,
+            'username': self.username
+        }
+
+    # Clientes HTTP de teste
+    def _client(self, user_id=None):
+        client = self.app.test_client()
+        if user_id is not None:
+            self._login(client, user_id)
+        return client
+
+    @staticmethod
+    def _login(client, user_id):
+        """Sessão autenticada do Flask-Login sem passar pelo formulário de login"""
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+
+    def _request(self, client, method, path, **kwargs):
+        response = client.open(path, method=method, **kwargs)
+        response.get_data()  # inclui a geração do corpo das respostas em streaming
+        response.close()
+        return response.status_code
+
+    # Cenários
+    def benchmarks(self):
+        return self.route_benchmarks() + self.lead_manager_benchmarks()
+
+    def route_benchmarks(self):
+        sample = self.sample
+        client = self._client(sample['user_id'])
+        anonymous = self._client()
+        logout_client = self._client()
+
+        def get(endpoint, path, variant=None, http=client, **options):
+            name = f'route:{endpoint}' + (f'[{variant}]' if variant else '')
+            return Benchmark(name, endpoint, lambda state: self._request(http, 'GET', path), **options)
+
+        def current_etag(path):
+            # ETag atual obtido fora da medição; a execução medida deve responder 304
+            def setup():
+                response = client.get(path)
+                response.close()
+                return response.headers.get('ETag')
+            return setup
+
+        def conditional(endpoint, path):
+            return Benchmark(f'route:{endpoint}[304]', endpoint,
+                             lambda etag: self._request(client, 'GET', path, headers={'If-None-Match': etag or ''}),
+                             setup=current_etag(path))
+
+        def status_payload():
+            return {'status': self._next_lead_status(), 'notes': 'Benchmark'}
+
+        def bulk_payload():
+            return {'lead_ids': sample['bulk_ids'], 'status': self._next_bulk_status(), 'notes': 'Benchmark'}
+
+        def import_setup():
+            rows = ['name,email,phone,city,state,status'] + [
+                f'Cliente Benchmark {number},cliente{number}.{uuid.uuid4().hex[:8]}@{IMPORT_BENCHMARK_DOMAIN},'
+                f'(11) 99999-0000,São Paulo,SP,prospecto'
+                for number in range(IMPORT_BENCHMARK_ROWS)
+            ]
+            return '\n'.join(rows).encode('utf-8')
+
+        def import_teardown(state):
+            Client.query.filter(Client.email.like(f'%@{IMPORT_BENCHMARK_DOMAIN}')).delete(synchronize_session=False)
+            db.session.commit()
+
+        def rejects_setup():
+            directory = os.path.join(self.app.instance_path, 'imports')
+            os.makedirs(directory, exist_ok=True)
+            with open(os.path.join(directory, REJECTS_BENCHMARK_FILE), 'w', encoding='utf-8') as rejects:
+                rejects.write('linha,erro,name\n' + ''.join(f'{line},Nome é obrigatório,\n' for line in range(2, 502)))
+
+        def rejects_teardown(state):
+            path = os.path.join(self.app.instance_path, 'imports', REJECTS_BENCHMARK_FILE)
+            if os.path.exists(path):
+                os.remove(path)
+
+        return [
+            get('dashboard', '/'),
+            get('dashboard_cache_stats', '/api/dashboard/cache'),
+            get('mail_outbox_stats', '/api/mail/outbox'),
+            get('job_queue_stats', '/api/jobs'),
+            get('login', '/login', http=anonymous),
+            Benchmark('route:logout', 'logout', lambda state: self._request(logout_client, 'GET', '/logout'),
+                      setup=lambda: self._login(logout_client, sample['user_id'])),
+            get('clients', '/clients'),
+            get('clients', '/clients?query=silva', variant='busca'),
+            get('clients', '/clients?status=prospecto', variant='status'),
+            get('new_client', '/clients/new'),
+            get('view_client', f"/clients/{sample['client_id']}"),
+            get('edit_client', f"/clients/{sample['client_id']}/edit"),
+            get('leads', '/leads'),
+            get('leads', '/leads?status=proposta&priority=alta', variant='filtros'),
+            get('leads', '/leads?query=software', variant='busca'),
+            get('new_lead', '/leads/new'),
+            get('new_lead_advanced', '/leads/new-advanced'),
+            get('tasks', '/tasks'),
+            get('tasks', '/tasks?status=pendente', variant='status'),
+            get('leads_analytics', '/api/leads/analytics?period=30'),
+            get('leads_analytics', '/api/leads/analytics?period=365', variant='365d'),
+            conditional('leads_analytics', '/api/leads/analytics?period=365'),
+            get('leads_by_priority', '/api/leads/priority'),
+            get('revenue_forecast', '/api/leads/forecast?months=3'),
+            get('leads_pipeline', '/api/leads/pipeline'),
+            get('leads_pipeline_column', '/api/leads/pipeline/proposta'),
+            get('overdue_leads', '/api/leads/overdue'),
+            conditional('overdue_leads', '/api/leads/overdue'),
+            get('lookup_clients', '/api/lookup/clients?q=sil'),
+            get('lookup_users', '/api/lookup/users?q=a'),
+            Benchmark('route:update_lead_status_advanced', 'update_lead_status_advanced',
+                      lambda payload: self._request(client, 'POST', f"/leads/{sample['lead_id']}/update-status",
+                                                    json=payload),
+                      setup=status_payload, writes=True),
+            Benchmark('route:bulk_update_lead_status', 'bulk_update_lead_status',
+                      lambda payload: self._request(client, 'POST', '/api/leads/bulk-status', json=payload),
+                      setup=bulk_payload, writes=True),
+            get('workflow_task_templates', '/api/workflow/task-templates'),
+            Benchmark('route:workflow_task_templates[reload]', 'workflow_task_templates',
+                      lambda state: self._request(client, 'POST', '/api/workflow/task-templates')),
+            get('leads_analytics_page', '/leads/analytics'),
+            get('leads_forecast_page', '/leads/forecast'),
+            Benchmark('route:import_csv', 'import_csv',
+                      lambda content: self._request(client, 'POST', '/import/clients',
+                                                    data={'file': (io.BytesIO(content), 'clientes.csv')}),
+                      setup=import_setup, teardown=import_teardown, writes=True),
+            get('import_rejects', f'/import/rejects/{REJECTS_BENCHMARK_FILE}',
+                setup=rejects_setup, teardown=rejects_teardown),
+            get('export_data', '/export/clients?status=inativo'),
+            get('prometheus_metrics', '/metrics'),
+            get('debug_perf', '/debug/perf'),
+        ]
+
+    def lead_manager_benchmarks(self):
+        sample = self.sample
+        user_id, lead_id = sample['user_id'], sample['lead_id']
+
+        def call(method, *args, variant=None, **options):
+            kwargs = options.pop('kwargs', {})
+            name = f'LeadManager.{method}' + (f'[{variant}]' if variant else '')
+            function = getattr(LeadManager, method)
+            return Benchmark(name, method, lambda state: _consume(function(*args, **kwargs)),
+                             in_request=True, **options)
+
+        def lead():
+            return db.session.get(Lead, lead_id)
+
+        def new_lead_data():
+            return {'title': f'Benchmark {uuid.uuid4().hex}', 'value': 1000, 'priority': 'media',
+                    'source': 'website', 'client_id': sample['client_id']}
+
+        return [
+            Benchmark('LeadManager.create_lead_with_validation', 'create_lead_with_validation',
+                      lambda data: LeadManager.create_lead_with_validation(data, user_id),
+                      setup=new_lead_data, in_request=True, writes=True),
+            call('find_duplicate_leads', sample['lead_title'], sample['lead_client_id']),
+            Benchmark('LeadManager.update_lead_status', 'update_lead_status',
+                      lambda status: LeadManager.update_lead_status(lead_id, status, user_id, 'Benchmark'),
+                      setup=self._next_lead_status, in_request=True, writes=True),
+            # Sem commit: as tarefas são descartadas no fim do contexto
+            call('create_followup_task', lead_id, user_id),
+            Benchmark('LeadManager.build_status_tasks', 'build_status_tasks',
+                      lambda current: LeadManager.build_status_tasks(current, 'proposta', user_id),
+                      setup=lead, in_request=True),
+            Benchmark('LeadManager.create_status_tasks', 'create_status_tasks',
+                      lambda current: LeadManager.create_status_tasks(current, 'negociacao', user_id),
+                      setup=lead, in_request=True),
+            call('create_qualification_tasks', lead_id, user_id),
+            call('create_proposal_tasks', lead_id, user_id),
+            call('create_negotiation_tasks', lead_id, user_id),
+            call('create_post_sale_tasks', lead_id, user_id),
+            Benchmark('LeadManager.bulk_update_lead_status', 'bulk_update_lead_status',
+                      lambda status: LeadManager.bulk_update_lead_status(sample['bulk_ids'], status, user_id,
+                                                                         'Benchmark'),
+                      setup=self._next_bulk_status, in_request=True, writes=True),
+            call('get_lead_analytics'),
+            call('get_lead_analytics', user_id, 365, variant='usuario-365d'),
+            call('get_lead_analytics_version'),
+            call('get_lead_analytics_version', user_id, 365, variant='usuario-365d'),
+            call('get_leads_by_priority'),
+            call('get_stage_probabilities'),
+            call('iter_forecast_leads', 3),
+            call('forecast_revenue', 3),
+            call('get_overdue_leads'),
+            call('get_overdue_version'),
+            call('iter_overdue_leads'),
+            call('get_pipeline_board'),
+            call('get_pipeline_column', 'proposta'),
+        ]
+
+    def uncovered(self, benchmarks):
+        """Rotas e métodos públicos do LeadManager sem benchmark"""
+        targets = {benchmark.target for benchmark in benchmarks}
+        endpoints = set(self.app.view_functions) - SKIPPED_ENDPOINTS
+        methods = {name for name, value in vars(LeadManager).items()
+                   if isinstance(value, staticmethod) and not name.startswith('_')}
+        return {
+            'routes': sorted(endpoints - targets),
+            'lead_manager': sorted(methods - targets)
+        }
+
+
+def compare_results(current, baseline, threshold=BENCHMARK_THRESHOLD, min_delta_ms=BENCHMARK_MIN_DELTA_MS):
+    """
+    Compara dois resultados de BenchmarkSuite.run()
+
+    Retorna a lista de regressões (dicts com name, reason, baseline_ms e
+    current_ms). Benchmarks ausentes na base não são comparados.
+    """
+    regressions = []
+    for name, result in current['results'].items():
+        previous = baseline.get('results', {}).get(name)
+        if previous is None:
+            continue
+        if result.get('error'):
+            if not previous.get('error'):
+                regressions.append({'name': name, 'reason': f"passou a falhar: {result['error']}",
+                                    'baseline_ms': previous.get('median_ms'), 'current_ms': None})
+            continue
+        if previous.get('error'):
+            continue
+
+        before, after = previous['median_ms'], result['median_ms']
+        if after > before * (1 + threshold) and after - before >= min_delta_ms:
+            regressions.append({'name': name, 'reason': f'{(after / before - 1) * 100:+.0f}%' if before else 'novo custo',
+                                'baseline_ms': before, 'current_ms': after})
+    return regressions
@@ -0,0 +1,326 @@
+"""
+Comandos de linha de comando (flask <comando>)
+Sistema CRM Profissional
+"""
+
+import sys
+import click
+
+
+def register_commands(app):
+    @app.cli.command('init-db')
+    @click.option('--no-seed', is_flag=True, help='Não criar os usuários padrão')
+    def init_db_command(no_seed):
+        """Aplica as migrações e cria os dados iniciais (uma vez por deploy)"""
+        from app import init_database
+        
+        init_database(seed=not no_seed)
+        click.echo("✅ Banco de dados pronto")
+    
+    @app.cli.command('check-query-plans')
+    @click.option('--user', 'username', default='admin', show_default=True, help='Usuário da sessão das rotas')
+    def check_query_plans(username):
+        """Falha se alguma consulta das rotas ou do LeadManager fizer varredura sem limite"""
+        from query_plans import QueryPlanCheck
+        
+        try:
+            results = QueryPlanCheck(app, username=username).run()
+        except ValueError as exc:
+            click.echo(f"❌ {exc}")
+            sys.exit(1)
+        
+        failures = missing = 0
+        for name, result in results.items():
+            status = '❌' if result['failures'] or result['missing_indexes'] else '✅'
+            click.echo(f"{status} {name} ({len(result['queries'])} consultas)")
+            for query in result['failures']:
+                failures += 1
+                click.echo(f"      {' '.join(query['sql'].split())[:200]}")
+                for line in query['plan']:
+                    click.echo(f"        {line}")
+            for index in result['missing_indexes']:
+                missing += 1
+                click.echo(f"      índice não usado: {index}")
+        
+        if failures:
+            click.echo(f"\n❌ {failures} consulta(s) com varredura sem limite")
+        if missing:
+            click.echo(f"\n❌ {missing} índice(s) exigido(s) fora dos planos")
+        if failures or missing:
+            sys.exit(1)
+        click.echo("\n✅ Todas as consultas usam índices")
+    
+    @app.cli.command('rebuild-search-index')
+    def rebuild_search_index_command():
+        """Recria e repopula o índice de busca de clientes e leads"""
+        from database import db
+        from search import create_search_index
+        
+        with db.engine.begin() as connection:
+            create_search_index(connection, rebuild=True)
+        click.echo("✅ Índice de busca reconstruído")
+    
+    @app.cli.command('seed-task-templates')
+    @click.option('--file', 'path', type=click.Path(exists=True), help='Arquivo JSON com os modelos')
+    def seed_task_templates_command(path):
+        """Grava os modelos de tarefas automáticas na tabela task_templates"""
+        import json
+        from models import TaskTemplate
+        from workflow_templates import seed_task_templates
+        
+        if TaskTemplate.query.first():
+            click.echo("⚠️ A tabela task_templates já possui modelos")
+            sys.exit(1)
+        
+        definitions = None
+        if path:
+            with open(path, encoding='utf-8') as handle:
+                definitions = json.load(handle)
+        
+        total = seed_task_templates(definitions)
+        click.echo(f"✅ {total} modelo(s) de tarefa gravados")
+    
+    @app.cli.command('rebuild-lead-rollups')
+    @click.option('--days', type=int, help='Recalcular apenas os últimos N dias')
+    def rebuild_lead_rollups_command(days):
+        """Reconstrói os totais diários de leads usados nas análises"""
+        from lead_rollups import lead_rollups
+        
+        rows = lead_rollups.rebuild(days=days)
+        click.echo(f"✅ {rows} linha(s) de totais gravadas (consolidado até {lead_rollups.closed_through()})")
+    
+    @app.cli.command('import-csv')
+    @click.argument('kind', type=click.Choice(['clients', 'leads']))
+    @click.argument('path', type=click.Path(exists=True, dir_okay=False))
+    @click.option('--rejects', 'rejects_path', type=click.Path(dir_okay=False), help='Arquivo CSV para as linhas rejeitadas')
+    @click.option('--delimiter', default=',', show_default=True, help='Separador do CSV')
+    @click.option('--encoding', default='utf-8-sig', show_default=True, help='Codificação do arquivo')
+    @click.option('--batch-size', default=1000, show_default=True, help='Linhas por INSERT em lote')
+    @click.option('--user', 'username', help='Responsável padrão dos leads sem a coluna "user"')
+    def import_csv_command(kind, path, rejects_path, delimiter, encoding, batch_size, username):
+        """Importa clientes ou leads de um arquivo CSV"""
+        from models import User
+        from importer import IMPORTERS
+        
+        options = {'batch_size': batch_size}
+        if kind == 'leads' and username:
+            user = User.query.filter_by(username=username).first()
+            if user is None:
+                click.echo(f"❌ Usuário {username} não encontrado")
+                sys.exit(1)
+            options['default_user_id'] = user.id
+        
+        rejects = open(rejects_path, 'w', newline='', encoding='utf-8') if rejects_path else None
+        try:
+            with open(path, newline='', encoding=encoding) as stream:
+                options['rejects'] = rejects
+                report = IMPORTERS[kind](**options).run(stream, delimiter=delimiter)
+        finally:
+            if rejects:
+                rejects.close()
+        
+        click.echo(f"✅ {report['inserted']} inserido(s), {report['rejected']} rejeitado(s) "
+                   f"em {report['elapsed_seconds']}s ({report['rows_per_second']} linhas/s)")
+        if report['rejected'] and rejects_path:
+            click.echo(f"📄 Rejeitados: {rejects_path}")
+    
+    @app.cli.command('export')
+    @click.argument('kind', type=click.Choice(['clients', 'leads', 'tasks', 'interactions']))
+    @click.argument('path', type=click.Path(dir_okay=False))
+    @click.option('--format', 'export_format', type=click.Choice(['csv', 'xlsx']), help='Formato (padrão: extensão do arquivo)')
+    @click.option('--delimiter', default=',', show_default=True, help='Separador do CSV')
+    @click.option('--query', default='', help='Busca textual (mesma da listagem)')
+    @click.option('--status', default='', help='Filtrar por status')
+    @click.option('--user-id', type=int, help='Filtrar por responsável')
+    @click.option('--type', 'interaction_type', default='', help='Tipo de interação')
+    @click.option('--client-id', type=int, help='Filtrar interações por cliente')
+    @click.option('--lead-id', type=int, help='Filtrar interações por lead')
+    def export_command(kind, path, export_format, delimiter, query, status, user_id,
+                       interaction_type, client_id, lead_id):
+        """Exporta clientes, leads, tarefas ou interações para CSV ou XLSX"""
+        from werkzeug.datastructures import MultiDict
+        from exporter import export_stream
+        
+        export_format = export_format or ('xlsx' if path.lower().endswith('.xlsx') else 'csv')
+        options = {'query': query, 'status': status, 'type': interaction_type,
+                   'user_id': user_id, 'client_id': client_id, 'lead_id': lead_id}
+        args = MultiDict({key: str(value) for key, value in options.items() if value})
+        
+        chunks = export_stream(kind, args, export_format, delimiter=delimiter)
+        if export_format == 'xlsx':
+            with open(path, 'wb') as output:
+                for chunk in chunks:
+                    output.write(chunk)
+        else:
+            with open(path, 'w', newline='', encoding='utf-8') as output:
+                for chunk in chunks:
+                    output.write(chunk)
+        click.echo(f"✅ Exportação salva em {path}")
+    
+    @app.cli.command('send-mail')
+    @click.option('--once', is_flag=True, help='Esvaziar a fila e sair (ex.: cron)')
+    @click.option('--interval', type=float, help='Segundos entre verificações da fila')
+    def send_mail_command(once, interval):
+        """Envia os e-mails da fila de saída (processo em segundo plano)"""
+        from mail_outbox import mail_outbox
+        
+        if not once:
+            click.echo(f"📨 Enviando e-mails da fila (lotes de {mail_outbox.batch_size}); Ctrl+C para parar")
+        try:
+            total = mail_outbox.run(once=once, poll_interval=interval)
+        except KeyboardInterrupt:
+            total = None
+        
+        stats = mail_outbox.stats()
+        if total is not None:
+            click.echo(f"✅ {total} e-mail(s) processado(s)")
+        click.echo(f"📊 Enviados: {stats['sent']}, repetir: {stats['retried']}, falhas: {stats['failed']}, "
+                   f"conexões SMTP: {stats['connections']}")
+        click.echo(f"📬 Fila: {stats['depth']['pendente']} pendente(s), {stats['depth']['falhou']} com falha")
+    
+    @app.cli.command('run-jobs')
+    @click.option('--once', is_flag=True, help='Esvaziar a fila e sair (ex.: cron)')
+    @click.option('--interval', type=float, help='Segundos entre verificações da fila')
+    def run_jobs_command(once, interval):
+        """Executa os jobs da fila (automações do workflow de leads)"""
+        from jobs import job_queue
+        
+        if not once:
+            click.echo(f"⚙️ Executando jobs (lotes de {job_queue.batch_size}); Ctrl+C para parar")
+        try:
+            total = job_queue.run(once=once, poll_interval=interval)
+        except KeyboardInterrupt:
+            total = None
+        
+        stats = job_queue.stats()
+        if total is not None:
+            click.echo(f"✅ {total} job(s) processado(s)")
+        click.echo(f"📊 Concluídos: {stats['completed']}, repetir: {stats['retried']}, falhas: {stats['failed']}, "
+                   f"apagados: {stats['purged']}")
+        click.echo(f"📋 Fila: {stats['depth']['pendente']} pendente(s), {stats['depth']['falhou']} com falha")
+    
+    @app.cli.command('generate-data')
+    @click.option('--scale', type=float, default=1.0, show_default=True,
+                  help='Fração dos volumes padrão (100 mil clientes, 1 milhão de leads, ...)')
+    @click.option('--clients', type=int, help='Quantidade de clientes (sobrepõe --scale)')
+    @click.option('--leads', type=int, help='Quantidade de leads (sobrepõe --scale)')
+    @click.option('--interactions', type=int, help='Quantidade de interações (sobrepõe --scale)')
+    @click.option('--tasks', type=int, help='Quantidade de tarefas (sobrepõe --scale)')
+    @click.option('--users', type=int, default=50, show_default=True, help='Vendedores gerados (vendedor001, ...)')
+    @click.option('--days', type=int, default=730, show_default=True, help='Janela de datas (dias até hoje)')
+    @click.option('--seed', type=int, default=42, show_default=True, help='Semente (mesma semente, mesmos dados)')
+    @click.option('--batch-size', type=int, default=5000, show_default=True, help='Linhas por INSERT em lote')
+    def generate_data_command(scale, clients, leads, interactions, tasks, users, days, seed, batch_size):
+        """Gera dados sintéticos (clientes, leads, interações e tarefas) para benchmarks"""
+        from synthetic_data import DEFAULT_VOLUMES, SYNTHETIC_PASSWORD, SyntheticDataGenerator
+        
+        volumes = {name: max(int(total * scale), 1) for name, total in DEFAULT_VOLUMES.items()}
+        for name, value in (('clients', clients), ('leads', leads), ('interactions', interactions), ('tasks', tasks)):
+            if value is not None:
+                volumes[name] = value
+        
+        click.echo("🏗️ Gerando " + ", ".join(f"{total:,} {name}" for name, total in volumes.items()))
+        generator = SyntheticDataGenerator(users=users, seed=seed, days=days, batch_size=batch_size,
+                                           progress=lambda message: click.echo(f"   {message}"))
+        report = generator.run(**volumes)
+        
+        click.echo(f"✅ Dados gerados em {report['total_seconds']}s")
+        for name in DEFAULT_VOLUMES:
+            click.echo(f"   {name}: {report[name]['rows']:,} linhas ({report[name]['rows_per_second']:,} linhas/s)")
+        click.echo(f"👥 {report['users']['rows']} vendedores (vendedor001...), senha: {SYNTHETIC_PASSWORD}")
+    
+    @app.cli.command('benchmark')
+    @click.option('--only', help='Apenas benchmarks cujo nome contém o texto')
+    @click.option('--repeat', type=int, default=5, show_default=True, help='Execuções medidas por benchmark')
+    @click.option('--warmup', type=int, default=1, show_default=True, help='Execuções descartadas antes das medidas')
+    @click.option('--user', 'username', default='admin', show_default=True, help='Usuário das requisições')
+    @click.option('--skip-writes', is_flag=True, help='Pular benchmarks que gravam no banco')
+    @click.option('--save', 'save_path', type=click.Path(dir_okay=False), help='Gravar os resultados em JSON')
+    @click.option('--compare', 'baseline_path', type=click.Path(exists=True, dir_okay=False),
+                  help='JSON de linha de base; falha se houver regressão')
+    @click.option('--threshold', type=float, default=0.25, show_default=True,
+                  help='Piora máxima da mediana em relação à base (0.25 = 25%)')
+    def benchmark_command(only, repeat, warmup, username, skip_writes, save_path, baseline_path, threshold):
+        """Mede as rotas e os métodos do LeadManager e compara com uma linha de base"""
+        import json
+        from benchmarks import BenchmarkSuite, compare_results
+        
+        suite = BenchmarkSuite(app, username=username, repeat=repeat, warmup=warmup, skip_writes=skip_writes,
+                               progress=click.echo)
+        try:
+            results = suite.run(only=only)
+        except ValueError as exc:
+            click.echo(f"❌ {exc}")
+            sys.exit(1)
+        
+        for kind, names in results['uncovered'].items():
+            if names:
+                click.echo(f"⚠️ Sem benchmark ({kind}): {', '.join(names)}")
+        
+        if save_path:
+            with open(save_path, 'w', encoding='utf-8') as output:
+                json.dump(results, output, ensure_ascii=False, indent=2)
+            click.echo(f"💾 Resultados salvos em {save_path}")
+        
+        if baseline_path:
+            with open(baseline_path, encoding='utf-8') as handle:
+                regressions = compare_results(results, json.load(handle), threshold=threshold)
+            for regression in regressions:
+                click.echo(f"❌ {regression['name']}: {regression['reason']} "
+                           f"({regression['baseline_ms']} ms → {regression['current_ms']} ms)")
+            if regressions:
+                click.echo(f"\n❌ {len(regressions)} benchmark(s) com regressão")
+                sys.exit(1)
+            click.echo("\n✅ Nenhuma regressão em relação à linha de base")
+    
+    @app.cli.command('load-test')
+    @click.option('--users', type=int, default=10, show_default=True, help='Usuários virtuais simultâneos')
+    @click.option('--duration', type=float, default=60, show_default=True, help='Duração do teste (segundos)')
+    @click.option('--ramp-up', type=float, default=5, show_default=True, help='Segundos para iniciar todos os usuários')
+    @click.option('--think-time', type=float, default=1.0, show_default=True,
+                  help='Pausa média entre ações de um usuário (segundos; 0 = sem pausa)')
+    @click.option('--url', help='Servidor já em execução (padrão: sobe o app localmente)')
+    @click.option('--server', type=click.Choice(['gunicorn', 'waitress']), help='Servidor local (padrão: gunicorn)')
+    @click.option('--workers', type=int, help='Processos do gunicorn (WEB_CONCURRENCY)')
+    @click.option('--threads', type=int, help='Threads por processo (WEB_THREADS)')
+    @click.option('--password', help='Senha dos usuários (padrão: a do flask generate-data)')
+    @click.option('--seed', type=int, default=42, show_default=True, help='Semente das escolhas dos usuários')
+    @click.option('--save', 'save_path', type=click.Path(dir_okay=False), help='Gravar o relatório em JSON')
+    def load_test_command(users, duration, ramp_up, think_time, url, server, workers, threads, password, seed,
+                          save_path):
+        """Teste de carga com N vendedores: vazão, p50/p95/p99 por endpoint e taxa de erros"""
+        import json
+        from contextlib import nullcontext
+        from loadtest import LoadTest, LocalServer
+        
+        options = {'password': password} if password else {}
+        try:
+            load_test = LoadTest(url or '', users=users, duration=duration, ramp_up=ramp_up, think_time=think_time,
+                                 seed=seed, progress=click.echo, **options).prepare()
+        except ValueError as exc:
+            click.echo(f"❌ {exc}")
+            sys.exit(1)
+        
+        local = None if url else LocalServer(app, server=server, workers=workers, threads=threads)
+        try:
+            with local or nullcontext():
+                if local:
+                    load_test.url = local.url
+                    click.echo(f"🚀 {local.server} em {local.url}")
+                report = load_test.run()
+        except RuntimeError as exc:
+            click.echo(f"❌ {exc}")
+            sys.exit(1)
+        
+        click.echo(f"\n{'Endpoint':<34}{'Req':>7}{'Req/s':>8}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'Erros':>8}")
+        for name, row in list(report['endpoints'].items()) + [('TOTAL', report['total'])]:
+            click.echo(f"{name:<34}{row['requests']:>7}{row['throughput_rps']:>8.1f}{row['p50_ms']:>9.1f}"
+                       f"{row['p95_ms']:>9.1f}{row['p99_ms']:>9.1f}{row['error_rate'] * 100:>7.1f}%")
+        for name, row in report['endpoints'].items():
+            for sample in row.get('error_samples', []):
+                click.echo(f"⚠️ {name}: {sample}")
+        
+        if save_path:
+            with open(save_path, 'w', encoding='utf-8') as output:
+                json.dump(report, output, ensure_ascii=False, indent=2)
+            click.echo(f"💾 Relatório salvo em {save_path}")
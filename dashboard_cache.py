@@ -0,0 +1,176 @@
+"""
+Cache das métricas do dashboard
+Sistema CRM Profissional
+
+Guarda um snapshot das métricas do dashboard com TTL curto. Escritas em
+Lead, Task e Client invalidam o snapshot através de eventos da sessão do
+SQLAlchemy. As consultas do snapshot vão para a réplica de leitura, se
+configurada (DATABASE_READ_URL). O cache é por processo: com vários
+workers cada um mantém o seu snapshot e o TTL limita a defasagem entre eles.
+"""
+
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import event, func
+from sqlalchemy.orm import joinedload
+from database import db
+from db_routing import read_replica
+from models import Lead, Client, Task
+from metrics import DASHBOARD_CACHE_REQUESTS
+
+# Modelos cujas escritas invalidam o snapshot
+WATCHED_MODELS = (Lead, Task, Client)
+
+
+class DashboardCache:
+    """Snapshot das métricas do dashboard com invalidação por escrita"""
+
+    def __init__(self, app=None):
+        self.ttl = 60
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._expires_at = 0
+        # Incrementado a cada invalidação: snapshot calculado antes dela não é guardado
+        self._generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self._listening = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.ttl = app.config.get('DASHBOARD_CACHE_TTL', 60)
+        app.extensions['dashboard_cache'] = self
+        if not self._listening:
+            event.listen(db.session, 'after_flush', self._after_flush)
+            event.listen(db.session, 'after_commit', self._after_commit)
+            event.listen(db.session, 'after_rollback', self._after_rollback)
+            event.listen(db.session, 'do_orm_execute', self._do_orm_execute)
+            self._listening = True
+
+    def get(self):
+        """
+        Retorna o snapshot atual, recalculando se expirado ou invalidado
+
+        O cálculo roda fora do lock. Se uma invalidação acontecer durante o
+        cálculo, o resultado é devolvido a quem pediu mas não é guardado (ele
+        pode não ver a escrita que invalidou o cache).
+        """
+        with self._lock:
+            if self._snapshot is not None and time.monotonic() < self._expires_at:
+                self.hits += 1
+                DASHBOARD_CACHE_REQUESTS.labels(result='hit').inc()
+                return self._snapshot
+            self.misses += 1
+            generation = self._generation
+        DASHBOARD_CACHE_REQUESTS.labels(result='miss').inc()
+
+        snapshot = self._build_snapshot()
+
+        with self._lock:
+            if generation == self._generation:
+                self._snapshot = snapshot
+                self._expires_at = time.monotonic() + self.ttl
+        return snapshot
+
+    def invalidate(self):
+        """Descarta o snapshot atual"""
+        with self._lock:
+            self._snapshot = None
+            self._expires_at = 0
+            self._generation += 1
+            self.invalidations += 1
+
+    def stats(self):
+        """Contadores de acerto/erro do cache"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'invalidations': self.invalidations,
+                'hit_rate': round(self.hits / total * 100, 2) if total > 0 else 0,
+                'ttl': self.ttl,
+                'cached': self._snapshot is not None and time.monotonic() < self._expires_at
+            }
+
+    @staticmethod
+    @read_replica.reads
+    def _build_snapshot():
+        """Executa as consultas do dashboard e gera um snapshot serializável"""
+        now = datetime.now()
+
+        # Leads por status para o gráfico (base também para os totais)
+        leads_by_status = db.session.query(Lead.status, func.count(Lead.id)).group_by(Lead.status).all()
+        status_counts = {status: count for status, count in leads_by_status}
+
+        # Tarefas próximas do vencimento (próximos 7 dias)
+        upcoming_tasks = Task.query.filter(
+            Task.due_date >= now,
+            Task.due_date <= now + timedelta(days=7),
+            Task.status.in_(['pendente', 'em_progresso'])
+        ).order_by(Task.due_date).limit(5).all()
+
+        # Leads recentes
+        recent_leads = Lead.query.options(
+            joinedload(Lead.client),
+            joinedload(Lead.assigned_user)
+        ).order_by(Lead.created_at.desc()).limit(5).all()
+
+        return {
+            'total_clients': Client.query.count(),
+            'total_leads': sum(status_counts.values()),
+            'active_leads': sum(status_counts.get(status, 0) for status in ['novo', 'qualificado', 'proposta', 'negociacao']),
+            'closed_leads': status_counts.get('fechado', 0),
+            'pending_tasks': Task.query.filter_by(status='pendente').count(),
+            'leads_by_status': [(status, count) for status, count in leads_by_status],
+            'upcoming_tasks': [
+                {
+                    'id': task.id,
+                    'title': task.title,
+                    'due_date': task.due_date,
+                    'priority': task.priority
+                } for task in upcoming_tasks
+            ],
+            'recent_leads': [
+                {
+                    'id': lead.id,
+                    'title': lead.title,
+                    'client': {'name': lead.client.name} if lead.client else None,
+                    'value': lead.value,
+                    'status': lead.status,
+                    'assigned_user': {
+                        'first_name': lead.assigned_user.first_name,
+                        'last_name': lead.assigned_user.last_name
+                    } if lead.assigned_user else {'first_name': '-', 'last_name': ''},
+                    'created_at': lead.created_at
+                } for lead in recent_leads
+            ]
+        }
+
+    # Eventos da sessão
+    def _after_flush(self, session, flush_context):
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if isinstance(obj, WATCHED_MODELS):
+                session.info['dashboard_dirty'] = True
+                return
+
+    def _after_commit(self, session):
+        if session.info.pop('dashboard_dirty', False):
+            self.invalidate()
+
+    def _after_rollback(self, session):
+        session.info.pop('dashboard_dirty', None)
+
+    def _do_orm_execute(self, orm_execute_state):
+        # UPDATE/DELETE/INSERT em massa não passam pelo flush
+        if not (orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert):
+            return
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and issubclass(mapper.class_, WATCHED_MODELS):
+            orm_execute_state.session.info['dashboard_dirty'] = True
+
+
+dashboard_cache = DashboardCache()
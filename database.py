@@ -5,9 +5,11 @@ from flask_sqlalchemy import SQLAlchemy
 from flask_migrate import Migrate
 from flask_login import LoginManager
 from flask_mail import Mail
+from db_routing import RoutingSession
 
 # Initialize extensions
-db = SQLAlchemy()
+# (RoutingSession envia as leituras marcadas com @read_replica.reads para a réplica)
+db = SQLAlchemy(session_options={'class_': RoutingSession})
 migrate = Migrate()
 login_manager = LoginManager()
 mail = Mail()
\ No newline at end of file
@@ -0,0 +1,133 @@
+"""
+Roteamento de leituras para a réplica (DATABASE_READ_URL)
+Sistema CRM Profissional
+
+Funções decoradas com @read_replica.reads executam seus SELECTs no bind
+'replica'. Escritas, flushes e qualquer leitura feita depois de uma escrita
+na mesma transação continuam no banco principal. Se a réplica estiver
+atrasada mais que DATABASE_READ_MAX_LAG segundos (ou fora do ar), as
+leituras voltam para o principal até a próxima verificação.
+
+Sem DATABASE_READ_URL tudo roda no banco principal.
+"""
+
+import functools
+import logging
+import threading
+import time
+from contextvars import ContextVar
+from flask_sqlalchemy.session import Session
+from sqlalchemy import event, text
+from sqlalchemy.exc import SQLAlchemyError
+
+# Chave do bind da réplica em SQLALCHEMY_BINDS
+REPLICA_BIND = 'replica'
+
+# Atraso da réplica em segundos (PostgreSQL em recuperação); 0 se não se aplica
+_POSTGRESQL_LAG = text(
+    "SELECT CASE WHEN NOT pg_is_in_recovery() "
+    "OR pg_last_wal_receive_lsn() = pg_last_wal_replay_lsn() THEN 0 "
+    "ELSE EXTRACT(EPOCH FROM now() - pg_last_xact_replay_timestamp()) END"
+)
+
+_use_replica = ContextVar('use_replica', default=False)
+
+
+def replica_lag(connection):
+    """Atraso de replicação (segundos) visto pela conexão da réplica"""
+    if connection.dialect.name == 'postgresql':
+        return float(connection.execute(_POSTGRESQL_LAG).scalar() or 0)
+    return 0.0
+
+
+class ReadReplica:
+    """Decide se as leituras marcadas podem ir para a réplica"""
+
+    def __init__(self, app=None):
+        self.max_lag = 30
+        self.check_interval = 5
+        self.lag = None
+        self._healthy = False
+        self._checked_at = None
+        self._lock = threading.Lock()
+        self.logger = logging.getLogger(__name__)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.max_lag = app.config.get('DATABASE_READ_MAX_LAG', 30)
+        self.check_interval = app.config.get('DATABASE_READ_CHECK_INTERVAL', 5)
+        self.logger = app.logger
+        # Estado da última verificação pertence à réplica anterior
+        self.lag = None
+        self._healthy = False
+        self._checked_at = None
+        app.extensions['read_replica'] = self
+
+    @staticmethod
+    def reads(function):
+        """Executa os SELECTs da função na réplica (quando disponível)"""
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            token = _use_replica.set(True)
+            try:
+                return function(*args, **kwargs)
+            finally:
+                _use_replica.reset(token)
+        return wrapper
+
+    def is_available(self, engine):
+        """Réplica acessível e com atraso dentro da tolerância (verificado a cada check_interval)"""
+        now = time.monotonic()
+        if self._checked_at is not None and now - self._checked_at < self.check_interval:
+            return self._healthy
+
+        with self._lock:
+            if self._checked_at is None or now - self._checked_at >= self.check_interval:
+                try:
+                    with engine.connect() as connection:
+                        self.lag = replica_lag(connection)
+                    self._healthy = self.lag <= self.max_lag
+                    if not self._healthy:
+                        self.logger.warning('Réplica atrasada %.1fs (tolerância %ss); lendo do principal',
+                                            self.lag, self.max_lag)
+                except SQLAlchemyError as exc:
+                    self.lag = None
+                    self._healthy = False
+                    self.logger.warning('Réplica indisponível; lendo do principal: %s', exc)
+                self._checked_at = now
+        return self._healthy
+
+
+read_replica = ReadReplica()
+
+
+class RoutingSession(Session):
+    """Sessão que envia os SELECTs das funções @read_replica.reads para a réplica"""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if (bind is None and _use_replica.get() and not self._flushing
+                and not self.info.get('wrote_in_transaction')
+                and getattr(clause, 'is_select', False)):
+            engine = self._db.engines.get(REPLICA_BIND)
+            if engine is not None and read_replica.is_available(engine):
+                return engine
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+# Depois de uma escrita, a transação passa a ler só do principal (lê o que escreveu)
+@event.listens_for(RoutingSession, 'after_flush')
+def _mark_written_after_flush(session, flush_context):
+    session.info['wrote_in_transaction'] = True
+
+
+@event.listens_for(RoutingSession, 'do_orm_execute')
+def _mark_written_on_execute(orm_execute_state):
+    if orm_execute_state.is_update or orm_execute_state.is_delete or orm_execute_state.is_insert:
+        orm_execute_state.session.info['wrote_in_transaction'] = True
+
+
+@event.listens_for(RoutingSession, 'after_commit')
+@event.listens_for(RoutingSession, 'after_rollback')
+def _clear_written(session):
+    session.info.pop('wrote_in_transaction', None)
@@ -0,0 +1,250 @@
+"""
+Exportação em massa (CSV / XLSX) de clientes, leads, tarefas e interações
+Sistema CRM Profissional
+
+As linhas são lidas do banco com cursor no servidor (yield_per, que ativa
+stream_results) e escritas à medida que chegam: nem o resultado nem o
+arquivo gerado ficam inteiros em memória. Os filtros são os mesmos das
+listagens (list_filters). As colunas de clientes e leads usam os mesmos
+nomes aceitos pela importação (importer.py).
+"""
+
+import csv
+import io
+import re
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+from sqlalchemy.orm import aliased
+from models import Client, Lead, Task, Interaction, User
+from list_filters import filter_clients, filter_leads, filter_tasks, filter_interactions
+
+# Linhas lidas do banco por lote (e escritas por bloco na resposta)
+EXPORT_BATCH_SIZE = 1000
+
+EXPORT_FORMATS = {
+    'csv': 'text/csv',
+    'xlsx': 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+}
+
+# Início de célula que o Excel/LibreOffice interpretam como fórmula; no CSV
+# esses textos saem com um apóstrofo na frente (removido pela importação)
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+# Caracteres de controle proibidos em XML 1.0 (deixariam o XLSX corrompido)
+_XML_ILLEGAL = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f\ufffe\uffff]')
+
+
+def _client_columns():
+    columns = [
+        ('id', Client.id), ('name', Client.name), ('email', Client.email), ('phone', Client.phone),
+        ('document', Client.document), ('document_type', Client.document_type),
+        ('address', Client.address), ('city', Client.city), ('state', Client.state),
+        ('zip_code', Client.zip_code), ('status', Client.status), ('notes', Client.notes),
+        ('created_at', Client.created_at)
+    ]
+    return columns, []
+
+
+def _lead_columns():
+    client, owner = aliased(Client), aliased(User)
+    columns = [
+        ('id', Lead.id), ('title', Lead.title), ('description', Lead.description), ('value', Lead.value),
+        ('status', Lead.status), ('priority', Lead.priority), ('source', Lead.source),
+        ('expected_close_date', Lead.expected_close_date), ('created_at', Lead.created_at),
+        ('client_id', Lead.client_id), ('client_name', client.name), ('client_document', client.document),
+        ('user', owner.username)
+    ]
+    joins = [(client, Lead.client_id == client.id), (owner, Lead.user_id == owner.id)]
+    return columns, joins
+
+
+def _task_columns():
+    client, lead, owner = aliased(Client), aliased(Lead), aliased(User)
+    columns = [
+        ('id', Task.id), ('title', Task.title), ('description', Task.description),
+        ('status', Task.status), ('priority', Task.priority), ('due_date', Task.due_date),
+        ('created_at', Task.created_at), ('completed_at', Task.completed_at),
+        ('lead_id', Task.lead_id), ('lead_title', lead.title),
+        ('client_id', Task.client_id), ('client_name', client.name), ('user', owner.username)
+    ]
+    joins = [(lead, Task.lead_id == lead.id), (client, Task.client_id == client.id),
+             (owner, Task.user_id == owner.id)]
+    return columns, joins
+
+
+def _interaction_columns():
+    client, lead, owner = aliased(Client), aliased(Lead), aliased(User)
+    columns = [
+        ('id', Interaction.id), ('type', Interaction.type), ('subject', Interaction.subject),
+        ('description', Interaction.description), ('date', Interaction.date),
+        ('client_id', Interaction.client_id), ('client_name', client.name),
+        ('lead_id', Interaction.lead_id), ('lead_title', lead.title), ('user', owner.username)
+    ]
+    joins = [(client, Interaction.client_id == client.id), (lead, Interaction.lead_id == lead.id),
+             (owner, Interaction.user_id == owner.id)]
+    return columns, joins
+
+
+# tipo -> (modelo, filtros da listagem, colunas)
+EXPORTS = {
+    'clients': (Client, filter_clients, _client_columns),
+    'leads': (Lead, filter_leads, _lead_columns),
+    'tasks': (Task, filter_tasks, _task_columns),
+    'interactions': (Interaction, filter_interactions, _interaction_columns)
+}
+
+
+def export_rows(kind, args, batch_size=EXPORT_BATCH_SIZE):
+    """
+    Cabeçalho e gerador das linhas (tuplas) de uma exportação
+
+    `args` é um MultiDict com os mesmos parâmetros da listagem correspondente.
+    """
+    model, apply_filters, build_columns = EXPORTS[kind]
+    columns, joins = build_columns()
+
+    query = apply_filters(model.query, args)
+    for target, condition in joins:
+        query = query.outerjoin(target, condition)
+
+    # Ordem estável pela chave primária (a relevância da busca não importa no extrato)
+    query = query.with_entities(*[column for _, column in columns]).order_by(None).order_by(model.id)
+    header = [name for name, _ in columns]
+    return header, (tuple(row) for row in query.yield_per(batch_size))
+
+
+def _csv_value(value):
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S')
+    if value is None:
+        return ''
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def iter_csv(header, rows, delimiter=',', batch_size=EXPORT_BATCH_SIZE):
+    """Gera o CSV em blocos de texto (BOM UTF-8 para o Excel reconhecer os acentos)"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer, delimiter=delimiter)
+    buffer.write('\ufeff')
+    writer.writerow(header)
+
+    for count, row in enumerate(rows, start=1):
+        writer.writerow([_csv_value(value) for value in row])
+        if count % batch_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+class _ChunkBuffer:
+    """Destino não pesquisável do ZipFile: acumula os bytes até serem recolhidos"""
+
+    def __init__(self):
+        self._chunks = []
+
+    def write(self, data):
+        self._chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def drain(self):
+        data = b''.join(self._chunks)
+        self._chunks = []
+        return data
+
+
+_XLSX_STATIC_PARTS = {
+    '[Content_Types].xml': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">'
+        '<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>'
+        '<Default Extension="xml" ContentType="application/xml"/>'
+        '<Override PartName="/xl/workbook.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>'
+        '<Override PartName="/xl/worksheets/sheet1.xml" '
+        'ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>'
+        '</Types>'
+    ),
+    '_rels/.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" '
+        'Target="xl/workbook.xml"/>'
+        '</Relationships>'
+    ),
+    'xl/_rels/workbook.xml.rels': (
+        '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+        '<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">'
+        '<Relationship Id="rId1" '
+        'Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" '
+        'Target="worksheets/sheet1.xml"/>'
+        '</Relationships>'
+    )
+}
+
+
+def _xlsx_cell(value):
+    if value is None:
+        return '<c/>'
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c><v>{value}</v></c>'
+    if isinstance(value, datetime):
+        value = value.strftime('%Y-%m-%d %H:%M:%S')
+    elif isinstance(value, date):
+        value = value.isoformat()
+    text = _XML_ILLEGAL.sub('', str(value))
+    return f'<c t="inlineStr"><is><t xml:space="preserve">{escape(text)}</t></is></c>'
+
+
+def iter_xlsx(header, rows, sheet_name='Dados', batch_size=EXPORT_BATCH_SIZE):
+    """
+    Gera uma planilha XLSX em blocos de bytes
+
+    A planilha é escrita direto no ZIP (strings inline, sem tabela de strings
+    compartilhadas), então o arquivo nunca é montado inteiro em memória.
+    """
+    output = _ChunkBuffer()
+    with zipfile.ZipFile(output, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for name, content in _XLSX_STATIC_PARTS.items():
+            archive.writestr(name, content)
+        archive.writestr('xl/workbook.xml', (
+            '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+            '<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" '
+            'xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">'
+            f'<sheets><sheet name="{escape(sheet_name)}" sheetId="1" r:id="rId1"/></sheets>'
+            '</workbook>'
+        ))
+        yield output.drain()
+
+        with archive.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            sheet.write((
+                '<?xml version="1.0" encoding="UTF-8" standalone="yes"?>'
+                '<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>'
+                '<row>' + ''.join(_xlsx_cell(name) for name in header) + '</row>'
+            ).encode())
+
+            for count, row in enumerate(rows, start=1):
+                sheet.write(('<row>' + ''.join(_xlsx_cell(value) for value in row) + '</row>').encode())
+                if count % batch_size == 0:
+                    yield output.drain()
+
+            sheet.write(b'</sheetData></worksheet>')
+    yield output.drain()
+
+
+def export_stream(kind, args, export_format='csv', delimiter=','):
+    """Gerador dos blocos do arquivo exportado (str para CSV, bytes para XLSX)"""
+    header, rows = export_rows(kind, args)
+    if export_format == 'xlsx':
+        return iter_xlsx(header, rows, sheet_name=kind)
+    return iter_csv(header, rows, delimiter=delimiter)
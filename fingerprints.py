@@ -0,0 +1,50 @@
+"""
+Impressão digital (fingerprint) de títulos para detecção de leads duplicados
+Sistema CRM Profissional
+
+O título é normalizado (minúsculas, sem acentos, sem pontuação e sem
+palavras vazias), de modo que "Proposta de Software - João" e
+"proposta software joao" geram o mesmo fingerprint.
+"""
+
+import re
+import unicodedata
+
+# Palavras que não diferenciam um lead de outro
+STOP_WORDS = frozenset({
+    'a', 'ao', 'aos', 'as', 'com', 'da', 'das', 'de', 'do', 'dos', 'e', 'em',
+    'na', 'nas', 'no', 'nos', 'o', 'os', 'ou', 'para', 'pela', 'pelas', 'pelo',
+    'pelos', 'por', 'pra', 'um', 'uma', 'umas', 'uns'
+})
+
+FINGERPRINT_LENGTH = 200
+
+
+def strip_accents(value):
+    """Remove acentos (João -> Joao)"""
+    normalized = unicodedata.normalize('NFKD', value)
+    return ''.join(char for char in normalized if not unicodedata.combining(char))
+
+
+def title_fingerprint(title):
+    """Forma normalizada do título usada na detecção de duplicados"""
+    words = re.findall(r'\w+', strip_accents(title or '').lower())
+    return ' '.join(word for word in words if word not in STOP_WORDS)[:FINGERPRINT_LENGTH]
+
+
+def _trigrams(value):
+    """Trigramas de cada palavra, com o mesmo preenchimento do pg_trgm"""
+    trigrams = set()
+    for word in value.split():
+        padded = f'  {word} '
+        trigrams.update(padded[index:index + 3] for index in range(len(padded) - 2))
+    return trigrams
+
+
+def trigram_similarity(first, second):
+    """Similaridade por trigramas (0 a 1), no mesmo espírito do similarity() do pg_trgm"""
+    first_trigrams, second_trigrams = _trigrams(first), _trigrams(second)
+    if not first_trigrams or not second_trigrams:
+        return 0.0
+    shared = len(first_trigrams & second_trigrams)
+    return shared / len(first_trigrams | second_trigrams)
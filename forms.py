@@ -1,8 +1,10 @@
 from flask_wtf import FlaskForm
-from wtforms import StringField, TextAreaField, SelectField, DateField, DecimalField, PasswordField, BooleanField, DateTimeField
+from wtforms import StringField, TextAreaField, SelectField, DateField, DecimalField, PasswordField, BooleanField, DateTimeField, IntegerField
 from wtforms.validators import DataRequired, Email, Length, Optional, NumberRange, ValidationError
 from wtforms.widgets import TextArea
 import re
+from database import db
+from models import Client, User
 
 class LoginForm(FlaskForm):
     username = StringField('Usuário', validators=[DataRequired(), Length(min=4, max=20)])
@@ -79,8 +81,18 @@ class LeadForm(FlaskForm):
     ], default='media')
     source = StringField('Origem', validators=[Optional(), Length(max=100)])
     expected_close_date = DateField('Data Esperada de Fechamento', validators=[Optional()])
-    client_id = SelectField('Cliente', coerce=int, validators=[Optional()])
-    user_id = SelectField('Responsável', coerce=int, validators=[DataRequired()])
+    # IDs preenchidos pelos campos de busca rápida (/api/lookup/clients e /api/lookup/users)
+    client_id = IntegerField('Cliente', validators=[Optional()])
+    user_id = IntegerField('Responsável', validators=[DataRequired()])
+    
+    def validate_client_id(self, field):
+        if field.data and db.session.get(Client, field.data) is None:
+            raise ValidationError('Cliente não encontrado')
+    
+    def validate_user_id(self, field):
+        user = db.session.get(User, field.data)
+        if user is None or not user.active:
+            raise ValidationError('Responsável não encontrado ou inativo')
 
 class TaskForm(FlaskForm):
     title = StringField('Título', validators=[DataRequired(), Length(max=200)])
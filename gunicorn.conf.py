@@ -0,0 +1,62 @@
+"""
+Configuração do gunicorn (gunicorn -c gunicorn.conf.py wsgi:app)
+Sistema CRM Profissional
+
+Todos os valores podem ser ajustados por variáveis de ambiente.
+"""
+
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+bind = f"{os.environ.get('HOST', '0.0.0.0')}:{os.environ.get('PORT', '8000')}"
+
+# Processos e threads por processo (gthread quando houver mais de uma thread)
+workers = int(os.environ.get('WEB_CONCURRENCY', multiprocessing.cpu_count() * 2 + 1))
+threads = int(os.environ.get('WEB_THREADS', 4))
+worker_class = 'gthread' if threads > 1 else 'sync'
+
+# Carrega a aplicação uma vez no processo master (menos memória, boot mais rápido)
+preload_app = os.environ.get('WEB_PRELOAD', 'true').lower() in ('1', 'true', 'yes')
+
+timeout = int(os.environ.get('WEB_TIMEOUT', 60))
+graceful_timeout = 30
+keepalive = 5
+
+# Recicla os workers periodicamente (limita vazamentos de memória)
+max_requests = int(os.environ.get('WEB_MAX_REQUESTS', 1000))
+max_requests_jitter = max_requests // 10
+
+accesslog = os.environ.get('WEB_ACCESS_LOG', '-') or None
+errorlog = '-'
+
+# Métricas do Prometheus somadas entre os workers (/metrics). Precisa estar
+# definido antes de a aplicação importar o prometheus_client; um diretório
+# novo a cada início evita somar valores de execuções anteriores.
+_metrics_dir = None
+if not os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+    _metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR'] = tempfile.mkdtemp(prefix='crm-metrics-')
+
+
+def post_fork(server, worker):
+    """Com preload, descarta as conexões herdadas do master: cada worker abre as suas"""
+    from database import db
+    from wsgi import app
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
+
+
+def child_exit(server, worker):
+    """Remove o worker encerrado da soma dos gauges (requisições em andamento)"""
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def on_exit(server):
+    """Apaga o diretório de métricas criado para esta execução"""
+    if _metrics_dir:
+        shutil.rmtree(_metrics_dir, ignore_errors=True)
@@ -0,0 +1,218 @@
+"""
+Importação em massa de clientes e leads via CSV
+Sistema CRM Profissional
+
+O arquivo é lido linha a linha; cada linha passa pelas mesmas regras dos
+formulários (ClientForm / LeadForm, incluindo validate_cpf_cnpj). As linhas
+válidas são inseridas em lotes (executemany) com commit periódico e as
+inválidas vão para um arquivo de rejeitados com o número da linha e o erro.
+"""
+
+import csv
+import re
+import time
+from sqlalchemy import insert
+from werkzeug.datastructures import MultiDict
+from database import db
+from exporter import FORMULA_PREFIXES
+from forms import ClientForm, LeadForm
+from models import Client, Lead, User
+
+# Linhas por INSERT em lote e lotes por commit
+IMPORT_BATCH_SIZE = 1000
+IMPORT_COMMIT_EVERY = 10
+
+CLIENT_FIELDS = ['name', 'email', 'phone', 'document', 'document_type', 'address',
+                 'city', 'state', 'zip_code', 'status', 'notes']
+LEAD_FIELDS = ['title', 'description', 'value', 'status', 'priority', 'source', 'expected_close_date']
+
+
+class LeadImportForm(LeadForm):
+    """LeadForm sem consultas por linha: cliente e responsável já vêm resolvidos pelo mapa"""
+
+    def validate_client_id(self, field):
+        pass
+
+    def validate_user_id(self, field):
+        pass
+
+
+def _digits(value):
+    return re.sub(r'\D', '', value or '')
+
+
+def _cell(value):
+    """Valor da célula sem espaços nas pontas e sem o apóstrofo que a exportação põe antes de fórmulas"""
+    value = (value or '').strip()
+    if value.startswith("'") and value[1:].startswith(FORMULA_PREFIXES):
+        return value[1:]
+    return value
+
+
+def _form_errors(form):
+    return '; '.join(f"{name}: {', '.join(errors)}" for name, errors in form.errors.items())
+
+
+class CsvImporter:
+    """Pipeline de importação: valida, agrupa em lotes e grava os rejeitados"""
+
+    model = None
+    reject_extra_fields = ['line', 'error']
+
+    def __init__(self, rejects=None, batch_size=IMPORT_BATCH_SIZE, commit_every=IMPORT_COMMIT_EVERY):
+        self.rejects = rejects
+        self.batch_size = batch_size
+        self.commit_every = commit_every
+        self._rejects_writer = None
+        self._batch = []
+        self._batches_since_commit = 0
+        self._form_instance = None
+        self.inserted = 0
+        self.rejected = 0
+
+    def prepare(self):
+        """Carrega o que for necessário antes da leitura (ex.: mapas de referência)"""
+
+    def build_row(self, row):
+        """Valida a linha; retorna (dict para inserção, None) ou (None, erro)"""
+        raise NotImplementedError
+
+    def _form(self, form_class, formdata):
+        """Reaproveita uma única instância do formulário, reprocessando os dados de cada linha"""
+        if self._form_instance is None:
+            self._form_instance = form_class(formdata=formdata, meta={'csrf': False})
+        else:
+            self._form_instance.process(formdata)
+        return self._form_instance
+
+    def run(self, stream, delimiter=','):
+        started = time.perf_counter()
+        self.prepare()
+        reader = csv.DictReader(stream, delimiter=delimiter)
+        reader.fieldnames = [name.strip().lower() for name in (reader.fieldnames or [])]
+
+        for line, row in enumerate(reader, start=2):
+            row = {key: _cell(value) for key, value in row.items() if key}
+            values, error = self.build_row(row)
+            if error:
+                self._reject(reader.fieldnames, row, line, error)
+                continue
+            self._batch.append(values)
+            if len(self._batch) >= self.batch_size:
+                self._flush()
+
+        self._flush(commit=True)
+        elapsed = time.perf_counter() - started
+        total = self.inserted + self.rejected
+
+        return {
+            'success': True,
+            'processed': total,
+            'inserted': self.inserted,
+            'rejected': self.rejected,
+            'elapsed_seconds': round(elapsed, 2),
+            'rows_per_second': round(total / elapsed, 1) if elapsed > 0 else total
+        }
+
+    def _flush(self, commit=False):
+        if self._batch:
+            # render_nulls: campos opcionais vazios (None) não dividem o lote em
+            # vários INSERTs (o ORM agrupa as linhas pelas chaves não nulas)
+            db.session.execute(insert(self.model).execution_options(render_nulls=True), self._batch)
+            self.inserted += len(self._batch)
+            self._batch = []
+            self._batches_since_commit += 1
+        if commit or self._batches_since_commit >= self.commit_every:
+            db.session.commit()
+            self._batches_since_commit = 0
+
+    def _reject(self, fieldnames, row, line, error):
+        self.rejected += 1
+        if self.rejects is None:
+            return
+        if self._rejects_writer is None:
+            self._rejects_writer = csv.DictWriter(
+                self.rejects, fieldnames=self.reject_extra_fields + list(fieldnames), extrasaction='ignore'
+            )
+            self._rejects_writer.writeheader()
+        self._rejects_writer.writerow(dict(row, line=line, error=error))
+
+
+class ClientImporter(CsvImporter):
+    """Importa clientes (colunas: name, email, phone, document, document_type, ...)"""
+
+    model = Client
+
+    def build_row(self, row):
+        data = MultiDict({field: row.get(field, '') for field in CLIENT_FIELDS})
+        if not data.get('status'):
+            data['status'] = 'ativo'
+        form = self._form(ClientForm, data)
+        if not form.validate():
+            return None, _form_errors(form)
+        return {field: (getattr(form, field).data or None) for field in CLIENT_FIELDS}, None
+
+
+class LeadImporter(CsvImporter):
+    """
+    Importa leads (colunas: title, description, value, status, priority,
+    source, expected_close_date, client_document ou client_email, user)
+
+    Clientes (por documento ou e-mail) e responsáveis (por usuário ou e-mail)
+    são resolvidos por mapas carregados uma única vez.
+    """
+
+    model = Lead
+
+    def __init__(self, default_user_id=None, **kwargs):
+        super().__init__(**kwargs)
+        self.default_user_id = default_user_id
+        self.clients_by_document = {}
+        self.clients_by_email = {}
+        self.users = {}
+
+    def prepare(self):
+        for client_id, document, email in db.session.query(Client.id, Client.document, Client.email).yield_per(10000):
+            if document:
+                self.clients_by_document[_digits(document)] = client_id
+            if email:
+                self.clients_by_email[email.lower()] = client_id
+        for user_id, username, email in db.session.query(User.id, User.username, User.email).filter(User.active == True):
+            self.users[username.lower()] = user_id
+            self.users[email.lower()] = user_id
+
+    def build_row(self, row):
+        client_id = None
+        if row.get('client_document'):
+            client_id = self.clients_by_document.get(_digits(row['client_document']))
+            if client_id is None:
+                return None, f"cliente não encontrado: {row['client_document']}"
+        elif row.get('client_email'):
+            client_id = self.clients_by_email.get(row['client_email'].lower())
+            if client_id is None:
+                return None, f"cliente não encontrado: {row['client_email']}"
+
+        user_id = self.default_user_id
+        if row.get('user'):
+            user_id = self.users.get(row['user'].lower())
+            if user_id is None:
+                return None, f"responsável não encontrado: {row['user']}"
+
+        data = MultiDict({field: row.get(field, '') for field in LEAD_FIELDS})
+        data['status'] = data.get('status') or 'novo'
+        data['priority'] = data.get('priority') or 'media'
+        data['client_id'] = str(client_id or '')
+        data['user_id'] = str(user_id or '')
+        form = self._form(LeadImportForm, data)
+        if not form.validate():
+            return None, _form_errors(form)
+
+        values = {field: getattr(form, field).data for field in LEAD_FIELDS}
+        values.update(client_id=client_id, user_id=user_id)
+        return values, None
+
+
+IMPORTERS = {
+    'clients': ClientImporter,
+    'leads': LeadImporter
+}
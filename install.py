@@ -43,7 +43,8 @@ def main():
         ("pip install WTForms>=3.0.0", "Instalando WTForms"),
         ("pip install Werkzeug>=2.3.0", "Instalando Werkzeug"),
         ("pip install python-dotenv>=1.0.0", "Instalando python-dotenv"),
-        ("pip install email-validator>=2.0.0", "Instalando email-validator")
+        ("pip install email-validator>=2.0.0", "Instalando email-validator"),
+        ("pip install prometheus-client>=0.17.0", "Instalando prometheus-client")
     ]
     
     success = True
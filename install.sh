@@ -36,6 +36,7 @@ pip install WTForms>=3.0.0
 pip install Werkzeug>=2.3.0
 pip install python-dotenv>=1.0.0
 pip install email-validator>=2.0.0
+pip install prometheus-client>=0.17.0
 
 echo ""
 echo "🎉 Instalação concluída!"
@@ -0,0 +1,358 @@
+"""
+Fila de jobs em segundo plano (tabela jobs)
+Sistema CRM Profissional
+
+As rotas só enfileiram eventos (`job_queue.enqueue('lead_status_changed',
+{...})`) na mesma transação da alteração e respondem; as automações
+registradas com `@job_queue.handler(nome)` rodam depois, fora da requisição:
+
+- no processo `flask run-jobs` (produção: um ou mais, em qualquer máquina);
+- ou numa thread do próprio app (JOBS_IN_PROCESS=true, padrão no
+  desenvolvimento), acordada logo após o commit que enfileirou o job.
+
+Cada job roda numa transação: os efeitos do handler e a conclusão do job
+são gravados juntos, e a conclusão só vale se o job ainda estiver reservado
+pelo mesmo lote (um job retomado de um processo travado não é aplicado duas
+vezes). Falhas são repetidas com espera exponencial até JOBS_MAX_ATTEMPTS.
+Jobs com `key` (chave de idempotência) são enfileirados uma única vez.
+
+Jobs concluídos ou com falha são apagados depois de JOBS_RETENTION_DAYS
+(no máximo uma limpeza por hora em cada processo, quando a fila esvazia).
+"""
+
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from sqlalchemy import and_, delete, event, func, insert, or_, select, update
+from sqlalchemy.dialects import postgresql, sqlite
+from database import db
+from models import Job
+from metrics import JOBS_PROCESSED
+
+JOB_STATUSES = ['pendente', 'executando', 'concluido', 'falhou']
+FINISHED_STATUSES = ['concluido', 'falhou']
+
+# Segundos entre limpezas de jobs antigos e jobs apagados por comando DELETE
+PURGE_INTERVAL = 3600
+PURGE_BATCH_SIZE = 1000
+
+
+def _insert_ignoring_duplicates(dialect=None):
+    """INSERT que ignora chaves de idempotência repetidas (PostgreSQL/SQLite)"""
+    dialect = dialect or db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        return postgresql.insert(Job).on_conflict_do_nothing(index_elements=['idempotency_key'])
+    if dialect == 'sqlite':
+        return sqlite.insert(Job).on_conflict_do_nothing(index_elements=['idempotency_key'])
+    return insert(Job)
+
+
+class JobQueue:
+    """Enfileira jobs e executa os handlers registrados"""
+
+    def __init__(self, app=None):
+        self.batch_size = 20
+        self.max_attempts = 5
+        self.retry_delay = 30
+        self.max_retry_delay = 3600
+        self.lock_timeout = 300
+        self.poll_interval = 5
+        self.retention_days = 7
+        self.in_process = False
+        self.logger = logging.getLogger(__name__)
+        self._handlers = {}
+        self._lock = threading.Lock()
+        self._wakeup = threading.Event()
+        self._thread = None
+        self._thread_pid = None
+        self._listening = False
+        self._purged_at = None
+        self.completed = 0
+        self.failed = 0
+        self.retried = 0
+        self.purged = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.batch_size = app.config.get('JOBS_BATCH_SIZE', 20)
+        self.max_attempts = app.config.get('JOBS_MAX_ATTEMPTS', 5)
+        self.retry_delay = app.config.get('JOBS_RETRY_DELAY', 30)
+        self.max_retry_delay = app.config.get('JOBS_MAX_RETRY_DELAY', 3600)
+        self.lock_timeout = app.config.get('JOBS_LOCK_TIMEOUT', 300)
+        self.poll_interval = app.config.get('JOBS_POLL_INTERVAL', 5)
+        self.retention_days = app.config.get('JOBS_RETENTION_DAYS', 7)
+        self._purged_at = None
+        self.in_process = app.config.get('JOBS_IN_PROCESS', False)
+        self.logger = app.logger
+        app.extensions['job_queue'] = self
+
+        if not self._listening:
+            event.listen(db.session, 'after_commit', self._after_commit)
+            event.listen(db.session, 'after_rollback', self._after_rollback)
+            self._listening = True
+
+        if self.in_process:
+            # A thread nasce na primeira requisição de cada processo (depois do fork do gunicorn)
+            app.before_request(lambda: self.start_worker_thread(app) if self.in_process else None)
+
+    def handler(self, name):
+        """Registra a função que executa os jobs `name` (recebe o payload)"""
+        def decorator(function):
+            self._handlers[name] = function
+            return function
+        return decorator
+
+    def enqueue(self, name, payload=None, key=None, delay=None):
+        """Enfileira um job na transação atual (sem commit)"""
+        self.enqueue_many(name, [(payload, key)], delay=delay)
+
+    def enqueue_many(self, name, items, delay=None):
+        """
+        Enfileira vários jobs do mesmo tipo num único INSERT em lote
+
+        `items` é uma lista de (payload, chave de idempotência ou None).
+        """
+        if not items:
+            return
+        db.session.execute(_insert_ignoring_duplicates(), self._rows(name, items, delay))
+        db.session.info['jobs_enqueued'] = True
+
+    def enqueue_detached(self, name, payload=None, key=None, delay=None):
+        """
+        Enfileira um job numa transação própria no banco principal
+
+        Para leituras (inclusive as da réplica) que precisam agendar trabalho:
+        a sessão do chamador não é tocada nem confirmada.
+        """
+        engine = db.engine
+        with engine.begin() as connection:
+            connection.execute(_insert_ignoring_duplicates(engine.dialect.name),
+                               self._rows(name, [(payload, key)], delay))
+        self._wakeup.set()
+
+    @staticmethod
+    def _rows(name, items, delay):
+        run_at = datetime.utcnow() + timedelta(seconds=delay or 0)
+        return [
+            {
+                'name': name,
+                'payload': json.dumps(payload or {}, default=str),
+                'idempotency_key': key,
+                'status': 'pendente',
+                'attempts': 0,
+                'run_at': run_at,
+                'created_at': datetime.utcnow()
+            } for payload, key in items
+        ]
+
+    def retry_delay_for(self, attempts):
+        """Espera (segundos) antes da próxima tentativa depois de `attempts` falhas"""
+        return min(self.retry_delay * 2 ** max(attempts - 1, 0), self.max_retry_delay)
+
+    def _ready(self, now):
+        """Jobs prontos: pendentes já vencidos ou presos em um processo parado"""
+        return or_(
+            and_(Job.status == 'pendente', Job.run_at <= now),
+            and_(Job.status == 'executando', Job.locked_at < now - timedelta(seconds=self.lock_timeout))
+        )
+
+    def _ready_query(self, now, limit=None):
+        """Ids do próximo lote, na ordem de execução (também usada por query_plans)"""
+        query = db.session.query(Job.id).filter(self._ready(now))
+        return query.order_by(Job.run_at, Job.id).limit(limit or self.batch_size)
+
+    def claim(self, limit=None):
+        """
+        Reserva um lote de jobs prontos (pendentes ou presos em um processo parado)
+
+        Retorna tuplas (id, nome, payload, tentativas, token).
+        """
+        now = datetime.utcnow()
+        ready = self._ready(now)
+        query = self._ready_query(now, limit)
+        if db.session.get_bind().dialect.name == 'postgresql':
+            query = query.with_for_update(skip_locked=True)
+
+        ids = [job_id for job_id, in query]
+        if not ids:
+            db.session.commit()
+            return []
+
+        token = uuid.uuid4().hex
+        db.session.execute(
+            update(Job)
+            .where(Job.id.in_(ids), ready)
+            .values(status='executando', lock_token=token, locked_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return db.session.query(Job.id, Job.name, Job.payload, Job.attempts, Job.lock_token).filter(
+            Job.lock_token == token
+        ).order_by(Job.id).all()
+
+    def _finish(self, job, **values):
+        """Atualiza o job se ele ainda pertence ao lote; False se outro processo o retomou"""
+        return db.session.execute(
+            update(Job)
+            .where(Job.id == job.id, Job.lock_token == job.lock_token)
+            .values(attempts=job.attempts + 1, lock_token=None, **values)
+            .execution_options(synchronize_session=False)
+        ).rowcount == 1
+
+    def execute(self, job):
+        """Executa um job reservado; retorna o status final"""
+        handler = self._handlers.get(job.name)
+        try:
+            if handler is None:
+                raise LookupError(f'Nenhum handler registrado para {job.name}')
+            handler(json.loads(job.payload or '{}'))
+            if not self._finish(job, status='concluido', finished_at=datetime.utcnow(), last_error=None):
+                db.session.rollback()
+                self.logger.warning('Job %s foi retomado por outro processo; resultado descartado', job.id)
+                return None
+            db.session.commit()
+            with self._lock:
+                self.completed += 1
+            JOBS_PROCESSED.labels(name=job.name, status='concluido').inc()
+            return 'concluido'
+        except Exception as exc:
+            db.session.rollback()
+            error = f'{type(exc).__name__}: {exc}'[:1000]
+            if isinstance(exc, LookupError) or job.attempts + 1 >= self.max_attempts:
+                status, values = 'falhou', {'finished_at': datetime.utcnow()}
+                self.logger.exception('Job %s (%s) falhou após %s tentativa(s)', job.id, job.name, job.attempts + 1)
+            else:
+                status = 'pendente'
+                values = {'run_at': datetime.utcnow() + timedelta(seconds=self.retry_delay_for(job.attempts + 1))}
+                self.logger.warning('Job %s (%s) falhou, nova tentativa agendada: %s', job.id, job.name, error)
+            if self._finish(job, status=status, last_error=error, **values):
+                db.session.commit()
+                with self._lock:
+                    if status == 'falhou':
+                        self.failed += 1
+                    else:
+                        self.retried += 1
+                JOBS_PROCESSED.labels(name=job.name, status=status).inc()
+            else:
+                db.session.rollback()
+            return status
+
+    def run_pending(self):
+        """Executa um lote de jobs; retorna quantos foram reservados"""
+        jobs = self.claim()
+        for job in jobs:
+            self.execute(job)
+        return len(jobs)
+
+    def purge_finished(self, now=None):
+        """
+        Apaga os jobs concluídos ou com falha há mais de `retention_days` dias
+
+        Em lotes de PURGE_BATCH_SIZE (um commit por lote); a condição em
+        run_at usa o índice (status, run_at). Retorna quantos foram apagados.
+        """
+        if not self.retention_days:
+            return 0
+        cutoff = (now or datetime.utcnow()) - timedelta(days=self.retention_days)
+        finished = and_(Job.status.in_(FINISHED_STATUSES), Job.run_at < cutoff, Job.finished_at < cutoff)
+        total = 0
+        while True:
+            ids = select(Job.id).where(finished).limit(PURGE_BATCH_SIZE).scalar_subquery()
+            deleted = db.session.execute(
+                delete(Job).where(Job.id.in_(ids)).execution_options(synchronize_session=False)
+            ).rowcount
+            db.session.commit()
+            total += deleted
+            if deleted < PURGE_BATCH_SIZE:
+                break
+        with self._lock:
+            self.purged += total
+        return total
+
+    def _purge_if_due(self):
+        """Limpeza dos jobs antigos, no máximo uma vez por PURGE_INTERVAL neste processo"""
+        now = time.monotonic()
+        if self._purged_at is not None and now - self._purged_at < PURGE_INTERVAL:
+            return 0
+        self._purged_at = now
+        return self.purge_finished()
+
+    def run(self, once=False, poll_interval=None):
+        """Laço do processo de jobs: lotes seguidos enquanto houver fila, depois aguarda"""
+        poll_interval = self.poll_interval if poll_interval is None else poll_interval
+        total = 0
+        while True:
+            processed = self.run_pending()
+            total += processed
+            if processed < self.batch_size:
+                self._purge_if_due()
+                if once:
+                    return total
+                db.session.remove()
+                time.sleep(poll_interval)
+
+    def start_worker_thread(self, app):
+        """Inicia (uma vez por processo) a thread que executa os jobs dentro do app"""
+        if self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is not None and self._thread_pid == os.getpid() and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._worker_loop, args=(app,), name='job-queue', daemon=True)
+            self._thread_pid = os.getpid()
+            self._thread.start()
+
+    def _worker_loop(self, app):
+        with app.app_context():
+            while True:
+                processed = 0
+                try:
+                    processed = self.run_pending()
+                    if processed < self.batch_size:
+                        self._purge_if_due()
+                except Exception:
+                    self.logger.exception('Erro no processamento da fila de jobs')
+                finally:
+                    db.session.remove()
+                if processed < self.batch_size:
+                    self._wakeup.wait(self.poll_interval)
+                    self._wakeup.clear()
+
+    def stats(self):
+        """Profundidade da fila por status e contadores deste processo"""
+        rows = db.session.query(Job.status, func.count(Job.id), func.min(Job.run_at)).group_by(Job.status).all()
+        depth = {status: 0 for status in JOB_STATUSES}
+        oldest_pending = None
+        for status, count, oldest in rows:
+            depth[status] = count
+            if status == 'pendente':
+                oldest_pending = oldest
+
+        with self._lock:
+            return {
+                'depth': depth,
+                'oldest_pending_age': max(round((datetime.utcnow() - oldest_pending).total_seconds(), 1), 0)
+                if oldest_pending else 0,
+                'completed': self.completed,
+                'failed': self.failed,
+                'retried': self.retried,
+                'purged': self.purged,
+                'handlers': sorted(self._handlers),
+                'in_process': self.in_process
+            }
+
+    # Eventos da sessão: acorda a thread assim que os jobs enfileirados são gravados
+    def _after_commit(self, session):
+        if session.info.pop('jobs_enqueued', False):
+            self._wakeup.set()
+
+    def _after_rollback(self, session):
+        session.info.pop('jobs_enqueued', None)
+
+
+job_queue = JobQueue()
@@ -4,9 +4,47 @@ Sistema CRM Profissional
 """
 
 from datetime import datetime, timedelta
-from sqlalchemy import func, and_, or_
+from flask import current_app
+from sqlalchemy import func, and_, or_, case, insert, update, select, union_all, false
+from sqlalchemy.orm import joinedload
 from database import db
-from models import Lead, Client, User, Task, Interaction
+from fingerprints import title_fingerprint, trigram_similarity
+from models import Lead, Client, User, Task, Interaction, StageProbability, LeadDailyStat
+from sql_functions import month_bucket, days_between
+from pagination import encode_cursor, decode_cursor, keyset_filter
+from workflow_templates import task_templates
+from lead_rollups import lead_rollups
+from db_routing import read_replica
+from jobs import job_queue
+from metrics import LEADS_CREATED, LEAD_STATUS_TRANSITIONS, AUTOMATIC_TASKS, label_value
+
+# Status considerados "em aberto" no pipeline
+ACTIVE_STATUSES = ['novo', 'qualificado', 'proposta', 'negociacao']
+
+# Colunas do quadro do pipeline, na ordem de exibição
+PIPELINE_STATUSES = ACTIVE_STATUSES + ['fechado', 'perdido']
+
+# Limite de leads por operação de mudança de status em lote
+BULK_STATUS_LIMIT = 1000
+
+# Probabilidades de fechamento usadas enquanto a tabela stage_probabilities estiver vazia
+DEFAULT_STAGE_PROBABILITIES = {
+    'qualificado': 0.3,
+    'proposta': 0.6,
+    'negociacao': 0.8
+}
+
+# Duplicados devolvidos na criação de um lead e leads do mesmo cliente
+# comparados por similaridade (fora do PostgreSQL)
+DEDUP_CANDIDATE_LIMIT = 5
+DEDUP_SCAN_LIMIT = 500
+
+# Quantidade de leads por página nos detalhes da previsão de receita
+FORECAST_PAGE_SIZE = 50
+
+# Linhas lidas do banco por lote nas respostas em streaming
+STREAM_BATCH_SIZE = 1000
+
 
 class LeadManager:
     """Gerenciador profissional de leads com funcionalidades avançadas"""
@@ -21,16 +59,14 @@ class LeadManager:
             if not data.get('title') or not data.get('title').strip():
                 return {'success': False, 'error': 'Título é obrigatório'}
             
-            # Verificar se já existe lead similar
-            existing = Lead.query.filter(
-                and_(
-                    Lead.title.ilike(f"%{data['title']}%"),
-                    Lead.client_id == data.get('client_id') if data.get('client_id') else True
-                )
-            ).first()
+            # Verificar se já existe lead similar (mesmo fingerprint no mesmo cliente)
+            duplicates = LeadManager.find_duplicate_leads(
+                data['title'], data.get('client_id'),
+                min_similarity=current_app.config.get('LEAD_DEDUP_SIMILARITY')
+            )
             
-            if existing:
-                return {'success': False, 'error': 'Lead similar já existe'}
+            if duplicates:
+                return {'success': False, 'error': 'Lead similar já existe', 'duplicates': duplicates}
             
             # Criar lead
             lead = Lead(
@@ -46,10 +82,17 @@ class LeadManager:
             )
             
             db.session.add(lead)
-            db.session.commit()
+            db.session.flush()
             
-            # Criar tarefa automática de follow-up
-            LeadManager.create_followup_task(lead.id, user_id)
+            # Tarefa automática de follow-up: criada em segundo plano (job lead_created)
+            job_queue.enqueue('lead_created', {
+                'lead_id': lead.id,
+                'user_id': user_id,
+                'created_at': datetime.now().isoformat()
+            }, key=f'lead_created:{lead.id}')
+            
+            db.session.commit()
+            LEADS_CREATED.inc()
             
             return {'success': True, 'lead': lead, 'message': 'Lead criado com sucesso'}
             
@@ -57,6 +100,71 @@ class LeadManager:
             db.session.rollback()
             return {'success': False, 'error': f'Erro ao criar lead: {str(e)}'}
     
+    @staticmethod
+    def find_duplicate_leads(title, client_id=None, min_similarity=None, limit=DEDUP_CANDIDATE_LIMIT):
+        """
+        Leads do mesmo cliente (ou sem cliente) com título equivalente
+        
+        A busca exata usa o índice (client_id, title_fingerprint). Com
+        min_similarity (0 a 1) também entram títulos parecidos, pontuados por
+        trigramas: no PostgreSQL pelo pg_trgm (operador % sobre o índice GIN),
+        nos demais bancos em Python sobre os últimos DEDUP_SCAN_LIMIT leads do
+        cliente.
+        """
+        fingerprint = title_fingerprint(title)
+        if not fingerprint:
+            return []
+        
+        same_client = Lead.client_id == client_id if client_id else Lead.client_id.is_(None)
+        columns = (Lead.id, Lead.title, Lead.client_id, Lead.status)
+        
+        candidates = {
+            row.id: (row, 1.0) for row in db.session.query(*columns).filter(
+                same_client, Lead.title_fingerprint == fingerprint
+            ).limit(limit)
+        }
+        
+        if min_similarity and len(candidates) < limit:
+            if db.session.get_bind().dialect.name == 'postgresql':
+                # O limite do operador % vale só para esta transação
+                db.session.execute(select(func.set_config('pg_trgm.similarity_threshold', str(min_similarity), True)))
+                rows = LeadManager._similar_titles_query(fingerprint, same_client, limit)
+                scored = [(row, float(row.score)) for row in rows]
+            else:
+                rows = db.session.query(*columns, Lead.title_fingerprint).filter(same_client).order_by(
+                    Lead.created_at.desc()
+                ).limit(DEDUP_SCAN_LIMIT)
+                scored = [(row, trigram_similarity(fingerprint, row.title_fingerprint or '')) for row in rows]
+                scored = [item for item in scored if item[1] >= min_similarity]
+            
+            for row, score in sorted(scored, key=lambda item: item[1], reverse=True):
+                candidates.setdefault(row.id, (row, score))
+        
+        ranked = sorted(candidates.values(), key=lambda item: item[1], reverse=True)[:limit]
+        return [
+            {
+                'id': row.id,
+                'title': row.title,
+                'client_id': row.client_id,
+                'status': row.status,
+                'score': round(score, 3)
+            } for row, score in ranked
+        ]
+    
+    @staticmethod
+    def _similar_titles_query(fingerprint, same_client, limit):
+        """
+        Leads com fingerprint parecido (PostgreSQL): o operador % (acima de
+        pg_trgm.similarity_threshold) usa o índice GIN de trigramas
+        ix_leads_title_fingerprint_trgm; só os candidatos do índice são pontuados
+        """
+        score = func.similarity(Lead.title_fingerprint, fingerprint)
+        return db.session.query(
+            Lead.id, Lead.title, Lead.client_id, Lead.status, score.label('score')
+        ).filter(
+            same_client, Lead.title_fingerprint.op('%')(fingerprint)
+        ).order_by(score.desc()).limit(limit)
+    
     @staticmethod
     def update_lead_status(lead_id, new_status, user_id, notes=None):
         """
@@ -84,17 +192,15 @@ class LeadManager:
             
             db.session.add(interaction)
             
-            # Criar tarefas automáticas baseadas no status
-            if new_status == 'qualificado':
-                LeadManager.create_qualification_tasks(lead_id, user_id)
-            elif new_status == 'proposta':
-                LeadManager.create_proposal_tasks(lead_id, user_id)
-            elif new_status == 'negociacao':
-                LeadManager.create_negotiation_tasks(lead_id, user_id)
-            elif new_status == 'fechado':
-                LeadManager.create_post_sale_tasks(lead_id, user_id)
+            # Tarefas automáticas do status: criadas em segundo plano (job lead_status_changed)
+            job_queue.enqueue(
+                'lead_status_changed',
+                LeadManager._status_change_payload(lead.id, old_status, new_status, user_id),
+                key=f'lead_status_changed:{lead.id}:{lead.updated_at.isoformat()}'
+            )
             
             db.session.commit()
+            LEAD_STATUS_TRANSITIONS.labels(to_status=label_value(new_status, PIPELINE_STATUSES)).inc()
             
             return {'success': True, 'message': f'Status atualizado para {new_status}'}
             
@@ -103,222 +209,287 @@ class LeadManager:
             return {'success': False, 'error': f'Erro ao atualizar status: {str(e)}'}
     
     @staticmethod
-    def create_followup_task(lead_id, user_id):
-        """Cria tarefa automática de follow-up"""
-        try:
-            lead = Lead.query.get(lead_id)
-            task = Task(
-                title=f'Follow-up: {lead.title}',
-                description=f'Fazer contato inicial com o lead {lead.title}',
-                due_date=datetime.now() + timedelta(days=1),
-                status='pendente',
-                priority='alta',
-                user_id=user_id,
-                lead_id=lead_id,
-                client_id=lead.client_id
-            )
-            db.session.add(task)
-            return True
-        except:
-            return False
+    def create_followup_task(lead_id, user_id, now=None):
+        """
+        Cria tarefa automática de follow-up (sem commit)
+        
+        Retorna a tarefa ou None se o lead não existe mais.
+        """
+        lead = Lead.query.get(lead_id)
+        if lead is None:
+            return None
+        
+        task = Task(
+            title=f'Follow-up: {lead.title}',
+            description=f'Fazer contato inicial com o lead {lead.title}',
+            due_date=(now or datetime.now()) + timedelta(days=1),
+            status='pendente',
+            priority='alta',
+            user_id=user_id,
+            lead_id=lead_id,
+            client_id=lead.client_id
+        )
+        db.session.add(task)
+        return task
+    
+    @staticmethod
+    def _status_change_payload(lead_id, old_status, new_status, user_id, changed_at=None):
+        """Payload do job lead_status_changed (prazos contados a partir da mudança)"""
+        return {
+            'lead_id': lead_id,
+            'old_status': old_status,
+            'new_status': new_status,
+            'user_id': user_id,
+            'changed_at': (changed_at or datetime.now()).isoformat()
+        }
+    
+    @staticmethod
+    def build_status_tasks(lead, new_status, user_id, now=None):
+        """
+        Monta as linhas (dicts) das tarefas automáticas de um status,
+        prontas para inserção em lote
+        """
+        return task_templates.build_rows(lead, new_status, user_id, now)
+    
+    @staticmethod
+    def create_status_tasks(lead, new_status, user_id):
+        """Insere em lote as tarefas automáticas do status informado"""
+        rows = LeadManager.build_status_tasks(lead, new_status, user_id)
+        if rows:
+            db.session.execute(insert(Task).execution_options(render_nulls=True), rows)
+        return len(rows)
     
     @staticmethod
     def create_qualification_tasks(lead_id, user_id):
         """Cria tarefas para lead qualificado"""
-        lead = Lead.query.get(lead_id)
-        tasks = [
-            {
-                'title': f'Qualificar necessidades: {lead.title}',
-                'description': 'Identificar necessidades específicas do cliente',
-                'days': 2,
-                'priority': 'alta'
-            },
-            {
-                'title': f'Análise de orçamento: {lead.title}',
-                'description': 'Verificar orçamento disponível do cliente',
-                'days': 3,
-                'priority': 'media'
-            }
-        ]
-        
-        for task_data in tasks:
-            task = Task(
-                title=task_data['title'],
-                description=task_data['description'],
-                due_date=datetime.now() + timedelta(days=task_data['days']),
-                status='pendente',
-                priority=task_data['priority'],
-                user_id=user_id,
-                lead_id=lead_id,
-                client_id=lead.client_id
-            )
-            db.session.add(task)
+        LeadManager.create_status_tasks(Lead.query.get(lead_id), 'qualificado', user_id)
     
     @staticmethod
     def create_proposal_tasks(lead_id, user_id):
         """Cria tarefas para proposta"""
-        lead = Lead.query.get(lead_id)
-        tasks = [
-            {
-                'title': f'Elaborar proposta: {lead.title}',
-                'description': 'Criar proposta comercial detalhada',
-                'days': 3,
-                'priority': 'alta'
-            },
-            {
-                'title': f'Enviar proposta: {lead.title}',
-                'description': 'Enviar proposta para o cliente',
-                'days': 5,
-                'priority': 'alta'
-            },
-            {
-                'title': f'Follow-up proposta: {lead.title}',
-                'description': 'Verificar se cliente recebeu e analisar proposta',
-                'days': 7,
-                'priority': 'media'
-            }
-        ]
-        
-        for task_data in tasks:
-            task = Task(
-                title=task_data['title'],
-                description=task_data['description'],
-                due_date=datetime.now() + timedelta(days=task_data['days']),
-                status='pendente',
-                priority=task_data['priority'],
-                user_id=user_id,
-                lead_id=lead_id,
-                client_id=lead.client_id
-            )
-            db.session.add(task)
+        LeadManager.create_status_tasks(Lead.query.get(lead_id), 'proposta', user_id)
     
     @staticmethod
     def create_negotiation_tasks(lead_id, user_id):
         """Cria tarefas para negociação"""
-        lead = Lead.query.get(lead_id)
-        task = Task(
-            title=f'Negociar condições: {lead.title}',
-            description='Negociar preços, prazos e condições comerciais',
-            due_date=datetime.now() + timedelta(days=2),
-            status='pendente',
-            priority='alta',
-            user_id=user_id,
-            lead_id=lead_id,
-            client_id=lead.client_id
-        )
-        db.session.add(task)
+        LeadManager.create_status_tasks(Lead.query.get(lead_id), 'negociacao', user_id)
     
     @staticmethod
     def create_post_sale_tasks(lead_id, user_id):
         """Cria tarefas pós-venda"""
-        lead = Lead.query.get(lead_id)
-        tasks = [
-            {
-                'title': f'Onboarding cliente: {lead.title}',
-                'description': 'Processo de integração do novo cliente',
-                'days': 1,
-                'priority': 'alta'
-            },
-            {
-                'title': f'Follow-up satisfação: {lead.title}',
-                'description': 'Verificar satisfação do cliente após fechamento',
-                'days': 7,
-                'priority': 'media'
-            }
-        ]
+        LeadManager.create_status_tasks(Lead.query.get(lead_id), 'fechado', user_id)
+    
+    @staticmethod
+    def bulk_update_lead_status(lead_ids, new_status, user_id, notes=None, owner_id=None):
+        """
+        Atualiza o status de vários leads em uma única transação
         
-        for task_data in tasks:
-            task = Task(
-                title=task_data['title'],
-                description=task_data['description'],
-                due_date=datetime.now() + timedelta(days=task_data['days']),
-                status='pendente',
-                priority=task_data['priority'],
-                user_id=user_id,
-                lead_id=lead_id,
-                client_id=lead.client_id
-            )
-            db.session.add(task)
+        O status é alterado com um único UPDATE; as interações de histórico e
+        as tarefas automáticas são inseridas em lote (executemany). Se
+        `owner_id` for informado, apenas leads desse responsável são alterados.
+        Retorna o resultado individual de cada lead.
+        """
+        try:
+            if new_status not in PIPELINE_STATUSES:
+                return {'success': False, 'error': 'Status inválido'}
+            
+            if not isinstance(lead_ids, (list, tuple)):
+                return {'success': False, 'error': 'Lista de leads inválida'}
+            lead_ids = list(dict.fromkeys(int(lead_id) for lead_id in lead_ids))
+            if not lead_ids:
+                return {'success': False, 'error': 'Nenhum lead informado'}
+            if len(lead_ids) > BULK_STATUS_LIMIT:
+                return {'success': False, 'error': f'Máximo de {BULK_STATUS_LIMIT} leads por operação'}
+            
+            leads = {
+                lead.id: lead for lead in db.session.query(
+                    Lead.id, Lead.title, Lead.status, Lead.client_id, Lead.user_id, Lead.created_at
+                ).filter(Lead.id.in_(lead_ids)).all()
+            }
+            
+            results = []
+            to_update = []
+            for lead_id in lead_ids:
+                lead = leads.get(lead_id)
+                if lead is None:
+                    results.append({'id': lead_id, 'success': False, 'error': 'Lead não encontrado'})
+                elif owner_id and lead.user_id != owner_id:
+                    results.append({'id': lead_id, 'success': False, 'error': 'Sem permissão para alterar este lead'})
+                elif lead.status == new_status:
+                    results.append({'id': lead_id, 'success': False, 'error': f'Lead já está em {new_status}'})
+                else:
+                    to_update.append(lead)
+                    results.append({'id': lead_id, 'success': True, 'old_status': lead.status})
+            
+            if to_update:
+                now = datetime.utcnow()
+                
+                db.session.execute(
+                    update(Lead)
+                    .where(Lead.id.in_([lead.id for lead in to_update]))
+                    .values(status=new_status, updated_at=now)
+                    .execution_options(synchronize_session=False)
+                )
+                # UPDATE em massa não passa pelo flush: recalcula os totais diários afetados
+                lead_rollups.refresh_days({lead.created_at.date() for lead in to_update if lead.created_at})
+                
+                # Registrar interações de mudança de status (render_nulls: leads sem
+                # cliente não quebram o executemany em vários INSERTs)
+                db.session.execute(insert(Interaction).execution_options(render_nulls=True), [
+                    {
+                        'type': 'sistema',
+                        'subject': f'Status alterado: {lead.status} → {new_status}',
+                        'description': notes or f'Status do lead alterado de {lead.status} para {new_status}',
+                        'client_id': lead.client_id,
+                        'lead_id': lead.id,
+                        'user_id': user_id,
+                        'date': now
+                    } for lead in to_update
+                ])
+                
+                # Tarefas automáticas do status: um job por lead, enfileirados em lote
+                changed_at = datetime.now()
+                job_queue.enqueue_many('lead_status_changed', [
+                    (
+                        LeadManager._status_change_payload(lead.id, lead.status, new_status, user_id, changed_at),
+                        f'lead_status_changed:{lead.id}:{now.isoformat()}'
+                    ) for lead in to_update
+                ])
+            
+            db.session.commit()
+            if to_update:
+                LEAD_STATUS_TRANSITIONS.labels(to_status=new_status).inc(len(to_update))
+            
+            return {
+                'success': True,
+                'message': f'{len(to_update)} lead(s) atualizados para {new_status}',
+                'updated': len(to_update),
+                'results': results
+            }
+            
+        except (TypeError, ValueError):
+            db.session.rollback()
+            return {'success': False, 'error': 'Lista de leads inválida'}
+        except Exception as e:
+            db.session.rollback()
+            return {'success': False, 'error': f'Erro ao atualizar status: {str(e)}'}
     
     @staticmethod
+    @read_replica.reads
     def get_lead_analytics(user_id=None, period_days=30):
         """
         Retorna análises profissionais de leads
+        
+        Os dias inteiros do período vêm dos totais diários (lead_daily_stats);
+        só as pontas ainda não consolidadas (o início do período e os dias
+        depois de closed_through) são lidas da tabela leads. Cada métrica sai de uma única
+        consulta (UNION ALL das duas fontes).
         """
         try:
             # Filtro de período
             date_filter = datetime.now() - timedelta(days=period_days)
             
-            # Query base
-            query = Lead.query.filter(Lead.created_at >= date_filter)
-            if user_id:
-                query = query.filter(Lead.user_id == user_id)
-            
-            # Métricas básicas
-            total_leads = query.count()
-            
-            # Leads por status
-            leads_by_status = db.session.query(
-                Lead.status, 
-                func.count(Lead.id).label('count')
-            ).filter(Lead.created_at >= date_filter)
+            # Dias consolidados dentro do período; o resto vem direto de leads.
+            # Somente leitura: os dias que faltam são consolidados por um job
+            closed_through = lead_rollups.closed_through()
+            lead_rollups.schedule_catch_up(closed_through)
+            if closed_through is not None:
+                first_full_day = date_filter.date() + timedelta(days=1)
+                open_from = max(date_filter, datetime.combine(closed_through + timedelta(days=1), datetime.min.time()))
+                rollup_days = and_(LeadDailyStat.day >= first_full_day, LeadDailyStat.day <= closed_through)
+                # Dois intervalos fechados de created_at: com um intervalo aberto o
+                # SQLite (sem ANALYZE) percorre o índice de status inteiro para o GROUP BY
+                raw_filter = or_(
+                    and_(Lead.created_at >= date_filter,
+                         Lead.created_at < datetime.combine(first_full_day, datetime.min.time())),
+                    and_(Lead.created_at >= open_from, Lead.created_at <= datetime.max)
+                )
+            else:
+                rollup_days = false()
+                raw_filter = Lead.created_at >= date_filter
+            
+            # Contagem, soma de valores e duração por status (totais + leads recentes)
+            duration = days_between(Lead.created_at, Lead.updated_at)
+            rollup_stats = select(
+                LeadDailyStat.status,
+                LeadDailyStat.leads_count.label('leads_count'),
+                LeadDailyStat.value_sum.label('value'),
+                LeadDailyStat.duration_days_sum.label('duration_sum'),
+                LeadDailyStat.duration_count.label('duration_count')
+            ).where(rollup_days)
+            raw_stats = select(
+                Lead.status,
+                func.count(Lead.id),
+                func.sum(Lead.value),
+                func.sum(duration),
+                func.count(duration)
+            ).where(raw_filter).group_by(Lead.status)
             
             if user_id:
-                leads_by_status = leads_by_status.filter(Lead.user_id == user_id)
+                rollup_stats = rollup_stats.where(LeadDailyStat.user_id == user_id)
+                raw_stats = raw_stats.where(Lead.user_id == user_id)
+            
+            combined = union_all(rollup_stats, raw_stats).subquery()
+            stats = db.session.query(
+                combined.c.status,
+                func.sum(combined.c.leads_count).label('leads_count'),
+                func.sum(combined.c.value).label('value'),
+                func.sum(combined.c.duration_sum).label('duration_sum'),
+                func.sum(combined.c.duration_count).label('duration_count')
+            ).group_by(combined.c.status).all()
+            
+            leads_by_status = {row.status: row.leads_count for row in stats}
+            value_by_status = {row.status: row.value or 0 for row in stats}
+            closed_stats = next((row for row in stats if row.status == 'fechado'), None)
             
-            leads_by_status = leads_by_status.group_by(Lead.status).all()
+            # Métricas básicas
+            total_leads = sum(leads_by_status.values())
             
             # Taxa de conversão
-            fechados = query.filter(Lead.status == 'fechado').count()
-            perdidos = query.filter(Lead.status == 'perdido').count()
+            fechados = leads_by_status.get('fechado', 0)
+            perdidos = leads_by_status.get('perdido', 0)
             conversion_rate = (fechados / total_leads * 100) if total_leads > 0 else 0
             loss_rate = (perdidos / total_leads * 100) if total_leads > 0 else 0
             
             # Valor total em negociação
-            total_value = db.session.query(func.sum(Lead.value)).filter(
-                Lead.created_at >= date_filter,
-                Lead.status.in_(['novo', 'qualificado', 'proposta', 'negociacao'])
-            )
-            if user_id:
-                total_value = total_value.filter(Lead.user_id == user_id)
-            total_value = total_value.scalar() or 0
+            total_value = sum(value_by_status.get(status, 0) for status in ACTIVE_STATUSES)
             
             # Valor fechado
-            closed_value = db.session.query(func.sum(Lead.value)).filter(
-                Lead.created_at >= date_filter,
-                Lead.status == 'fechado'
-            )
-            if user_id:
-                closed_value = closed_value.filter(Lead.user_id == user_id)
-            closed_value = closed_value.scalar() or 0
+            closed_value = value_by_status.get('fechado', 0)
             
             # Tempo médio de conversão
-            avg_conversion_time = db.session.query(
-                func.avg(func.julianday(Lead.updated_at) - func.julianday(Lead.created_at))
-            ).filter(
-                Lead.created_at >= date_filter,
-                Lead.status == 'fechado'
+            avg_conversion_time = (
+                float(closed_stats.duration_sum or 0) / closed_stats.duration_count
+                if closed_stats and closed_stats.duration_count else 0
             )
-            if user_id:
-                avg_conversion_time = avg_conversion_time.filter(Lead.user_id == user_id)
-            avg_conversion_time = avg_conversion_time.scalar() or 0
             
-            # Top performers
+            # Top performers (mesma combinação totais + leads recentes)
+            closed_by_user = union_all(
+                select(
+                    LeadDailyStat.user_id,
+                    LeadDailyStat.leads_count.label('leads_count'),
+                    LeadDailyStat.value_sum.label('value')
+                ).where(rollup_days, LeadDailyStat.status == 'fechado'),
+                select(
+                    Lead.user_id,
+                    func.count(Lead.id),
+                    func.sum(Lead.value)
+                ).where(raw_filter, Lead.status == 'fechado').group_by(Lead.user_id)
+            ).subquery()
             top_users = db.session.query(
                 User.first_name,
                 User.last_name,
-                func.count(Lead.id).label('leads_count'),
-                func.sum(Lead.value).label('total_value')
-            ).join(Lead).filter(
-                Lead.created_at >= date_filter,
-                Lead.status == 'fechado'
-            ).group_by(User.id).order_by(func.sum(Lead.value).desc()).limit(5).all()
+                func.sum(closed_by_user.c.leads_count).label('leads_count'),
+                func.sum(closed_by_user.c.value).label('total_value')
+            ).join(closed_by_user, closed_by_user.c.user_id == User.id).group_by(User.id).order_by(
+                func.sum(closed_by_user.c.value).desc()
+            ).limit(5).all()
             
             return {
                 'success': True,
                 'analytics': {
                     'total_leads': total_leads,
-                    'leads_by_status': {status: count for status, count in leads_by_status},
+                    'leads_by_status': leads_by_status,
                     'conversion_rate': round(conversion_rate, 2),
                     'loss_rate': round(loss_rate, 2),
                     'total_value': float(total_value),
@@ -337,6 +508,24 @@ class LeadManager:
         except Exception as e:
             return {'success': False, 'error': f'Erro ao gerar analytics: {str(e)}'}
     
+    @staticmethod
+    @read_replica.reads
+    def get_lead_analytics_version(user_id=None, period_days=30):
+        """
+        Versão dos dados de get_lead_analytics: (quantidade, último
+        updated_at) dos leads criados no período
+        
+        Lead criado, alterado ou removido no período muda a versão; a
+        consulta é respondida pelo índice (created_at, updated_at), sem a
+        agregação. Usada no ETag de /api/leads/analytics.
+        """
+        date_filter = datetime.now() - timedelta(days=period_days)
+        query = db.session.query(func.count(), func.max(Lead.updated_at)).filter(Lead.created_at >= date_filter)
+        if user_id:
+            query = query.filter(Lead.user_id == user_id)
+        count, last_updated = query.one()
+        return count, last_updated
+    
     @staticmethod
     def get_leads_by_priority(user_id=None):
         """Retorna leads ordenados por prioridade e urgência"""
@@ -349,7 +538,10 @@ class LeadManager:
                 query = query.filter(Lead.user_id == user_id)
             
             # Ordenar por prioridade e data de fechamento esperada
-            leads = query.order_by(
+            leads = query.options(
+                joinedload(Lead.client),
+                joinedload(Lead.assigned_user)
+            ).order_by(
                 Lead.priority.desc(),
                 Lead.expected_close_date.asc().nullslast(),
                 Lead.created_at.desc()
@@ -381,50 +573,137 @@ class LeadManager:
             return {'success': False, 'error': f'Erro ao buscar leads: {str(e)}'}
     
     @staticmethod
-    def forecast_revenue(months=3):
-        """Previsão de receita baseada em leads ativos"""
+    def get_stage_probabilities():
+        """Probabilidade de fechamento por status (tabela stage_probabilities ou padrão)"""
+        rows = db.session.query(StageProbability.status, StageProbability.probability).all()
+        if rows:
+            return {status: float(probability) for status, probability in rows}
+        return dict(DEFAULT_STAGE_PROBABILITIES)
+    
+    @staticmethod
+    def _forecast_criteria(months, probabilities):
+        """
+        Expressão CASE da probabilidade por status e filtros dos leads previstos
+        
+        Retorna (None, None) se nenhum status tem probabilidade > 0: não há o
+        que prever (e CASE sem WHEN não é SQL válido).
+        """
+        end_date = datetime.now() + timedelta(days=months * 30)
+        forecast_statuses = [status for status, probability in probabilities.items() if probability > 0]
+        if not forecast_statuses:
+            return None, None
+        probability = case(
+            *[(Lead.status == status, probabilities[status]) for status in forecast_statuses],
+            else_=0
+        )
+        
+        # Leads com data de fechamento esperada
+        filters = (
+            Lead.status.in_(forecast_statuses),
+            Lead.expected_close_date.isnot(None),
+            Lead.expected_close_date <= end_date.date(),
+            Lead.value.isnot(None)
+        )
+        return probability, filters
+    
+    @staticmethod
+    def _forecast_details_query(probability, filters):
+        return db.session.query(
+            Lead.id, Lead.title, Lead.value, Lead.status, Lead.expected_close_date,
+            probability.label('probability')
+        ).filter(*filters).order_by(Lead.expected_close_date.asc(), Lead.id.asc())
+    
+    @staticmethod
+    def _forecast_record(lead):
+        return {
+            'id': lead.id,
+            'title': lead.title,
+            'value': float(lead.value),
+            'status': lead.status,
+            'probability': float(lead.probability),
+            'expected_value': float(lead.value) * float(lead.probability),
+            'close_date': lead.expected_close_date.strftime('%d/%m/%Y')
+        }
+    
+    @staticmethod
+    def iter_forecast_leads(months=3, batch_size=STREAM_BATCH_SIZE):
+        """Gera os leads da previsão um a um, lendo do banco em lotes (yield_per)"""
+        probability, filters = LeadManager._forecast_criteria(months, LeadManager.get_stage_probabilities())
+        if probability is None:
+            return
+        for lead in LeadManager._forecast_details_query(probability, filters).yield_per(batch_size):
+            yield LeadManager._forecast_record(lead)
+    
+    @staticmethod
+    @read_replica.reads
+    def forecast_revenue(months=3, cursor=None, limit=FORECAST_PAGE_SIZE):
+        """
+        Previsão de receita baseada em leads ativos
+        
+        O valor ponderado (valor x probabilidade do status) é somado no banco,
+        agrupado por mês da data esperada de fechamento. Os detalhes dos leads
+        são paginados por cursor (expected_close_date, id).
+        """
         try:
-            end_date = datetime.now() + timedelta(days=months * 30)
-            
-            # Leads com data de fechamento esperada
-            leads_with_date = Lead.query.filter(
-                Lead.status.in_(['qualificado', 'proposta', 'negociacao']),
-                Lead.expected_close_date.isnot(None),
-                Lead.expected_close_date <= end_date.date(),
-                Lead.value.isnot(None)
-            ).all()
-            
             # Probabilidades por status
-            probabilities = {
-                'qualificado': 0.3,
-                'proposta': 0.6,
-                'negociacao': 0.8
-            }
+            probabilities = LeadManager.get_stage_probabilities()
+            probability, filters = LeadManager._forecast_criteria(months, probabilities)
+            if probability is None:
+                return {
+                    'success': True,
+                    'forecast': {
+                        'total_forecast': 0,
+                        'period_months': months,
+                        'leads_count': 0,
+                        'probabilities': probabilities,
+                        'months': [],
+                        'details': [],
+                        'next_cursor': None
+                    }
+                }
             
-            forecast = 0
-            lead_details = []
+            # Totais por mês calculados no banco
+            month = month_bucket(Lead.expected_close_date).label('month')
+            buckets = db.session.query(
+                month,
+                func.count(Lead.id).label('leads_count'),
+                func.sum(Lead.value).label('total_value'),
+                func.sum(Lead.value * probability).label('expected_value')
+            ).filter(*filters).group_by(month).order_by(month).all()
+            
+            # Detalhes paginados
+            details_query = LeadManager._forecast_details_query(probability, filters)
+            if cursor:
+                position = decode_cursor(cursor)
+                if position is None:
+                    return {'success': False, 'error': 'Cursor inválido'}
+                details_query = details_query.filter(
+                    keyset_filter(Lead.expected_close_date, Lead.id, position, descending=False)
+                )
+            details = details_query.limit(limit + 1).all()
             
-            for lead in leads_with_date:
-                probability = probabilities.get(lead.status, 0)
-                expected_value = float(lead.value) * probability
-                forecast += expected_value
-                
-                lead_details.append({
-                    'title': lead.title,
-                    'value': float(lead.value),
-                    'status': lead.status,
-                    'probability': probability,
-                    'expected_value': expected_value,
-                    'close_date': lead.expected_close_date.strftime('%d/%m/%Y')
-                })
+            has_more = len(details) > limit
+            details = details[:limit]
+            
+            forecast = sum(float(bucket.expected_value or 0) for bucket in buckets)
             
             return {
                 'success': True,
                 'forecast': {
                     'total_forecast': round(forecast, 2),
                     'period_months': months,
-                    'leads_count': len(leads_with_date),
-                    'details': lead_details
+                    'leads_count': sum(bucket.leads_count for bucket in buckets),
+                    'probabilities': probabilities,
+                    'months': [
+                        {
+                            'month': bucket.month,
+                            'leads_count': bucket.leads_count,
+                            'total_value': float(bucket.total_value or 0),
+                            'expected_value': round(float(bucket.expected_value or 0), 2)
+                        } for bucket in buckets
+                    ],
+                    'details': [LeadManager._forecast_record(lead) for lead in details],
+                    'next_cursor': encode_cursor(details[-1].expected_close_date, details[-1].id) if has_more else None
                 }
             }
             
@@ -432,31 +711,213 @@ class LeadManager:
             return {'success': False, 'error': f'Erro ao calcular previsão: {str(e)}'}
     
     @staticmethod
+    def _overdue_filter(today):
+        """Leads em aberto com data de fechamento vencida"""
+        return (
+            Lead.status.in_(ACTIVE_STATUSES),
+            Lead.expected_close_date.isnot(None),
+            Lead.expected_close_date < today
+        )
+    
+    @staticmethod
+    def _overdue_query(today):
+        """Query dos leads em atraso"""
+        return Lead.query.options(
+            joinedload(Lead.assigned_user)
+        ).filter(
+            *LeadManager._overdue_filter(today)
+        ).order_by(Lead.expected_close_date.asc(), Lead.id.asc())
+    
+    @staticmethod
+    def _overdue_record(lead, today):
+        return {
+            'id': lead.id,
+            'title': lead.title,
+            'status': lead.status,
+            'value': float(lead.value) if lead.value else 0,
+            'expected_date': lead.expected_close_date.strftime('%d/%m/%Y'),
+            'days_overdue': (today - lead.expected_close_date).days,
+            'assigned_user': f"{lead.assigned_user.first_name} {lead.assigned_user.last_name}" if lead.assigned_user else None
+        }
+    
+    @staticmethod
+    @read_replica.reads
     def get_overdue_leads():
         """Retorna leads em atraso"""
         try:
             today = datetime.now().date()
+            overdue_leads = LeadManager._overdue_query(today).all()
+            
+            return {
+                'success': True,
+                'overdue_leads': [LeadManager._overdue_record(lead, today) for lead in overdue_leads]
+            }
+            
+        except Exception as e:
+            return {'success': False, 'error': f'Erro ao buscar leads em atraso: {str(e)}'}
+    
+    @staticmethod
+    @read_replica.reads
+    def get_overdue_version(today=None):
+        """
+        Versão dos dados de get_overdue_leads: (quantidade, último
+        updated_at) dos leads em atraso, lida do índice
+        (status, expected_close_date, updated_at)
+        """
+        today = today or datetime.now().date()
+        count, last_updated = db.session.query(func.count(), func.max(Lead.updated_at)).filter(
+            *LeadManager._overdue_filter(today)
+        ).one()
+        return count, last_updated
+    
+    @staticmethod
+    def iter_overdue_leads(batch_size=STREAM_BATCH_SIZE):
+        """
+        Gera os leads em atraso um a um, lendo do banco em lotes (yield_per),
+        para respostas em streaming
+        """
+        today = datetime.now().date()
+        for lead in LeadManager._overdue_query(today).yield_per(batch_size):
+            yield LeadManager._overdue_record(lead, today)
+    
+    @staticmethod
+    def _pipeline_card(lead):
+        """Representação resumida de um lead para o quadro do pipeline"""
+        return {
+            'id': lead.id,
+            'title': lead.title,
+            'value': float(lead.value) if lead.value else 0,
+            'priority': lead.priority,
+            'client': lead.client.name if lead.client else None,
+            'assigned_user': f"{lead.assigned_user.first_name} {lead.assigned_user.last_name}" if lead.assigned_user else None,
+            'expected_close_date': lead.expected_close_date.strftime('%d/%m/%Y') if lead.expected_close_date else None
+        }
+    
+    @staticmethod
+    def _pipeline_top_ids(limit, user_id=None):
+        """
+        Ids dos `limit` leads mais recentes de cada coluna do pipeline
+        
+        Um SELECT ... ORDER BY created_at DESC LIMIT n por status, unidos com
+        UNION ALL: cada parte lê só o começo do índice (status, created_at, id),
+        sem ordenar a tabela inteira.
+        """
+        columns = []
+        for status in PIPELINE_STATUSES:
+            column = select(Lead.id).where(Lead.status == status)
+            if user_id:
+                column = column.where(Lead.user_id == user_id)
+            column = column.order_by(Lead.created_at.desc(), Lead.id.desc()).limit(limit).subquery()
+            columns.append(select(column.c.id))
+        return union_all(*columns).subquery()
+    
+    @staticmethod
+    def get_pipeline_board(limit=10, user_id=None):
+        """
+        Retorna o quadro do pipeline: contagem e valor por status calculados
+        no banco e apenas os `limit` leads mais recentes de cada coluna
+        """
+        try:
+            # Totais por status
+            totals = db.session.query(
+                Lead.status,
+                func.count(Lead.id).label('leads_count'),
+                func.sum(Lead.value).label('value')
+            )
+            if user_id:
+                totals = totals.filter(Lead.user_id == user_id)
+            totals = {row.status: row for row in totals.group_by(Lead.status).all()}
+            
+            # Top N por coluna com uma única consulta
+            top_ids = LeadManager._pipeline_top_ids(limit, user_id)
+            cards = Lead.query.join(top_ids, top_ids.c.id == Lead.id).options(
+                joinedload(Lead.client),
+                joinedload(Lead.assigned_user)
+            ).order_by(Lead.created_at.desc(), Lead.id.desc()).all()
+            
+            board = {}
+            for status in PIPELINE_STATUSES:
+                row = totals.get(status)
+                board[status] = {
+                    'count': row.leads_count if row else 0,
+                    'value': float(row.value or 0) if row else 0,
+                    'leads': [],
+                    'next_cursor': None
+                }
+            
+            for lead in cards:
+                column = board.get(lead.status)
+                if column is None:
+                    continue
+                column['leads'].append(LeadManager._pipeline_card(lead))
+                if len(column['leads']) < column['count']:
+                    column['next_cursor'] = encode_cursor(lead.created_at, lead.id)
+                else:
+                    column['next_cursor'] = None
             
-            overdue_leads = Lead.query.filter(
-                Lead.status.in_(['novo', 'qualificado', 'proposta', 'negociacao']),
-                Lead.expected_close_date.isnot(None),
-                Lead.expected_close_date < today
-            ).order_by(Lead.expected_close_date.asc()).all()
+            return {'success': True, 'pipeline': board}
+            
+        except Exception as e:
+            return {'success': False, 'error': f'Erro ao montar pipeline: {str(e)}'}
+    
+    @staticmethod
+    def get_pipeline_column(status, cursor=None, limit=10, user_id=None):
+        """Carrega mais leads de uma coluna do pipeline a partir de um cursor"""
+        try:
+            if status not in PIPELINE_STATUSES:
+                return {'success': False, 'error': 'Status inválido'}
+            
+            query = Lead.query.filter(Lead.status == status)
+            if user_id:
+                query = query.filter(Lead.user_id == user_id)
+            
+            if cursor:
+                position = decode_cursor(cursor)
+                if position is None:
+                    return {'success': False, 'error': 'Cursor inválido'}
+                query = query.filter(keyset_filter(Lead.created_at, Lead.id, position))
+            
+            # Busca um registro a mais para saber se existe próxima página
+            leads = query.options(
+                joinedload(Lead.client),
+                joinedload(Lead.assigned_user)
+            ).order_by(Lead.created_at.desc(), Lead.id.desc()).limit(limit + 1).all()
+            
+            has_more = len(leads) > limit
+            leads = leads[:limit]
             
             return {
                 'success': True,
-                'overdue_leads': [
-                    {
-                        'id': lead.id,
-                        'title': lead.title,
-                        'status': lead.status,
-                        'value': float(lead.value) if lead.value else 0,
-                        'expected_date': lead.expected_close_date.strftime('%d/%m/%Y'),
-                        'days_overdue': (today - lead.expected_close_date).days,
-                        'assigned_user': f"{lead.assigned_user.first_name} {lead.assigned_user.last_name}"
-                    } for lead in overdue_leads
-                ]
+                'status': status,
+                'leads': [LeadManager._pipeline_card(lead) for lead in leads],
+                'next_cursor': encode_cursor(leads[-1].created_at, leads[-1].id) if has_more else None
             }
             
         except Exception as e:
-            return {'success': False, 'error': f'Erro ao buscar leads em atraso: {str(e)}'}
\ No newline at end of file
+            return {'success': False, 'error': f'Erro ao carregar coluna do pipeline: {str(e)}'}
+
+
+# Automações do workflow executadas pela fila de jobs (jobs.py)
+
+@job_queue.handler('lead_created')
+def _lead_created_job(payload):
+    """Tarefa de follow-up de um lead novo"""
+    task = LeadManager.create_followup_task(
+        payload['lead_id'], payload['user_id'], now=datetime.fromisoformat(payload['created_at'])
+    )
+    if task is not None:
+        AUTOMATIC_TASKS.labels(trigger='lead_created').inc()
+
+
+@job_queue.handler('lead_status_changed')
+def _lead_status_changed_job(payload):
+    """Tarefas automáticas do novo status do lead"""
+    lead = db.session.query(Lead.id, Lead.title, Lead.client_id).filter(Lead.id == payload['lead_id']).first()
+    if lead is None:
+        return
+    rows = LeadManager.build_status_tasks(
+        lead, payload['new_status'], payload['user_id'], now=datetime.fromisoformat(payload['changed_at'])
+    )
+    if rows:
+        db.session.execute(insert(Task).execution_options(render_nulls=True), rows)
+        AUTOMATIC_TASKS.labels(trigger=label_value(payload['new_status'], PIPELINE_STATUSES)).inc(len(rows))
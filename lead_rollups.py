@@ -0,0 +1,232 @@
+"""
+Totais diários de leads para as análises (lead_daily_stats)
+Sistema CRM Profissional
+
+Cada linha guarda, para um dia de criação, um responsável e um status, a
+quantidade de leads, a soma dos valores e a soma das durações
+(updated_at - created_at). Os dias até rollup_states.closed_through estão
+consolidados; o dia corrente (e qualquer dia ainda não consolidado) é lido
+direto da tabela leads.
+
+Manutenção:
+- escritas pelo ORM em leads de dias já consolidados recalculam esses dias
+  no mesmo flush (evento after_flush);
+- a primeira análise de cada dia enfileira o job `rollup_catch_up` (chave
+  rollup:<dia>), que consolida os dias que faltam fora da requisição; até
+  lá as análises leem esses dias direto de leads;
+- `flask rebuild-lead-rollups` reconstrói tudo (ou os últimos N dias).
+
+Os dias seguem o relógio de Lead.created_at (UTC).
+"""
+
+import logging
+from datetime import datetime, time, timedelta
+from sqlalchemy import and_, event, func, insert, inspect, or_, select, update
+from sqlalchemy.exc import SQLAlchemyError
+from database import db
+from jobs import job_queue
+from models import Lead, LeadDailyStat, RollupState
+from sql_functions import day_bucket, days_between
+
+ROLLUP_NAME = 'lead_daily_stats'
+
+_STATS_COLUMNS = ['day', 'user_id', 'status', 'leads_count', 'value_sum', 'duration_days_sum', 'duration_count']
+
+
+def _day_start(day):
+    return datetime.combine(day, time.min)
+
+
+def _stats_select(condition):
+    """Agregação por (dia, responsável, status) dos leads que atendem à condição"""
+    duration = days_between(Lead.created_at, Lead.updated_at)
+    day = day_bucket(Lead.created_at)
+    return select(
+        day, Lead.user_id, Lead.status,
+        func.count(Lead.id), func.sum(Lead.value), func.sum(duration), func.count(duration)
+    ).where(condition).group_by(day, Lead.user_id, Lead.status)
+
+
+class LeadRollups:
+    """Manutenção dos totais diários de leads"""
+
+    def __init__(self, app=None):
+        self._listening = False
+        self.refreshed_days = 0
+        self.logger = logging.getLogger(__name__)
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.extensions['lead_rollups'] = self
+        self.logger = app.logger
+        if not self._listening:
+            event.listen(db.session, 'after_flush', self._after_flush)
+            self._listening = True
+
+    @staticmethod
+    def closing_day():
+        """Último dia que pode ser consolidado (ontem, no relógio de created_at)"""
+        return datetime.utcnow().date() - timedelta(days=1)
+
+    @staticmethod
+    def closed_through():
+        """Último dia consolidado ou None se os totais nunca foram construídos"""
+        return db.session.query(RollupState.closed_through).filter(RollupState.name == ROLLUP_NAME).scalar()
+
+    @staticmethod
+    def _lock(connection):
+        """
+        Serializa a reconstrução de totais entre transações (trava a linha de
+        rollup_states até o fim da transação)
+
+        Sem a trava, duas transações que recalculam o mesmo dia no PostgreSQL
+        apagam só as linhas que cada uma enxerga e as duas inserem, duplicando
+        os totais. No SQLite as escritas já são serializadas pelo banco.
+        """
+        if connection.dialect.name != 'sqlite':
+            state = RollupState.__table__
+            connection.execute(select(state.c.name).where(state.c.name == ROLLUP_NAME).with_for_update())
+
+    def _materialize(self, connection, first_day, last_day):
+        """Recalcula os totais de [first_day, last_day] (connection: conexão da sessão)"""
+        table = LeadDailyStat.__table__
+        self._lock(connection)
+        connection.execute(table.delete().where(table.c.day >= first_day, table.c.day <= last_day))
+        connection.execute(insert(table).from_select(_STATS_COLUMNS, _stats_select(and_(
+            Lead.created_at >= _day_start(first_day),
+            Lead.created_at < _day_start(last_day + timedelta(days=1))
+        ))))
+
+    def refresh_days(self, days, connection=None):
+        """
+        Recalcula os totais dos dias informados (dias ainda abertos são ignorados)
+
+        Um único DELETE (day IN ...) e um único INSERT ... SELECT para todos os
+        dias, qualquer que seja a quantidade; a leitura dos leads usa um
+        intervalo de created_at por sequência de dias consecutivos.
+        """
+        closing_day = self.closing_day()
+        days = sorted({day for day in days if day is not None and day <= closing_day})
+        if not days:
+            return 0
+        connection = connection or db.session.connection()
+
+        runs = []
+        for day in days:
+            if runs and day == runs[-1][1] + timedelta(days=1):
+                runs[-1][1] = day
+            else:
+                runs.append([day, day])
+
+        table = LeadDailyStat.__table__
+        self._lock(connection)
+        connection.execute(table.delete().where(table.c.day.in_(days)))
+        connection.execute(insert(table).from_select(_STATS_COLUMNS, _stats_select(or_(*[
+            and_(Lead.created_at >= _day_start(first_day),
+                 Lead.created_at < _day_start(last_day + timedelta(days=1)))
+            for first_day, last_day in runs
+        ]))))
+        self.refreshed_days += len(days)
+        return len(days)
+
+    def schedule_catch_up(self, closed_through):
+        """
+        Enfileira (uma vez por dia) a consolidação dos dias que faltam até ontem
+
+        Chamado pelas leituras: o job é gravado numa transação própria, sem
+        confirmar a sessão do chamador. Uma falha ao enfileirar só é registrada
+        (a leitura continua correta; a próxima tenta de novo). Retorna True se
+        há dias a consolidar.
+        """
+        closing_day = self.closing_day()
+        if closed_through is None or closed_through >= closing_day:
+            return False
+        try:
+            job_queue.enqueue_detached('rollup_catch_up', key=f'rollup:{closing_day.isoformat()}')
+        except SQLAlchemyError:
+            self.logger.warning('Não foi possível agendar a consolidação dos totais até %s', closing_day,
+                                exc_info=True)
+        return True
+
+    def catch_up(self):
+        """
+        Consolida os dias que faltam até ontem e retorna o último dia consolidado
+
+        Só um processo consolida cada intervalo: o avanço de closed_through é
+        um UPDATE condicional. Não faz commit (o job ou o chamador confirma).
+        Retorna None se os totais nunca foram construídos.
+        """
+        closed_through = self.closed_through()
+        closing_day = self.closing_day()
+        if closed_through is None or closed_through >= closing_day:
+            return closed_through
+
+        state = RollupState.__table__
+        advanced = db.session.execute(
+            update(state)
+            .where(state.c.name == ROLLUP_NAME, state.c.closed_through == closed_through)
+            .values(closed_through=closing_day, updated_at=datetime.utcnow())
+        ).rowcount
+        if not advanced:
+            return self.closed_through()
+        self._materialize(db.session.connection(), closed_through + timedelta(days=1), closing_day)
+        return closing_day
+
+    def rebuild(self, days=None):
+        """
+        Reconstrói os totais (todos ou os dos últimos `days` dias) e marca
+        ontem como consolidado. Retorna o número de linhas de totais gravadas.
+        """
+        closing_day = self.closing_day()
+        connection = db.session.connection()
+        table = LeadDailyStat.__table__
+        self._lock(connection)
+
+        if days and self.closed_through() is not None:
+            first_day = closing_day - timedelta(days=days - 1)
+            self._materialize(connection, first_day, closing_day)
+        else:
+            first_day = None
+            connection.execute(table.delete())
+            connection.execute(insert(table).from_select(
+                _STATS_COLUMNS, _stats_select(Lead.created_at < _day_start(closing_day + timedelta(days=1)))
+            ))
+
+        state = db.session.get(RollupState, ROLLUP_NAME)
+        if state is None:
+            db.session.add(RollupState(name=ROLLUP_NAME, closed_through=closing_day))
+        else:
+            state.closed_through = closing_day
+        db.session.commit()
+
+        rows = db.session.query(func.count(LeadDailyStat.id))
+        if first_day:
+            rows = rows.filter(LeadDailyStat.day >= first_day)
+        return rows.scalar()
+
+    # Eventos da sessão
+    def _after_flush(self, session, flush_context):
+        days = set()
+        for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+            if not isinstance(obj, Lead) or (obj in session.dirty and not session.is_modified(obj)):
+                continue
+            # Dia atual e, se created_at mudou, o dia anterior
+            attribute = inspect(obj).attrs.created_at
+            values = attribute.history.sum()
+            if not values and obj not in session.deleted:
+                values = attribute.load_history().sum()
+            for value in values:
+                if value is not None:
+                    days.add(value.date())
+        if days:
+            self.refresh_days(days, session.connection())
+
+
+lead_rollups = LeadRollups()
+
+
+@job_queue.handler('rollup_catch_up')
+def _rollup_catch_up_job(payload):
+    """Consolida os dias que faltam (enfileirado pela primeira análise do dia)"""
+    lead_rollups.catch_up()
@@ -0,0 +1,79 @@
+"""
+Filtros das listagens (clientes, leads, tarefas e interações)
+Sistema CRM Profissional
+
+Usados pelas páginas de listagem e pelas exportações, para que um extrato
+traga exatamente as linhas que a listagem com os mesmos parâmetros mostra.
+Os parâmetros vêm de um MultiDict (request.args ou montado pela CLI).
+"""
+
+from models import Client, Lead, Task, Interaction
+from search import search_clients, search_leads
+
+
+def search_term(args):
+    """Texto da busca (?query=), sem espaços nas pontas"""
+    return args.get('query', '').strip()
+
+
+def filter_clients(query, args):
+    """Busca textual (?query=) e status (?status=)"""
+    search_query = search_term(args)
+    if search_query:
+        query = search_clients(query, search_query)
+
+    status_filter = args.get('status', '').strip()
+    if status_filter:
+        query = query.filter(Client.status == status_filter)
+    return query
+
+
+def filter_leads(query, args):
+    """Busca textual (?query=), status (?status=) e responsável (?user_id=)"""
+    search_query = search_term(args)
+    if search_query:
+        query = search_leads(query, search_query)
+
+    status_filter = args.get('status', '').strip()
+    if status_filter:
+        query = query.filter(Lead.status == status_filter)
+
+    user_filter = args.get('user_id', type=int)
+    if user_filter:
+        query = query.filter(Lead.user_id == user_filter)
+    return query
+
+
+def filter_tasks(query, args):
+    """Título (?query=), status (?status=) e responsável (?user_id=)"""
+    search_query = search_term(args)
+    if search_query:
+        query = query.filter(Task.title.contains(search_query))
+
+    status_filter = args.get('status', '').strip()
+    if status_filter:
+        query = query.filter(Task.status == status_filter)
+
+    user_filter = args.get('user_id', type=int)
+    if user_filter:
+        query = query.filter(Task.user_id == user_filter)
+    return query
+
+
+def filter_interactions(query, args):
+    """Assunto (?query=), tipo (?type=), cliente, lead e usuário (?client_id=, ?lead_id=, ?user_id=)"""
+    search_query = search_term(args)
+    if search_query:
+        query = query.filter(Interaction.subject.contains(search_query))
+
+    type_filter = args.get('type', '').strip()
+    if type_filter:
+        query = query.filter(Interaction.type == type_filter)
+
+    for name, column in (('client_id', Interaction.client_id),
+                         ('lead_id', Interaction.lead_id),
+                         ('user_id', Interaction.user_id)):
+        value = args.get(name, type=int)
+        if value:
+            query = query.filter(column == value)
+    return query
@@ -0,0 +1,419 @@
+"""
+Teste de carga local (flask load-test)
+Sistema CRM Profissional
+
+Sobe a aplicação num processo separado (gunicorn ou waitress, com o banco
+configurado em DATABASE_URL) ou usa um servidor já em execução (--url), faz
+login com N vendedores gerados por `flask generate-data` e simula o uso:
+cada usuário virtual escolhe uma ação do LOAD_TEST_MIX, executa as
+requisições dela e espera um tempo de "leitura" antes da próxima.
+
+- dashboard: GET /
+- leads: GET /leads com filtros (status, prioridade, busca, página)
+- analytics_page: GET /leads/analytics e as chamadas que a página faz
+  (/api/leads/analytics e /api/leads/overdue)
+- analytics_poll: nova consulta de /api/leads/analytics com outro período
+- update_status: POST /leads/<id>/update-status num lead do próprio usuário
+
+O relatório traz, por endpoint e no total, requisições, vazão
+(requisições/s), latência p50/p95/p99 e taxa de erros (HTTP >= 400, falha
+de conexão ou `success: false` no JSON). O cliente roda na mesma máquina do
+servidor e disputa CPU com ele; para medir só o servidor use --url com o
+app em outra máquina.
+"""
+
+import http.client
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from http.cookies import SimpleCookie
+from urllib.parse import urlencode, urlsplit
+from database import db
+from lead_functions import ACTIVE_STATUSES
+from models import Lead, User
+from synthetic_data import SYNTHETIC_PASSWORD
+
+# Ações de cada usuário virtual e seus pesos
+LOAD_TEST_MIX = [
+    ('dashboard', 20),
+    ('leads', 30),
+    ('analytics_page', 10),
+    ('analytics_poll', 25),
+    ('update_status', 15)
+]
+LEAD_FILTERS = [
+    {},
+    {'status': 'novo'},
+    {'status': 'proposta', 'priority': 'alta'},
+    {'status': 'negociacao'},
+    {'query': 'software'},
+    {'page': 2},
+    {'page': 5}
+]
+ANALYTICS_PERIODS = [7, 30, 90, 365]
+
+# Leads (em aberto) de cada usuário usados nas mudanças de status
+LEADS_PER_USER = 200
+REQUEST_TIMEOUT = 30
+SERVER_START_TIMEOUT = 30
+# Mensagens de erro guardadas por endpoint no relatório
+ERROR_SAMPLES = 5
+
+_CSRF_PATTERN = re.compile(rb'name="csrf_token" type="hidden" value="([^"]+)"')
+
+
+def percentile(values, fraction):
+    """Percentil por posição mais próxima (values já ordenados)"""
+    if not values:
+        return 0.0
+    index = min(max(int(round(fraction * len(values) + 0.5)) - 1, 0), len(values) - 1)
+    return values[index]
+
+
+class LatencyRecorder:
+    """Latências e erros por endpoint, compartilhados entre os usuários virtuais"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._latencies = {}
+        self._errors = {}
+        self._samples = {}
+
+    def record(self, endpoint, seconds, error=None):
+        with self._lock:
+            self._latencies.setdefault(endpoint, []).append(seconds)
+            if error:
+                self._errors[endpoint] = self._errors.get(endpoint, 0) + 1
+                samples = self._samples.setdefault(endpoint, [])
+                if len(samples) < ERROR_SAMPLES and error not in samples:
+                    samples.append(error)
+
+    @staticmethod
+    def _summary(latencies, errors, elapsed):
+        values = sorted(latencies)
+        return {
+            'requests': len(values),
+            'errors': errors,
+            'error_rate': round(errors / len(values), 4) if values else 0.0,
+            'throughput_rps': round(len(values) / elapsed, 2) if elapsed else 0.0,
+            'p50_ms': round(percentile(values, 0.50) * 1000, 2),
+            'p95_ms': round(percentile(values, 0.95) * 1000, 2),
+            'p99_ms': round(percentile(values, 0.99) * 1000, 2),
+            'max_ms': round(values[-1] * 1000, 2) if values else 0.0
+        }
+
+    def report(self, elapsed):
+        """Resumo por endpoint e total (vazão calculada sobre `elapsed` segundos)"""
+        with self._lock:
+            latencies = {endpoint: list(values) for endpoint, values in self._latencies.items()}
+            errors = dict(self._errors)
+            samples = {endpoint: list(values) for endpoint, values in self._samples.items()}
+
+        endpoints = {}
+        for endpoint in sorted(latencies):
+            endpoints[endpoint] = self._summary(latencies[endpoint], errors.get(endpoint, 0), elapsed)
+            if samples.get(endpoint):
+                endpoints[endpoint]['error_samples'] = samples[endpoint]
+        total = self._summary([value for values in latencies.values() for value in values],
+                              sum(errors.values()), elapsed)
+        return {'total': total, 'endpoints': endpoints}
+
+
+class VirtualUser:
+    """Um vendedor navegando no sistema, com a própria sessão (cookies) e conexão keep-alive"""
+
+    def __init__(self, base_url, username, password, lead_ids, recorder, think_time=1.0, seed=None):
+        parts = urlsplit(base_url)
+        self.host = parts.hostname
+        self.port = parts.port or (443 if parts.scheme == 'https' else 80)
+        self.https = parts.scheme == 'https'
+        self.username = username
+        self.password = password
+        self.lead_ids = lead_ids
+        self.recorder = recorder
+        self.think_time = think_time
+        self.rng = random.Random(seed)
+        self.cookies = {}
+        self.connection = None
+        self.actions = [action for action, _ in LOAD_TEST_MIX]
+        self.weights = [weight for _, weight in LOAD_TEST_MIX]
+
+    # HTTP
+    def _connect(self):
+        connection_class = http.client.HTTPSConnection if self.https else http.client.HTTPConnection
+        self.connection = connection_class(self.host, self.port, timeout=REQUEST_TIMEOUT)
+
+    def _send(self, method, path, body=None, headers=None):
+        headers = dict(headers or {})
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{name}={value}' for name, value in self.cookies.items())
+        # Uma nova tentativa se o servidor fechou a conexão ociosa (keep-alive expirado)
+        for attempt in (1, 2):
+            if self.connection is None:
+                self._connect()
+            try:
+                self.connection.request(method, path, body=body, headers=headers)
+                response = self.connection.getresponse()
+                content = response.read()
+                break
+            except (http.client.RemoteDisconnected, http.client.CannotSendRequest, BrokenPipeError,
+                    ConnectionResetError):
+                self.connection.close()
+                self.connection = None
+                if attempt == 2:
+                    raise
+
+        for header in response.headers.get_all('Set-Cookie') or []:
+            cookie = SimpleCookie()
+            cookie.load(header)
+            for name, morsel in cookie.items():
+                if morsel.value and morsel['max-age'] != '0':
+                    self.cookies[name] = morsel.value
+                else:
+                    self.cookies.pop(name, None)
+        if response.getheader('Connection', '').lower() == 'close':
+            self.connection.close()
+            self.connection = None
+        return response.status, content
+
+    def request(self, endpoint, method, path, body=None, headers=None, check=None):
+        """Executa e registra uma requisição; retorna (status, conteúdo) ou (None, None) em falha de conexão"""
+        started = time.perf_counter()
+        try:
+            status, content = self._send(method, path, body, headers)
+        except (OSError, http.client.HTTPException) as exc:
+            self.recorder.record(endpoint, time.perf_counter() - started, f'{type(exc).__name__}: {exc}')
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+            return None, None
+
+        elapsed = time.perf_counter() - started
+        error = f'HTTP {status}' if status >= 400 else (check(status, content) if check else None)
+        self.recorder.record(endpoint, elapsed, error)
+        return status, content
+
+    def close(self):
+        if self.connection is not None:
+            self.connection.close()
+            self.connection = None
+
+    # Sessão
+    def login(self):
+        """Abre a sessão pelo formulário de login (com o token CSRF da página)"""
+        status, content = self.request('GET /login', 'GET', '/login')
+        if status != 200:
+            return False
+        match = _CSRF_PATTERN.search(content)
+        form = {'username': self.username, 'password': self.password}
+        if match:
+            form['csrf_token'] = match.group(1).decode()
+
+        def check(status, content):
+            return None if status in (301, 302, 303) else 'login recusado'
+
+        status, _ = self.request('POST /login', 'POST', '/login', body=urlencode(form),
+                                 headers={'Content-Type': 'application/x-www-form-urlencoded'}, check=check)
+        return status in (301, 302, 303)
+
+    # Ações
+    def dashboard(self):
+        self.request('GET /', 'GET', '/')
+
+    def leads(self):
+        filters = self.rng.choice(LEAD_FILTERS)
+        self.request('GET /leads', 'GET', '/leads' + (f'?{urlencode(filters)}' if filters else ''))
+
+    def analytics_page(self):
+        self.request('GET /leads/analytics', 'GET', '/leads/analytics')
+        self.analytics_poll(period=30)
+        self.request('GET /api/leads/overdue', 'GET', '/api/leads/overdue', check=self._check_json)
+
+    def analytics_poll(self, period=None):
+        period = period or self.rng.choice(ANALYTICS_PERIODS)
+        self.request('GET /api/leads/analytics', 'GET', f'/api/leads/analytics?period={period}',
+                     check=self._check_json)
+
+    def update_status(self):
+        if not self.lead_ids:
+            return
+        lead_id = self.rng.choice(self.lead_ids)
+        body = json.dumps({'status': self.rng.choice(ACTIVE_STATUSES), 'notes': 'Teste de carga'})
+        self.request('POST /leads/<id>/update-status', 'POST', f'/leads/{lead_id}/update-status', body=body,
+                     headers={'Content-Type': 'application/json'}, check=self._check_json)
+
+    @staticmethod
+    def _check_json(status, content):
+        try:
+            data = json.loads(content)
+        except ValueError:
+            return 'resposta não é JSON'
+        if isinstance(data, dict) and data.get('success') is False:
+            return str(data.get('error') or 'success=false')[:200]
+        return None
+
+    def run(self, stop):
+        """Laço do usuário: login e ações com pausas até `stop` ser sinalizado"""
+        try:
+            if not self.login():
+                return
+            while not stop.is_set():
+                getattr(self, self.rng.choices(self.actions, self.weights)[0])()
+                if self.think_time:
+                    stop.wait(self.rng.uniform(0.5, 1.5) * self.think_time)
+        finally:
+            self.close()
+
+
+class LocalServer:
+    """Aplicação num processo separado (gunicorn ou waitress) enquanto durar o teste"""
+
+    def __init__(self, app, server=None, port=None, workers=None, threads=None):
+        self.app = app
+        self.server = server or ('gunicorn' if os.name != 'nt' and _has_module('gunicorn') else 'waitress')
+        self.port = port or _free_port()
+        self.workers = workers
+        self.threads = threads
+        self.process = None
+        self.log = None
+
+    @property
+    def url(self):
+        return f'http://127.0.0.1:{self.port}'
+
+    def start(self):
+        env = dict(os.environ, HOST='127.0.0.1', PORT=str(self.port), WEB_ACCESS_LOG='')
+        if self.workers:
+            env['WEB_CONCURRENCY'] = str(self.workers)
+        if self.threads:
+            env['WEB_THREADS'] = str(self.threads)
+        if self.server == 'gunicorn':
+            command = [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app']
+        else:
+            command = [sys.executable, 'wsgi.py']
+        # Log do servidor em arquivo temporário (um PIPE não lido travaria o servidor quando enchesse)
+        self.log = tempfile.TemporaryFile()
+        self.process = subprocess.Popen(command, cwd=self.app.root_path, env=env,
+                                        stdout=subprocess.DEVNULL, stderr=self.log)
+
+        deadline = time.monotonic() + SERVER_START_TIMEOUT
+        while time.monotonic() < deadline:
+            if self.process.poll() is not None:
+                self.log.seek(0)
+                error = self.log.read().decode(errors='replace')[-2000:]
+                self.log.close()
+                raise RuntimeError(f'{self.server} encerrou ao iniciar:\n{error}')
+            try:
+                connection = http.client.HTTPConnection('127.0.0.1', self.port, timeout=2)
+                connection.request('GET', '/login')
+                connection.getresponse().read()
+                connection.close()
+                return self
+            except OSError:
+                time.sleep(0.2)
+        self.stop()
+        raise RuntimeError(f'{self.server} não respondeu em {SERVER_START_TIMEOUT}s')
+
+    def stop(self):
+        if self.process and self.process.poll() is None:
+            self.process.terminate()
+            try:
+                self.process.wait(timeout=35)
+            except subprocess.TimeoutExpired:
+                self.process.kill()
+                self.process.wait()
+        if self.log is not None:
+            self.log.close()
+            self.log = None
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def _has_module(name):
+    import importlib.util
+    return importlib.util.find_spec(name) is not None
+
+
+def _free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+class LoadTest:
+    """Executa os usuários virtuais contra a URL informada e monta o relatório"""
+
+    def __init__(self, url, users=10, duration=60, ramp_up=5, think_time=1.0, password=SYNTHETIC_PASSWORD,
+                 username_prefix='vendedor', seed=42, progress=None):
+        self.url = url.rstrip('/')
+        self.users = users
+        self.duration = duration
+        self.ramp_up = ramp_up
+        self.think_time = think_time
+        self.password = password
+        self.username_prefix = username_prefix
+        self.seed = seed
+        self.progress = progress or (lambda message: None)
+        self.accounts = []
+
+    def prepare(self):
+        """Lê do banco (app context) os usuários e os leads em aberto de cada um"""
+        usernames = [f'{self.username_prefix}{number:03d}' for number in range(1, self.users + 1)]
+        users = User.query.filter(User.username.in_(usernames), User.active.is_(True)).order_by(User.username).all()
+        if len(users) < self.users:
+            raise ValueError(f'Apenas {len(users)} de {self.users} usuário(s) {usernames[0]}...{usernames[-1]}; '
+                             f'gere-os com flask generate-data --users {self.users}')
+
+        self.accounts = []
+        for user in users:
+            lead_ids = [lead_id for lead_id, in db.session.query(Lead.id).filter(
+                Lead.user_id == user.id, Lead.status.in_(ACTIVE_STATUSES)
+            ).order_by(Lead.id.desc()).limit(LEADS_PER_USER)]
+            self.accounts.append((user.username, lead_ids))
+        db.session.remove()
+        return self
+
+    def run(self):
+        recorder = LatencyRecorder()
+        stop = threading.Event()
+        threads = []
+        started = time.perf_counter()
+        for number, (username, lead_ids) in enumerate(self.accounts):
+            user = VirtualUser(self.url, username, self.password, lead_ids, recorder,
+                               think_time=self.think_time, seed=self.seed + number)
+            thread = threading.Thread(target=user.run, args=(stop,), name=f'load-{username}', daemon=True)
+            thread.start()
+            threads.append(thread)
+            if self.ramp_up and len(self.accounts) > 1:
+                time.sleep(self.ramp_up / len(self.accounts))
+        self.progress(f'{len(threads)} usuário(s) ativos; medindo por {self.duration}s')
+
+        stop.wait(max(self.duration - (time.perf_counter() - started), 0))
+        stop.set()
+        for thread in threads:
+            thread.join(REQUEST_TIMEOUT + 5)
+        elapsed = time.perf_counter() - started
+
+        report = recorder.report(elapsed)
+        report['meta'] = {
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'url': self.url,
+            'users': len(self.accounts),
+            'duration_seconds': round(elapsed, 1),
+            'ramp_up_seconds': self.ramp_up,
+            'think_time_seconds': self.think_time,
+            'mix': dict(LOAD_TEST_MIX)
+        }
+        return report
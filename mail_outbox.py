@@ -0,0 +1,288 @@
+"""
+Fila de saída de e-mails (outbox_emails)
+Sistema CRM Profissional
+
+As rotas não falam com o servidor SMTP: `mail_outbox.enqueue()` grava o
+e-mail na mesma transação da alteração que o motivou, e o processo
+`flask send-mail` envia os pendentes em lotes, cada lote por uma única
+conexão SMTP (um só handshake TLS/login por lote).
+
+Falhas temporárias (conexão, respostas 4xx) são repetidas com espera
+exponencial (MAIL_OUTBOX_RETRY_DELAY, dobrando a cada tentativa até
+MAIL_OUTBOX_MAX_RETRY_DELAY) até MAIL_OUTBOX_MAX_ATTEMPTS; respostas 5xx
+marcam o e-mail como falhou. E-mails reservados por um processo que parou
+voltam para a fila depois de MAIL_OUTBOX_LOCK_TIMEOUT segundos, então a
+entrega é "pelo menos uma vez".
+"""
+
+import logging
+import smtplib
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta
+from flask_mail import BadHeaderError, Message
+from sqlalchemy import and_, func, or_, update
+from database import db, mail
+from models import OutboxEmail
+from metrics import EMAILS_PROCESSED, OUTBOX_DEPTH, OUTBOX_OLDEST_PENDING_AGE, metrics
+
+OUTBOX_STATUSES = ['pendente', 'enviando', 'enviado', 'falhou']
+
+# Erros que afetam só a mensagem atual; os demais derrubam a conexão do lote
+_MESSAGE_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPResponseException, BadHeaderError, ValueError)
+
+
+def _is_permanent(exc):
+    """Respostas 5xx (e mensagens inválidas) não adiantam repetir"""
+    if isinstance(exc, smtplib.SMTPRecipientsRefused):
+        return all(code >= 500 for code, _ in exc.recipients.values())
+    if isinstance(exc, smtplib.SMTPResponseException):
+        return exc.smtp_code >= 500
+    return isinstance(exc, (BadHeaderError, ValueError))
+
+
+class MailOutbox:
+    """Enfileira e envia e-mails fora do ciclo da requisição"""
+
+    def __init__(self, app=None):
+        self.batch_size = 50
+        self.max_attempts = 5
+        self.retry_delay = 60
+        self.max_retry_delay = 3600
+        self.lock_timeout = 300
+        self.poll_interval = 10
+        self.logger = logging.getLogger(__name__)
+        self._lock = threading.Lock()
+        self.sent = 0
+        self.failed = 0
+        self.retried = 0
+        self.connections = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.batch_size = app.config.get('MAIL_OUTBOX_BATCH_SIZE', 50)
+        self.max_attempts = app.config.get('MAIL_OUTBOX_MAX_ATTEMPTS', 5)
+        self.retry_delay = app.config.get('MAIL_OUTBOX_RETRY_DELAY', 60)
+        self.max_retry_delay = app.config.get('MAIL_OUTBOX_MAX_RETRY_DELAY', 3600)
+        self.lock_timeout = app.config.get('MAIL_OUTBOX_LOCK_TIMEOUT', 300)
+        self.poll_interval = app.config.get('MAIL_OUTBOX_POLL_INTERVAL', 10)
+        self.logger = app.logger
+        app.extensions['mail_outbox'] = self
+        metrics.on_collect(self.observe_depth)
+
+    def enqueue(self, recipients, subject, body=None, html=None, sender=None):
+        """
+        Adiciona um e-mail à fila na sessão atual
+
+        Não faz commit: o e-mail é gravado junto com a transação de quem
+        chamou (e descartado se ela for desfeita).
+        """
+        if isinstance(recipients, str):
+            recipients = [recipients]
+        recipients = [recipient.strip() for recipient in recipients if recipient and recipient.strip()]
+        if not recipients:
+            raise ValueError('E-mail sem destinatários')
+
+        email = OutboxEmail(
+            recipients=', '.join(recipients),
+            sender=sender,
+            subject=subject,
+            body=body,
+            html=html
+        )
+        db.session.add(email)
+        return email
+
+    def retry_delay_for(self, attempts):
+        """Espera (segundos) antes da próxima tentativa depois de `attempts` falhas"""
+        return min(self.retry_delay * 2 ** max(attempts - 1, 0), self.max_retry_delay)
+
+    def _ready(self, now):
+        """E-mails prontos: pendentes já vencidos ou presos em um processo parado"""
+        return or_(
+            and_(OutboxEmail.status == 'pendente', OutboxEmail.next_attempt_at <= now),
+            and_(OutboxEmail.status == 'enviando',
+                 OutboxEmail.locked_at < now - timedelta(seconds=self.lock_timeout))
+        )
+
+    def _ready_query(self, now, limit=None):
+        """Ids do próximo lote, na ordem de envio (também usada por query_plans)"""
+        query = db.session.query(OutboxEmail.id).filter(self._ready(now))
+        return query.order_by(OutboxEmail.next_attempt_at, OutboxEmail.id).limit(limit or self.batch_size)
+
+    def claim(self, limit=None):
+        """
+        Reserva um lote de e-mails prontos para envio
+
+        Cada lote recebe um token; o UPDATE condicional garante que dois
+        processos não reservem o mesmo e-mail (no PostgreSQL as linhas já
+        reservadas por outra transação são puladas com SKIP LOCKED).
+        """
+        now = datetime.utcnow()
+        ready = self._ready(now)
+        query = self._ready_query(now, limit)
+        if db.session.get_bind().dialect.name == 'postgresql':
+            query = query.with_for_update(skip_locked=True)
+
+        ids = [email_id for email_id, in query]
+        if not ids:
+            db.session.commit()
+            return []
+
+        token = uuid.uuid4().hex
+        db.session.execute(
+            update(OutboxEmail)
+            .where(OutboxEmail.id.in_(ids), ready)
+            .values(status='enviando', lock_token=token, locked_at=now)
+            .execution_options(synchronize_session=False)
+        )
+        db.session.commit()
+        return OutboxEmail.query.filter(OutboxEmail.lock_token == token).order_by(OutboxEmail.id).all()
+
+    def _message(self, email):
+        message = Message(
+            subject=email.subject,
+            recipients=[recipient.strip() for recipient in email.recipients.split(',') if recipient.strip()],
+            body=email.body,
+            html=email.html,
+            sender=email.sender or None
+        )
+        if not message.sender:
+            raise ValueError('Remetente não configurado (MAIL_DEFAULT_SENDER)')
+        return message
+
+    def _mark_sent(self, email):
+        email.status = 'enviado'
+        email.attempts += 1
+        email.sent_at = datetime.utcnow()
+        email.lock_token = None
+        email.last_error = None
+        with self._lock:
+            self.sent += 1
+        EMAILS_PROCESSED.labels(status='enviado').inc()
+
+    def _mark_failure(self, email, exc, permanent=False):
+        email.attempts += 1
+        email.lock_token = None
+        email.last_error = f'{type(exc).__name__}: {exc}'[:1000]
+        if permanent or email.attempts >= self.max_attempts:
+            email.status = 'falhou'
+            with self._lock:
+                self.failed += 1
+            EMAILS_PROCESSED.labels(status='falhou').inc()
+            self.logger.error('E-mail %s falhou após %s tentativa(s): %s', email.id, email.attempts, email.last_error)
+        else:
+            email.status = 'pendente'
+            email.next_attempt_at = datetime.utcnow() + timedelta(seconds=self.retry_delay_for(email.attempts))
+            with self._lock:
+                self.retried += 1
+            EMAILS_PROCESSED.labels(status='pendente').inc()
+
+    def _release(self, email):
+        """Devolve à fila um e-mail que não chegou a ser tentado (conexão caiu antes)"""
+        email.status = 'pendente'
+        email.lock_token = None
+        email.next_attempt_at = datetime.utcnow() + timedelta(seconds=self.retry_delay)
+
+    def send_batch(self):
+        """Envia um lote pela mesma conexão SMTP; retorna o número de e-mails processados"""
+        emails = self.claim()
+        if not emails:
+            return 0
+
+        pending = list(emails)
+        current = None
+        try:
+            with mail.connect() as connection:
+                with self._lock:
+                    self.connections += 1
+                while pending:
+                    current = pending[0]
+                    try:
+                        connection.send(self._message(current))
+                    except _MESSAGE_ERRORS as exc:
+                        self._mark_failure(current, exc, permanent=_is_permanent(exc))
+                    else:
+                        self._mark_sent(current)
+                    pending.pop(0)
+                    current = None
+                    # Commit por e-mail: uma queda do processo não reenvia os já entregues
+                    db.session.commit()
+        except (smtplib.SMTPException, OSError) as exc:
+            self.logger.warning('Conexão SMTP falhou (%s pendente(s) no lote): %s', len(pending), exc)
+            for email in pending:
+                if email is current:
+                    self._mark_failure(email, exc)
+                else:
+                    self._release(email)
+            db.session.commit()
+        return len(emails)
+
+    def run(self, once=False, poll_interval=None):
+        """Laço do processo de envio: lotes seguidos enquanto houver fila, depois aguarda"""
+        poll_interval = self.poll_interval if poll_interval is None else poll_interval
+        total = 0
+        while True:
+            processed = self.send_batch()
+            total += processed
+            if once and processed < self.batch_size:
+                return total
+            if processed < self.batch_size:
+                # Fim da transação antes de dormir (não segura conexão/snapshot)
+                db.session.remove()
+                time.sleep(poll_interval)
+
+    def queue_depth(self):
+        """
+        E-mails ainda na fila ({'pendente': n, 'enviando': n}) e idade em
+        segundos do pendente mais antigo (0 se não houver)
+
+        Lê só as linhas ativas pelo índice de status; o histórico de
+        enviados/falhos não entra.
+        """
+        rows = db.session.query(
+            OutboxEmail.status, func.count(OutboxEmail.id), func.min(OutboxEmail.created_at)
+        ).filter(OutboxEmail.status.in_(['pendente', 'enviando'])).group_by(OutboxEmail.status).all()
+        depth = {'pendente': 0, 'enviando': 0}
+        oldest_pending = None
+        for status, count, oldest in rows:
+            depth[status] = count
+            if status == 'pendente':
+                oldest_pending = oldest
+        age = (datetime.utcnow() - oldest_pending).total_seconds() if oldest_pending else 0
+        return depth, max(age, 0)
+
+    def observe_depth(self):
+        """Atualiza os gauges da fila (chamado a cada coleta do /metrics)"""
+        depth, oldest_pending_age = self.queue_depth()
+        for status, count in depth.items():
+            OUTBOX_DEPTH.labels(status=status).set(count)
+        OUTBOX_OLDEST_PENDING_AGE.set(oldest_pending_age)
+
+    def stats(self):
+        """Profundidade da fila por status e contadores deste processo"""
+        rows = db.session.query(
+            OutboxEmail.status, func.count(OutboxEmail.id), func.min(OutboxEmail.created_at)
+        ).group_by(OutboxEmail.status).all()
+        depth = {status: 0 for status in OUTBOX_STATUSES}
+        oldest_pending = None
+        for status, count, oldest in rows:
+            depth[status] = count
+            if status == 'pendente':
+                oldest_pending = oldest
+
+        with self._lock:
+            return {
+                'depth': depth,
+                'oldest_pending_age': round((datetime.utcnow() - oldest_pending).total_seconds(), 1) if oldest_pending else 0,
+                'sent': self.sent,
+                'failed': self.failed,
+                'retried': self.retried,
+                'connections': self.connections,
+                'batch_size': self.batch_size
+            }
+
+
+mail_outbox = MailOutbox()
@@ -0,0 +1,177 @@
+"""
+Métricas no formato do Prometheus (GET /metrics)
+Sistema CRM Profissional
+
+- crm_http_request_duration_seconds: latência por rota (endpoint), método e status;
+- crm_http_requests_in_progress: requisições em andamento;
+- crm_db_query_duration_seconds: duração dos comandos SQL por operação;
+- crm_db_pool_checkout_wait_seconds: espera para obter uma conexão do pool;
+- contadores do LeadManager, das automações, da fila de jobs, da fila de
+  e-mails e do cache do dashboard;
+- profundidade da fila de e-mails e idade do pendente mais antigo, lidas do
+  banco na coleta (funções registradas com metrics.on_collect).
+
+Com vários processos (gunicorn) as métricas são gravadas em arquivos no
+diretório PROMETHEUS_MULTIPROC_DIR e somadas na coleta, de modo que
+qualquer worker responde com o total. O gunicorn.conf.py cria um diretório
+novo a cada início; processos `flask run-jobs` / `flask send-mail` entram na
+soma se usarem o mesmo diretório.
+"""
+
+import os
+import time
+from flask import current_app, g, request
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest, multiprocess
+)
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from sqlalchemy.pool import QueuePool
+
+REQUEST_LATENCY = Histogram(
+    'crm_http_request_duration_seconds', 'Duração das requisições HTTP',
+    ['endpoint', 'method', 'status'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.075, 0.1, 0.25, 0.5, 0.75, 1, 2.5, 5, 10)
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    'crm_http_requests_in_progress', 'Requisições HTTP em andamento', multiprocess_mode='livesum'
+)
+DB_QUERY_DURATION = Histogram(
+    'crm_db_query_duration_seconds', 'Duração dos comandos SQL', ['operation'],
+    buckets=(0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5)
+)
+DB_POOL_CHECKOUT_WAIT = Histogram(
+    'crm_db_pool_checkout_wait_seconds', 'Espera para obter uma conexão do pool',
+    buckets=(0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1, 5, 30)
+)
+
+LEADS_CREATED = Counter('crm_leads_created_total', 'Leads criados pelo LeadManager')
+LEAD_STATUS_TRANSITIONS = Counter(
+    'crm_lead_status_transitions_total', 'Mudanças de status de leads', ['to_status']
+)
+AUTOMATIC_TASKS = Counter(
+    'crm_automatic_tasks_created_total', 'Tarefas criadas pelas automações do workflow', ['trigger']
+)
+JOBS_PROCESSED = Counter('crm_jobs_processed_total', 'Jobs executados pela fila', ['name', 'status'])
+EMAILS_PROCESSED = Counter('crm_outbox_emails_total', 'E-mails processados pela fila de saída', ['status'])
+# Lidos do banco a cada coleta; com vários workers vale o valor da última coleta
+OUTBOX_DEPTH = Gauge(
+    'crm_outbox_depth', 'E-mails na fila de saída por status (pendente, enviando)', ['status'],
+    multiprocess_mode='mostrecent'
+)
+OUTBOX_OLDEST_PENDING_AGE = Gauge(
+    'crm_outbox_oldest_pending_age_seconds', 'Idade do e-mail pendente mais antigo',
+    multiprocess_mode='mostrecent'
+)
+DASHBOARD_CACHE_REQUESTS = Counter(
+    'crm_dashboard_cache_requests_total', 'Leituras do cache do dashboard', ['result']
+)
+
+# Operações SQL com rótulo próprio; as demais entram como "other"
+SQL_OPERATIONS = frozenset({'select', 'insert', 'update', 'delete', 'with'})
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool que mede a espera para obter uma conexão (inclui abrir conexões novas)"""
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            DB_POOL_CHECKOUT_WAIT.observe(time.perf_counter() - started)
+
+
+def label_value(value, allowed, default='outro'):
+    """Limita os valores de um rótulo a um conjunto conhecido (cardinalidade)"""
+    return value if value in allowed else default
+
+
+class Metrics:
+    """Coleta das métricas HTTP e SQL e resposta do /metrics"""
+
+    def __init__(self, app=None):
+        self.token = None
+        self._listening = False
+        self._collect_hooks = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.token = app.config.get('METRICS_TOKEN')
+        app.extensions['metrics'] = self
+        if not self._listening:
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+            self._listening = True
+
+        @app.before_request
+        def start_request_metrics():
+            g.metrics_started = time.perf_counter()
+            REQUESTS_IN_PROGRESS.inc()
+
+        @app.after_request
+        def observe_request_metrics(response):
+            started = g.get('metrics_started')
+            if started is not None:
+                REQUEST_LATENCY.labels(
+                    endpoint=request.endpoint or 'unmatched',
+                    method=request.method,
+                    status=str(response.status_code)
+                ).observe(time.perf_counter() - started)
+            return response
+
+        @app.teardown_request
+        def finish_request_metrics(exc):
+            if g.pop('metrics_started', None) is not None:
+                REQUESTS_IN_PROGRESS.dec()
+
+    def authorized(self):
+        """
+        Com METRICS_TOKEN exige Authorization: Bearer <token>
+
+        Sem o token a coleta só é livre em desenvolvimento (app em modo debug
+        ou testes) e nas ferramentas que chamam as rotas no próprio processo
+        (benchmark, check-query-plans: METRICS_OPEN_ACCESS, sem variável de
+        ambiente); em produção /metrics responde 401 até o token ser definido.
+        """
+        if current_app.config.get('METRICS_OPEN_ACCESS'):
+            return True
+        if self.token:
+            return request.headers.get('Authorization') == f'Bearer {self.token}'
+        return current_app.debug or current_app.testing
+
+    def on_collect(self, function):
+        """Registra uma função que atualiza métricas (gauges) antes de cada coleta"""
+        if function not in self._collect_hooks:
+            self._collect_hooks.append(function)
+        return function
+
+    def render(self):
+        """Conteúdo e content-type da resposta do /metrics"""
+        for function in self._collect_hooks:
+            function()
+        if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+            registry = CollectorRegistry()
+            multiprocess.MultiProcessCollector(registry)
+        else:
+            registry = REGISTRY
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+
+    # Eventos do SQLAlchemy
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None:
+            context._metrics_started = time.perf_counter()
+
+    @staticmethod
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_metrics_started', None)
+        if started is not None:
+            operation = statement.lstrip()[:10].split(None, 1)[0].lower() if statement.strip() else ''
+            DB_QUERY_DURATION.labels(operation=label_value(operation, SQL_OPERATIONS, 'other')).observe(
+                time.perf_counter() - started
+            )
+
+
+metrics = Metrics()
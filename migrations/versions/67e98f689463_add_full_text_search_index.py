@@ -0,0 +1,26 @@
+"""add full text search index
+
+Revision ID: 67e98f689463
+Revises: 0626e85a9143
+Create Date: 2026-10-18 13:19:10.560312
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from search import create_search_index, drop_search_index
+
+
+# revision identifiers, used by Alembic.
+revision = '67e98f689463'
+down_revision = '0626e85a9143'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    create_search_index(op.get_bind(), rebuild=True)
+
+
+def downgrade():
+    drop_search_index(op.get_bind())
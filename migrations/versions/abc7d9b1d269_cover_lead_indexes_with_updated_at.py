@@ -0,0 +1,35 @@
+"""cover lead indexes with updated_at
+
+Revision ID: abc7d9b1d269
+Revises: d6b68d3112d0
+Create Date: 2026-10-18 14:04:26.614354
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'abc7d9b1d269'
+down_revision = 'd6b68d3112d0'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # updated_at no fim dos índices: versão dos dados (ETag) lida só do índice
+    op.drop_index('ix_leads_created_at', table_name='leads')
+    op.create_index('ix_leads_created_at', 'leads', ['created_at', 'updated_at'], unique=False)
+    op.drop_index('ix_leads_user_created_at', table_name='leads')
+    op.create_index('ix_leads_user_created_at', 'leads', ['user_id', 'created_at', 'updated_at'], unique=False)
+    op.drop_index('ix_leads_status_expected_close', table_name='leads')
+    op.create_index('ix_leads_status_expected_close', 'leads', ['status', 'expected_close_date', 'updated_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_leads_status_expected_close', table_name='leads')
+    op.create_index('ix_leads_status_expected_close', 'leads', ['status', 'expected_close_date'], unique=False)
+    op.drop_index('ix_leads_user_created_at', table_name='leads')
+    op.create_index('ix_leads_user_created_at', 'leads', ['user_id', 'created_at'], unique=False)
+    op.drop_index('ix_leads_created_at', table_name='leads')
+    op.create_index('ix_leads_created_at', 'leads', ['created_at'], unique=False)
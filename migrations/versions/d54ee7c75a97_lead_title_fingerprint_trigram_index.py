@@ -0,0 +1,32 @@
+"""lead title fingerprint trigram index
+
+Revision ID: d54ee7c75a97
+Revises: abc7d9b1d269
+Create Date: 2026-10-18 15:12:08.431907
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd54ee7c75a97'
+down_revision = 'abc7d9b1d269'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Títulos parecidos (LEAD_DEDUP_SIMILARITY) no PostgreSQL: o operador % do
+    # pg_trgm usa este índice; nos demais bancos a comparação é feita em Python
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+        op.execute(
+            "CREATE INDEX IF NOT EXISTS ix_leads_title_fingerprint_trgm "
+            "ON leads USING gin (title_fingerprint gin_trgm_ops)"
+        )
+
+
+def downgrade():
+    if op.get_bind().dialect.name == 'postgresql':
+        op.execute("DROP INDEX IF EXISTS ix_leads_title_fingerprint_trgm")
@@ -0,0 +1,26 @@
+"""add lookup indexes
+
+Revision ID: e650e022c23a
+Revises: 67e98f689463
+Create Date: 2026-10-18 13:21:38.044010
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e650e022c23a'
+down_revision = '67e98f689463'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_clients_name_lower', 'clients', [sa.text('lower(name)'), 'id'], unique=False)
+    op.create_index('ix_users_first_name_lower', 'users', [sa.text('lower(first_name)'), 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_users_first_name_lower', table_name='users')
+    op.drop_index('ix_clients_name_lower', table_name='clients')
@@ -0,0 +1,52 @@
+"""lead title fingerprint
+
+Revision ID: f7c38fa9862c
+Revises: cbd1f509f2a2
+Create Date: 2026-10-18 13:31:35.010804
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+from fingerprints import title_fingerprint
+
+
+# revision identifiers, used by Alembic.
+revision = 'f7c38fa9862c'
+down_revision = 'cbd1f509f2a2'
+branch_labels = None
+depends_on = None
+
+BACKFILL_BATCH_SIZE = 1000
+
+
+def upgrade():
+    op.add_column('leads', sa.Column('title_fingerprint', sa.String(length=200), nullable=True))
+
+    # Preenche o fingerprint dos leads existentes em lotes
+    connection = op.get_bind()
+    leads = sa.table('leads', sa.column('id', sa.Integer), sa.column('title', sa.String),
+                     sa.column('title_fingerprint', sa.String))
+    update = leads.update().where(leads.c.id == sa.bindparam('lead_id')).values(
+        title_fingerprint=sa.bindparam('fingerprint')
+    )
+    last_id = 0
+    while True:
+        rows = connection.execute(
+            sa.select(leads.c.id, leads.c.title).where(leads.c.id > last_id)
+            .order_by(leads.c.id).limit(BACKFILL_BATCH_SIZE)
+        ).all()
+        if not rows:
+            break
+        connection.execute(update, [
+            {'lead_id': row.id, 'fingerprint': title_fingerprint(row.title)} for row in rows
+        ])
+        last_id = rows[-1].id
+
+    op.create_index('ix_leads_client_fingerprint', 'leads', ['client_id', 'title_fingerprint'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_leads_client_fingerprint', table_name='leads')
+    # DROP COLUMN direto (SQLite 3.35+): recriar a tabela em lote quebraria os triggers da busca
+    op.drop_column('leads', 'title_fingerprint')
@@ -1,7 +1,9 @@
 from flask_login import UserMixin
 from datetime import datetime
 from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.orm import validates
 from database import db
+import fingerprints
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
@@ -31,6 +33,9 @@ class User(UserMixin, db.Model):
     def __repr__(self):
         return f'<User {self.username}>'
 
+# Busca rápida (typeahead) por prefixo do nome
+db.Index('ix_users_first_name_lower', db.func.lower(User.first_name), User.id)
+
 class Team(db.Model):
     __tablename__ = 'teams'
     
@@ -44,6 +49,11 @@ class Team(db.Model):
 
 class Client(db.Model):
     __tablename__ = 'clients'
+    __table_args__ = (
+        # Lista de clientes (ordenada por criação, com filtro opcional de status)
+        db.Index('ix_clients_created_at', 'created_at'),
+        db.Index('ix_clients_status_created_at', 'status', 'created_at'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(200), nullable=False)
@@ -67,11 +77,31 @@ class Client(db.Model):
     def __repr__(self):
         return f'<Client {self.name}>'
 
+# Busca rápida (typeahead) por prefixo do nome
+db.Index('ix_clients_name_lower', db.func.lower(Client.name), Client.id)
+
 class Lead(db.Model):
     __tablename__ = 'leads'
+    __table_args__ = (
+        # Lista de leads, analytics por período e pipeline por status
+        # (updated_at no fim: versão dos dados das APIs lida só do índice, ETag)
+        db.Index('ix_leads_created_at', 'created_at', 'updated_at'),
+        db.Index('ix_leads_status_created_at', 'status', 'created_at', 'id'),
+        db.Index('ix_leads_user_created_at', 'user_id', 'created_at', 'updated_at'),
+        # Leads em atraso e previsão de receita
+        db.Index('ix_leads_status_expected_close', 'status', 'expected_close_date', 'updated_at'),
+        db.Index('ix_leads_client_created_at', 'client_id', 'created_at'),
+        # Detecção de duplicados na criação do lead
+        db.Index('ix_leads_client_fingerprint', 'client_id', 'title_fingerprint'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
+    # Título normalizado (ver fingerprints.py); o default cobre também inserts em lote
+    title_fingerprint = db.Column(
+        db.String(200),
+        default=lambda context: fingerprints.title_fingerprint(context.get_current_parameters().get('title'))
+    )
     description = db.Column(db.Text)
     value = db.Column(db.Numeric(10, 2))
     status = db.Column(db.String(50), default='novo')  # novo, qualificado, proposta, negociacao, fechado, perdido
@@ -89,11 +119,24 @@ class Lead(db.Model):
     tasks = db.relationship('Task', backref='lead', lazy='dynamic')
     interactions = db.relationship('Interaction', backref='lead', lazy='dynamic')
     
+    @validates('title')
+    def _update_title_fingerprint(self, key, value):
+        self.title_fingerprint = fingerprints.title_fingerprint(value)
+        return value
+    
     def __repr__(self):
         return f'<Lead {self.title}>'
 
 class Task(db.Model):
     __tablename__ = 'tasks'
+    __table_args__ = (
+        # Lista de tarefas e tarefas próximas do vencimento
+        db.Index('ix_tasks_due_date', 'due_date'),
+        db.Index('ix_tasks_status_due_date', 'status', 'due_date'),
+        db.Index('ix_tasks_user_due_date', 'user_id', 'due_date'),
+        db.Index('ix_tasks_client_created_at', 'client_id', 'created_at'),
+        db.Index('ix_tasks_lead_id', 'lead_id'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     title = db.Column(db.String(200), nullable=False)
@@ -110,13 +153,18 @@ class Task(db.Model):
     client_id = db.Column(db.Integer, db.ForeignKey('clients.id'), nullable=True)
     
     # Relationships
-    client = db.relationship('Client', backref='tasks')
+    client = db.relationship('Client', backref=db.backref('tasks', lazy='dynamic'))
     
     def __repr__(self):
         return f'<Task {self.title}>'
 
 class Interaction(db.Model):
     __tablename__ = 'interactions'
+    __table_args__ = (
+        # Histórico de interações por cliente e por lead
+        db.Index('ix_interactions_client_date', 'client_id', 'date'),
+        db.Index('ix_interactions_lead_date', 'lead_id', 'date'),
+    )
     
     id = db.Column(db.Integer, primary_key=True)
     type = db.Column(db.String(50), nullable=False)  # email, telefone, reuniao, visita
@@ -133,4 +181,110 @@ class Interaction(db.Model):
     user = db.relationship('User', backref='interactions')
     
     def __repr__(self):
-        return f'<Interaction {self.type}: {self.subject}>'
\ No newline at end of file
+        return f'<Interaction {self.type}: {self.subject}>'
+
+class TaskTemplate(db.Model):
+    """Modelo de tarefa criada automaticamente quando um lead entra em um status"""
+    __tablename__ = 'task_templates'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(50), nullable=False, index=True)  # status do lead que dispara a tarefa
+    title = db.Column(db.String(200), nullable=False)  # aceita {title} (título do lead)
+    description = db.Column(db.Text)
+    days = db.Column(db.Integer, nullable=False, default=1)  # prazo em dias a partir da mudança
+    priority = db.Column(db.String(20), default='media')
+    position = db.Column(db.Integer, default=0)
+    active = db.Column(db.Boolean, default=True)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<TaskTemplate {self.status}: {self.title}>'
+
+class StageProbability(db.Model):
+    """Probabilidade de fechamento de um lead em cada status (previsão de receita)"""
+    __tablename__ = 'stage_probabilities'
+    
+    id = db.Column(db.Integer, primary_key=True)
+    status = db.Column(db.String(50), unique=True, nullable=False)
+    probability = db.Column(db.Numeric(5, 4), nullable=False)  # 0 a 1
+    
+    def __repr__(self):
+        return f'<StageProbability {self.status}: {self.probability}>'
+
+class LeadDailyStat(db.Model):
+    """Totais diários de leads por responsável e status (dia de criação do lead)"""
+    __tablename__ = 'lead_daily_stats'
+    __table_args__ = (
+        db.Index('ix_lead_daily_stats_day', 'day', 'user_id', 'status'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    day = db.Column(db.Date, nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'))
+    status = db.Column(db.String(50))
+    leads_count = db.Column(db.Integer, nullable=False, default=0)
+    value_sum = db.Column(db.Numeric(14, 2))
+    duration_days_sum = db.Column(db.Float)  # soma de (updated_at - created_at) em dias
+    duration_count = db.Column(db.Integer, nullable=False, default=0)
+    
+    def __repr__(self):
+        return f'<LeadDailyStat {self.day} {self.user_id} {self.status}: {self.leads_count}>'
+
+class RollupState(db.Model):
+    """Último dia consolidado de cada tabela de totais (ex.: lead_daily_stats)"""
+    __tablename__ = 'rollup_states'
+    
+    name = db.Column(db.String(50), primary_key=True)
+    closed_through = db.Column(db.Date, nullable=False)
+    updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    def __repr__(self):
+        return f'<RollupState {self.name}: {self.closed_through}>'
+
+class OutboxEmail(db.Model):
+    """E-mail na fila de saída (enviado em segundo plano pelo `flask send-mail`)"""
+    __tablename__ = 'outbox_emails'
+    __table_args__ = (
+        db.Index('ix_outbox_emails_status_next_attempt', 'status', 'next_attempt_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    recipients = db.Column(db.Text, nullable=False)  # separados por vírgula
+    sender = db.Column(db.String(200))  # vazio = MAIL_DEFAULT_SENDER
+    subject = db.Column(db.String(255), nullable=False)
+    body = db.Column(db.Text)
+    html = db.Column(db.Text)
+    status = db.Column(db.String(20), nullable=False, default='pendente')  # pendente, enviando, enviado, falhou
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    next_attempt_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    lock_token = db.Column(db.String(32))  # lote que reservou o e-mail
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    sent_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<OutboxEmail {self.status}: {self.subject}>'
+
+class Job(db.Model):
+    """Tarefa em segundo plano da fila de jobs (automações do workflow de leads)"""
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index('ix_jobs_status_run_at', 'status', 'run_at'),
+    )
+    
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)  # handler registrado em job_queue
+    payload = db.Column(db.Text)  # JSON
+    idempotency_key = db.Column(db.String(200), unique=True)  # mesmo evento enfileirado só uma vez
+    status = db.Column(db.String(20), nullable=False, default='pendente')  # pendente, executando, concluido, falhou
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    lock_token = db.Column(db.String(32))  # lote que reservou o job
+    locked_at = db.Column(db.DateTime)
+    last_error = db.Column(db.Text)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime)
+    
+    def __repr__(self):
+        return f'<Job {self.name} {self.status}>'
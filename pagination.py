@@ -0,0 +1,172 @@
+"""
+Utilitários de paginação por cursor (keyset)
+Sistema CRM Profissional
+
+Em vez de OFFSET + COUNT(*), as páginas são delimitadas pelo último valor
+da ordenação (sort, id). Os tokens são opacos para o cliente e codificam
+o valor de ordenação, o id e o sentido (próxima/anterior).
+"""
+
+import base64
+import json
+from datetime import date, datetime
+from sqlalchemy import and_, or_, func, select, text
+from database import db
+
+
+def encode_cursor(sort_value, row_id, backwards=False):
+    """Gera um token opaco a partir do valor de ordenação e do id da linha"""
+    if isinstance(sort_value, datetime):
+        sort_value = {'dt': sort_value.isoformat()}
+    elif isinstance(sort_value, date):
+        sort_value = {'d': sort_value.isoformat()}
+    payload = [sort_value, row_id, 1] if backwards else [sort_value, row_id]
+    payload = json.dumps(payload, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(token):
+    """
+    Decodifica um token gerado por encode_cursor
+
+    Retorna (sort_value, row_id, backwards) ou None se o token for inválido.
+    """
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        payload = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        sort_value, row_id = payload[0], int(payload[1])
+        if isinstance(sort_value, dict):
+            if 'dt' in sort_value:
+                sort_value = datetime.fromisoformat(sort_value['dt'])
+            else:
+                sort_value = date.fromisoformat(sort_value['d'])
+        return sort_value, row_id, len(payload) > 2 and bool(payload[2])
+    except (ValueError, TypeError, IndexError, KeyError):
+        return None
+
+
+def keyset_filter(sort_column, id_column, cursor, descending=True, nulls_last=False):
+    """
+    Condição SQL para as linhas posteriores ao cursor na ordem (sort, id)
+
+    Com nulls_last=True as linhas com sort nulo vêm depois de todas as outras
+    (ex.: tarefas sem data de vencimento).
+    """
+    sort_value, row_id = cursor[0], cursor[1]
+    after_id = id_column < row_id if descending else id_column > row_id
+
+    if sort_value is None:
+        tie = and_(sort_column.is_(None), after_id)
+        return tie if nulls_last else or_(tie, sort_column.isnot(None))
+
+    beyond = sort_column < sort_value if descending else sort_column > sort_value
+    condition = or_(beyond, and_(sort_column == sort_value, after_id))
+    return or_(condition, sort_column.is_(None)) if nulls_last else condition
+
+
+def estimate_count(query, cap=10000):
+    """
+    Total aproximado de uma consulta
+
+    No PostgreSQL usa a estimativa do planejador (EXPLAIN); nos demais bancos
+    conta no máximo `cap` linhas. Retorna (total, is_estimate).
+    """
+    bind = db.session.get_bind()
+    statement = query.order_by(None).statement
+
+    if bind.dialect.name == 'postgresql':
+        compiled = statement.compile(bind, compile_kwargs={'literal_binds': True})
+        plan = db.session.execute(text(f'EXPLAIN (FORMAT JSON) {compiled}')).scalar()
+        return int(plan[0]['Plan']['Plan Rows']), True
+
+    capped = statement.limit(cap + 1).subquery()
+    total = db.session.execute(select(func.count()).select_from(capped)).scalar()
+    return min(total, cap), total > cap
+
+
+class KeysetPagination:
+    """
+    Página obtida por cursor
+
+    Expõe a mesma interface básica do Pagination do Flask-SQLAlchemy usada
+    nos templates (items, total, pages, has_next, has_prev, iter_pages), mais
+    os tokens next_cursor / prev_cursor.
+    """
+
+    # Compatibilidade com os templates que usam paginação numerada
+    page = None
+    pages = 0
+    prev_num = None
+    next_num = None
+
+    def __init__(self, items, per_page, next_cursor=None, prev_cursor=None,
+                 total=None, total_is_estimate=False):
+        self.items = items
+        self.per_page = per_page
+        self.next_cursor = next_cursor
+        self.prev_cursor = prev_cursor
+        self.total = total
+        self.total_is_estimate = total_is_estimate
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    @property
+    def has_prev(self):
+        return self.prev_cursor is not None
+
+    def iter_pages(self, *args, **kwargs):
+        return iter(())
+
+
+def keyset_paginate(query, sort_column, id_column, cursor=None, per_page=20,
+                    descending=True, nulls_last=False, with_total=True):
+    """
+    Pagina uma query pela ordem (sort_column, id_column)
+
+    `cursor` é um token gerado por uma página anterior (next_cursor ou
+    prev_cursor). A query não deve ter ORDER BY próprio.
+    """
+    position = decode_cursor(cursor)
+    backwards = bool(position and position[2])
+
+    total, total_is_estimate = (None, False)
+    if with_total:
+        total, total_is_estimate = estimate_count(query)
+
+    # Página anterior: percorre a ordem invertida e depois desinverte
+    direction = descending != backwards
+    nulls = nulls_last and not backwards
+    sort_order = sort_column.desc() if direction else sort_column.asc()
+    id_order = id_column.desc() if direction else id_column.asc()
+    if nulls_last:
+        sort_order = sort_order.nullsfirst() if backwards else sort_order.nullslast()
+
+    if position:
+        query = query.filter(keyset_filter(sort_column, id_column, position, direction, nulls))
+
+    rows = query.order_by(sort_order, id_order).limit(per_page + 1).all()
+    has_more = len(rows) > per_page
+    rows = rows[:per_page]
+    if backwards:
+        rows.reverse()
+
+    sort_key, id_key = sort_column.key, id_column.key
+    first, last = (rows[0], rows[-1]) if rows else (None, None)
+
+    if backwards:
+        has_next, has_prev = position is not None, has_more
+    else:
+        has_next, has_prev = has_more, position is not None
+
+    return KeysetPagination(
+        items=rows,
+        per_page=per_page,
+        next_cursor=encode_cursor(getattr(last, sort_key), getattr(last, id_key)) if has_next and last else None,
+        prev_cursor=encode_cursor(getattr(first, sort_key), getattr(first, id_key), backwards=True) if has_prev and first else None,
+        total=total,
+        total_is_estimate=total_is_estimate
+    )
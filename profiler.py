@@ -0,0 +1,150 @@
+"""
+Perfil de tempo por requisição (cabeçalho Server-Timing)
+Sistema CRM Profissional
+
+Com PROFILER_ENABLED=true cada requisição mede:
+- sql: quantidade de comandos e tempo total no banco (eventos
+  before_cursor_execute / after_cursor_execute);
+- tpl: tempo de renderização dos templates (sinais before_render_template /
+  template_rendered), sem contar as consultas feitas durante a renderização;
+- app: o restante (Python da rota, serialização, etc.).
+
+Os valores saem no cabeçalho Server-Timing (visível na aba Network do
+navegador) e as requisições recentes de cada rota ficam num buffer circular
+(PROFILER_HISTORY por rota), exibido em /debug/perf. Em respostas em
+streaming só a parte anterior ao envio do corpo é medida.
+"""
+
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from flask import before_render_template, g, has_request_context, request, template_rendered
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class RequestProfiler:
+    """Mede SQL, templates e Python de cada requisição"""
+
+    def __init__(self, app=None):
+        self.enabled = False
+        self.history_size = 50
+        self._lock = threading.Lock()
+        self._history = {}
+        self._listening = False
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.enabled = app.config.get('PROFILER_ENABLED', False)
+        self.history_size = app.config.get('PROFILER_HISTORY', 50)
+        app.extensions['request_profiler'] = self
+        if not self.enabled:
+            return
+
+        if not self._listening:
+            event.listen(Engine, 'before_cursor_execute', self._before_cursor_execute)
+            event.listen(Engine, 'after_cursor_execute', self._after_cursor_execute)
+            self._listening = True
+        before_render_template.connect(self._before_render, app)
+        template_rendered.connect(self._after_render, app)
+
+        @app.before_request
+        def start_profile():
+            g.profile = {'start': time.perf_counter(), 'sql_count': 0, 'sql_time': 0.0,
+                         'template_time': 0.0, 'templates': []}
+
+        @app.after_request
+        def finish_profile(response):
+            profile = g.pop('profile', None)
+            if profile is None or request.endpoint in (None, 'static'):
+                return response
+
+            total = time.perf_counter() - profile['start']
+            record = {
+                'endpoint': request.endpoint,
+                'method': request.method,
+                'path': request.full_path.rstrip('?'),
+                'status': response.status_code,
+                'at': datetime.now(),
+                'total_ms': total * 1000,
+                'sql_count': profile['sql_count'],
+                'sql_ms': profile['sql_time'] * 1000,
+                'template_ms': profile['template_time'] * 1000,
+                'app_ms': max(total - profile['sql_time'] - profile['template_time'], 0) * 1000
+            }
+            response.headers.add('Server-Timing', self.server_timing(record))
+            self.record(record)
+            return response
+
+    @staticmethod
+    def server_timing(record):
+        """Valor do cabeçalho Server-Timing"""
+        return ', '.join([
+            f'sql;dur={record["sql_ms"]:.1f};desc="SQL ({record["sql_count"]})"',
+            f'tpl;dur={record["template_ms"]:.1f};desc="Templates"',
+            f'app;dur={record["app_ms"]:.1f};desc="Python"',
+            f'total;dur={record["total_ms"]:.1f}'
+        ])
+
+    def record(self, record):
+        with self._lock:
+            history = self._history.get(record['endpoint'])
+            if history is None:
+                history = self._history[record['endpoint']] = deque(maxlen=self.history_size)
+            history.append(record)
+
+    def report(self, slowest=10):
+        """
+        Resumo por rota: requisições no buffer, mediana, máximo e as mais lentas
+
+        Rotas ordenadas pelo tempo máximo (as mais lentas primeiro).
+        """
+        with self._lock:
+            snapshot = {endpoint: list(history) for endpoint, history in self._history.items()}
+
+        report = []
+        for endpoint, records in snapshot.items():
+            durations = sorted(record['total_ms'] for record in records)
+            report.append({
+                'endpoint': endpoint,
+                'count': len(records),
+                'median_ms': durations[len(durations) // 2],
+                'max_ms': durations[-1],
+                'avg_sql_count': sum(record['sql_count'] for record in records) / len(records),
+                'slowest': sorted(records, key=lambda record: record['total_ms'], reverse=True)[:slowest]
+            })
+        return sorted(report, key=lambda item: item['max_ms'], reverse=True)
+
+    def clear(self):
+        with self._lock:
+            self._history.clear()
+
+    # Eventos do SQLAlchemy e sinais do Jinja
+    @staticmethod
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        if context is not None and has_request_context() and 'profile' in g:
+            context._profile_started = time.perf_counter()
+
+    @staticmethod
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = getattr(context, '_profile_started', None)
+        if started is not None and has_request_context() and 'profile' in g:
+            g.profile['sql_time'] += time.perf_counter() - started
+            g.profile['sql_count'] += 1
+
+    @staticmethod
+    def _before_render(sender, template, context, **extra):
+        if 'profile' in g:
+            g.profile['templates'].append((time.perf_counter(), g.profile['sql_time']))
+
+    @staticmethod
+    def _after_render(sender, template, context, **extra):
+        if 'profile' in g and g.profile['templates']:
+            started, sql_time = g.profile['templates'].pop()
+            elapsed = time.perf_counter() - started
+            g.profile['template_time'] += elapsed - (g.profile['sql_time'] - sql_time)
+
+
+request_profiler = RequestProfiler()
@@ -0,0 +1,87 @@
+"""
+Contagem de consultas SQL por requisição
+Sistema CRM Profissional
+
+Cada rota pode declarar um orçamento máximo de consultas com
+@query_budget.limit(n). Ao final da requisição o total é comparado com o
+orçamento: em QUERY_BUDGET_MODE='warn' (padrão) o excesso é registrado no
+log; em 'strict' (testes/CI) ele também fica em `violations` e
+raise_violations() levanta QueryBudgetExceeded (os testes chamam ao final de
+cada caso). A resposta não muda: quando o orçamento é verificado a rota já
+gravou (commit) o que tinha de gravar.
+O total também é enviado no cabeçalho X-Query-Count. Em respostas em
+streaming só contam as consultas feitas antes do corpo.
+"""
+
+from flask import g, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+class QueryBudgetExceeded(Exception):
+    """Rota executou mais consultas do que o orçamento declarado"""
+
+
+class QueryBudget:
+    """Conta as consultas de cada requisição e verifica o orçamento da rota"""
+
+    def __init__(self, app=None):
+        self._listening = False
+        self.violations = []
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        app.config.setdefault('QUERY_BUDGET_MODE', 'warn')
+        app.extensions['query_budget'] = self
+        if not self._listening:
+            event.listen(Engine, 'before_cursor_execute', self._count_query)
+            self._listening = True
+
+        @app.before_request
+        def start_query_count():
+            g.query_count = 0
+
+        @app.after_request
+        def check_query_budget(response):
+            mode = app.config['QUERY_BUDGET_MODE']
+            if mode == 'off':
+                return response
+
+            count = g.get('query_count', 0)
+            response.headers['X-Query-Count'] = str(count)
+
+            budget = self.budget_for(app, request.endpoint)
+            if budget is not None and count > budget:
+                message = f'{request.endpoint}: {count} consultas (orçamento: {budget})'
+                if mode == 'strict':
+                    self.violations.append(message)
+                app.logger.warning('Orçamento de consultas excedido - %s', message)
+            return response
+
+    def raise_violations(self):
+        """Levanta QueryBudgetExceeded com os excessos registrados em modo strict (e os descarta)"""
+        violations, self.violations = self.violations, []
+        if violations:
+            raise QueryBudgetExceeded('; '.join(violations))
+
+    @staticmethod
+    def limit(max_queries):
+        """Declara o número máximo de consultas SQL de uma rota"""
+        def decorator(view):
+            view._query_budget = max_queries
+            return view
+        return decorator
+
+    @staticmethod
+    def budget_for(app, endpoint):
+        view = app.view_functions.get(endpoint)
+        return getattr(view, '_query_budget', None)
+
+    @staticmethod
+    def _count_query(conn, cursor, statement, parameters, context, executemany):
+        if has_request_context():
+            g.query_count = g.get('query_count', 0) + 1
+
+
+query_budget = QueryBudget()
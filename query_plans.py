@@ -0,0 +1,310 @@
+"""
+Verificação dos planos de execução das consultas críticas
+Sistema CRM Profissional
+
+Cada cenário executa o código real: as rotas pelo cliente de testes do Flask
+(com a sessão de um usuário do banco) e os construtores de consulta do
+LeadManager, do cache do dashboard e das filas. Todo SELECT emitido é
+capturado com os seus parâmetros e passa por EXPLAIN QUERY PLAN (SQLite) /
+EXPLAIN (PostgreSQL).
+
+É falha uma varredura sem limite de uma tabela: SCAN sem índice, SCAN ...
+USING (COVERING) INDEX (o índice inteiro é lido), Seq Scan ou Index Scan sem
+condição no PostgreSQL. Não contam:
+- varreduras em ordem de índice que param no LIMIT (sem ordenação ou
+  agrupamento em B-tree temporária / nó Sort);
+- tabelas pequenas de cadastro (SMALL_TABLES);
+- as tabelas em `allow` de cada cenário, só em consultas de totais (sem
+  LIMIT), com o motivo de percorrer a tabela inteira.
+
+Um cenário também pode exigir índices (`indexes`, por banco): cada nome
+precisa aparecer no plano de alguma das suas consultas.
+"""
+
+import contextvars
+import re
+from contextlib import contextmanager
+from datetime import datetime
+from jinja2 import TemplateNotFound
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+from werkzeug.routing import BuildError
+from database import db
+from dashboard_cache import dashboard_cache
+from jobs import job_queue
+from lead_functions import LeadManager
+from mail_outbox import mail_outbox
+from models import Client, Lead, User
+
+# Tabelas de cadastro com poucas linhas: varrer é mais barato que qualquer índice
+SMALL_TABLES = frozenset({'users', 'teams', 'stage_probabilities', 'task_templates', 'rollup_states'})
+
+PAGINATION_COUNT = 'contagem da paginação numerada (PAGINATION_MODE=keyset não conta)'
+PIPELINE_TOTALS = 'totais de leads e valor por coluna do quadro do pipeline'
+
+# Busca de leads: FTS5 no SQLite; no PostgreSQL um índice de trigramas por
+# ramo do UNION (título do lead e nome do cliente)
+LEAD_SEARCH_INDEXES = {
+    'sqlite': ('leads_fts',),
+    'postgresql': ('ix_leads_title_trgm', 'ix_clients_name_trgm')
+}
+
+# A página já executou as consultas; falta no repositório o template (ou um link dele)
+_RENDER_ERRORS = (TemplateNotFound, BuildError)
+
+_SQLITE_SCAN = re.compile(r'^SCAN (\w+)')
+_SQLITE_SORTS = ('USE TEMP B-TREE FOR ORDER BY', 'USE TEMP B-TREE FOR GROUP BY', 'USE TEMP B-TREE FOR DISTINCT')
+_TABLE_ALIAS = re.compile(r'\b(\w+) AS (\w+)\b')
+_LIMIT = re.compile(r'\bLIMIT\b', re.IGNORECASE)
+
+# Nós do PostgreSQL que leem toda a entrada antes de devolver a primeira linha
+_POSTGRESQL_BLOCKING = frozenset({
+    'Sort', 'Incremental Sort', 'Aggregate', 'Hash', 'Materialize', 'Unique', 'WindowAgg', 'SetOp'
+})
+
+
+def _sqlite_plan(connection, statement, parameters):
+    lines = [row[-1] for row in connection.exec_driver_sql(f'EXPLAIN QUERY PLAN {statement}', parameters)]
+    aliases = {alias: table for table, alias in _TABLE_ALIAS.findall(statement) if table in db.metadata.tables}
+    limited = bool(_LIMIT.search(statement)) and not any(line.startswith(_SQLITE_SORTS) for line in lines)
+
+    scans = []
+    for line in lines:
+        match = _SQLITE_SCAN.match(line)
+        if match is None:
+            continue
+        # Subconsultas materializadas (anon_1) e tabelas virtuais do FTS não estão no metadata
+        table = aliases.get(match.group(1), match.group(1))
+        if table in db.metadata.tables and not limited:
+            scans.append(table)
+    return lines, scans
+
+
+def _postgresql_nodes(node, lines, scans, depth=0, limited=False):
+    kind = node['Node Type']
+    relation = node.get('Relation Name')
+    line = '  ' * depth + kind
+    if relation:
+        line += f' on {relation}'
+    if node.get('Index Name'):
+        line += f" using {node['Index Name']}"
+    if node.get('Index Cond'):
+        line += f" ({node['Index Cond']})"
+    lines.append(line)
+
+    if kind == 'Limit':
+        limited = True
+    elif kind in _POSTGRESQL_BLOCKING:
+        limited = False
+    unbounded = kind == 'Seq Scan' or (kind in ('Index Scan', 'Index Only Scan') and 'Index Cond' not in node)
+    if relation and unbounded and not limited:
+        scans.append(relation)
+    for child in node.get('Plans', []):
+        _postgresql_nodes(child, lines, scans, depth + 1, limited)
+
+
+def _postgresql_plan(connection, statement, parameters):
+    # Em tabelas pequenas o PostgreSQL sempre prefere Seq Scan; desligamos
+    # para verificar se existe um índice utilizável
+    connection.exec_driver_sql('SET LOCAL enable_seqscan = off')
+    plan = connection.exec_driver_sql(f'EXPLAIN (FORMAT JSON) {statement}', parameters).scalar()
+    lines, scans = [], []
+    _postgresql_nodes(plan[0]['Plan'], lines, scans)
+    return lines, scans
+
+
+def explain(connection, statement, parameters=()):
+    """
+    Plano de execução de uma consulta SQL (texto e parâmetros do driver)
+
+    Retorna (linhas do plano, tabelas varridas sem limite).
+    """
+    if connection.dialect.name == 'sqlite':
+        return _sqlite_plan(connection, statement, parameters)
+    return _postgresql_plan(connection, statement, parameters)
+
+
+class PlanScenario:
+    """
+    Um cenário verificado: run() executa o código real; allow = {tabela: motivo};
+    indexes = {banco: nomes dos índices que o plano precisa usar}
+    """
+
+    def __init__(self, name, run, setup=None, allow=None, indexes=None):
+        self.name = name
+        self.run = run
+        self.setup = setup
+        self.allow = allow or {}
+        self.indexes = indexes or {}
+
+
+class QueryPlanCheck:
+    """Executa os cenários e verifica o plano de cada SELECT emitido"""
+
+    def __init__(self, app, username='admin'):
+        self.app = app
+        self.username = username
+        self.sample = {}
+        self._captured = []
+
+    def run(self):
+        """
+        Executa todos os cenários
+
+        Retorna {nome: {'queries': [{'sql', 'plan', 'scans'}], 'failures': [...],
+        'missing_indexes': [...]}}; failures traz só as consultas com varreduras
+        não permitidas e missing_indexes os índices exigidos fora dos planos.
+        """
+        # Contexto vazio: cada requisição de teste cria o próprio app context,
+        # mesmo quando chamado de dentro do app context do CLI
+        return contextvars.Context().run(self._run)
+
+    def _run(self):
+        with self._check_settings():
+            with self.app.app_context():
+                self._load_sample()
+            return {scenario.name: self.check(scenario) for scenario in self.scenarios()}
+
+    def check(self, scenario):
+        if scenario.setup:
+            with self.app.app_context():
+                scenario.setup()
+        self._captured = []
+        event.listen(Engine, 'before_cursor_execute', self._capture)
+        try:
+            scenario.run()
+        except _RENDER_ERRORS:
+            pass
+        finally:
+            event.remove(Engine, 'before_cursor_execute', self._capture)
+
+        queries, seen, dialects = [], set(), set()
+        for engine, statement, parameters in self._captured:
+            dialects.add(engine.dialect.name)
+            if statement in seen:
+                continue
+            seen.add(statement)
+            with engine.connect() as connection:
+                plan, scans = explain(connection, statement, parameters)
+            # Totais (sem LIMIT) podem percorrer as tabelas declaradas no cenário
+            if not _LIMIT.search(statement):
+                scans = [table for table in scans if table not in scenario.allow]
+            scans = [table for table in scans if table not in SMALL_TABLES]
+            queries.append({'sql': statement, 'plan': plan, 'scans': scans})
+
+        plan_text = '\n'.join(line for query in queries for line in query['plan'])
+        required = [index for dialect in sorted(dialects) for index in scenario.indexes.get(dialect, ())]
+        return {
+            'queries': queries,
+            'failures': [query for query in queries if query['scans']],
+            'missing_indexes': [index for index in required if index not in plan_text]
+        }
+
+    def _capture(self, conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip()[:6].upper().startswith(('SELECT', 'WITH')):
+            self._captured.append((conn.engine, statement, parameters))
+
+    @contextmanager
+    def _check_settings(self):
+        app = self.app
+        # Sem avisos de orçamento, exceções das rotas com a mensagem original e /metrics sem token
+        overrides = {'QUERY_BUDGET_MODE': 'off', 'PROPAGATE_EXCEPTIONS': True, 'METRICS_OPEN_ACCESS': True}
+        saved = {key: app.config.get(key) for key in overrides}
+        app.config.update(overrides)
+        in_process, job_queue.in_process = job_queue.in_process, False
+        try:
+            yield
+        finally:
+            job_queue.in_process = in_process
+            app.config.update(saved)
+
+    def _load_sample(self):
+        user = User.query.filter_by(username=self.username).first()
+        if user is None:
+            raise ValueError(f'Usuário {self.username} não encontrado')
+        lead = Lead.query.order_by(Lead.id.desc()).first()
+        client = Client.query.order_by(Client.id.desc()).first()
+        self.sample = {
+            'user_id': user.id,
+            'client_id': client.id if client else 0,
+            'lead_title': lead.title if lead else 'Proposta de software',
+            'lead_client_id': lead.client_id if lead else None
+        }
+
+    # Cenários
+    def _client(self):
+        client = self.app.test_client()
+        with client.session_transaction() as session:
+            session['_user_id'] = str(self.sample['user_id'])
+            session['_fresh'] = True
+        return client
+
+    def scenarios(self):
+        sample = self.sample
+        client = self._client()
+        user_id = sample['user_id']
+
+        def get(name, path, headers=None, **options):
+            def run():
+                response = client.get(path, headers=headers)
+                response.get_data()  # respostas em streaming executam as consultas ao gerar o corpo
+                response.close()
+            return PlanScenario(name, run, **options)
+
+        def in_request(name, function, **options):
+            def run():
+                with self.app.test_request_context():
+                    result = function()
+                    if hasattr(result, '__next__'):
+                        for _ in result:
+                            pass
+            return PlanScenario(name, run, **options)
+
+        ndjson = {'Accept': 'application/x-ndjson'}
+        return [
+            get('dashboard', '/', setup=dashboard_cache.invalidate, allow={
+                'leads': 'leads por status do snapshot (em cache por DASHBOARD_CACHE_TTL)',
+                'clients': 'total de clientes do snapshot (em cache por DASHBOARD_CACHE_TTL)'
+            }),
+            get('clients', '/clients', allow={'clients': PAGINATION_COUNT}),
+            get('clients: status', '/clients?status=ativo', allow={'clients': PAGINATION_COUNT}),
+            get('clients: busca', '/clients?query=silva'),
+            get('clients: cursor', '/clients?cursor='),
+            get('view_client', f"/clients/{sample['client_id']}"),
+            get('leads', '/leads', allow={'leads': f'{PAGINATION_COUNT}; {PIPELINE_TOTALS}'}),
+            get('leads: filtros', f'/leads?status=proposta&user_id={user_id}',
+                allow={'leads': PIPELINE_TOTALS}),
+            get('leads: busca', '/leads?query=software', allow={'leads': PIPELINE_TOTALS},
+                indexes=LEAD_SEARCH_INDEXES),
+            get('leads: busca por cliente', '/leads?query=silva', allow={'leads': PIPELINE_TOTALS},
+                indexes=LEAD_SEARCH_INDEXES),
+            get('leads: cursor', '/leads?cursor=', allow={'leads': PIPELINE_TOTALS}),
+            get('tasks', '/tasks', allow={'tasks': PAGINATION_COUNT}),
+            get('tasks: filtros', f'/tasks?status=pendente&user_id={user_id}'),
+            get('tasks: cursor', '/tasks?cursor='),
+            get('analytics', '/api/leads/analytics?period=30'),
+            get('analytics: usuário 365d', f'/api/leads/analytics?period=365&user_id={user_id}'),
+            get('forecast', '/api/leads/forecast?months=3'),
+            get('forecast: ndjson', '/api/leads/forecast?months=12', headers=ndjson),
+            get('pipeline', '/api/leads/pipeline', allow={'leads': PIPELINE_TOTALS}),
+            get('pipeline: usuário', f'/api/leads/pipeline?user_id={user_id}'),
+            get('pipeline: coluna', '/api/leads/pipeline/proposta'),
+            get('overdue', '/api/leads/overdue'),
+            get('overdue: ndjson', '/api/leads/overdue', headers=ndjson),
+            get('lookup: clientes', '/api/lookup/clients?q=sil'),
+            get('lookup: clientes sem prefixo', '/api/lookup/clients'),
+            get('lookup: usuários', '/api/lookup/users?q=a'),
+            in_request('create_lead: duplicados',
+                       lambda: LeadManager.find_duplicate_leads(sample['lead_title'], sample['lead_client_id'])),
+            in_request('create_lead: duplicados sem cliente',
+                       lambda: LeadManager.find_duplicate_leads(sample['lead_title'])),
+            get('metrics: fila de e-mails', '/metrics'),
+            in_request('send-mail: fila', lambda: mail_outbox._ready_query(datetime.utcnow()).all()),
+            in_request('run-jobs: fila', lambda: job_queue._ready_query(datetime.utcnow()).all()),
+        ]
+
+
+def find_full_scans(app, username='admin'):
+    """Cenários com varreduras não permitidas: {nome: consultas com falha}"""
+    results = QueryPlanCheck(app, username).run()
+    return {name: result['failures'] for name, result in results.items() if result['failures']}
@@ -1,46 +1,136 @@
-from flask import render_template, request, redirect, url_for, flash, jsonify, session, current_app
+from flask import render_template, request, redirect, url_for, flash, jsonify, session, current_app, Response, stream_with_context, send_from_directory
 from flask_login import login_user, login_required, logout_user, current_user
 from sqlalchemy import or_, and_, func
-from datetime import datetime, timedelta
+from sqlalchemy.orm import joinedload
+from werkzeug.http import is_resource_modified
+from datetime import datetime, timedelta, timezone
+import hashlib
+import io
+import json
+import os
+import uuid
 from database import db
 from models import User, Client, Lead, Task, Interaction, Team
 from forms import LoginForm, ClientForm, LeadForm, TaskForm, InteractionForm, UserForm, SearchForm
-from lead_functions import LeadManager
+from lead_functions import LeadManager, FORECAST_PAGE_SIZE
+from dashboard_cache import dashboard_cache
+from list_filters import filter_clients, filter_leads, filter_tasks, search_term
+from pagination import keyset_paginate, keyset_filter, encode_cursor, decode_cursor
+from query_budget import query_budget
+from workflow_templates import task_templates
+from importer import IMPORTERS
+from exporter import EXPORTS, EXPORT_FORMATS, export_stream
+from mail_outbox import mail_outbox
+from jobs import job_queue
+from profiler import request_profiler
+from metrics import metrics
+
+# Quantidade de cards exibidos por coluna do pipeline
+PIPELINE_PREVIEW_SIZE = 10
+
+# Quantidade padrão de sugestões nas buscas rápidas
+LOOKUP_LIMIT = 10
+
+def lookup_page(query, sort_key, id_column, cursor, limit):
+    """
+    Página de uma busca rápida ordenada por (sort_key, id)
+
+    Retorna (linhas, next_cursor) ou None se o cursor for inválido.
+    """
+    if cursor:
+        position = decode_cursor(cursor)
+        if position is None:
+            return None
+        query = query.filter(keyset_filter(sort_key, id_column, position, descending=False))
+    
+    rows = query.order_by(sort_key, id_column).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1].sort_key, rows[limit - 1].id) if len(rows) > limit else None
+    return rows[:limit], next_cursor
+
+def wants_ndjson():
+    """Indica se o cliente pediu a resposta em streaming (Accept: application/x-ndjson)"""
+    return request.accept_mimetypes.best_match(['application/json', 'application/x-ndjson']) == 'application/x-ndjson'
+
+def ndjson_response(records):
+    """Resposta em streaming com um registro JSON por linha"""
+    def generate():
+        for record in records:
+            yield json.dumps(record, ensure_ascii=False, default=str) + '\n'
+    return Response(stream_with_context(generate()), mimetype='application/x-ndjson')
+
+def data_validators(version, *scope, not_before=None):
+    """
+    ETag e Last-Modified de uma versão dos dados (quantidade, último updated_at)
+
+    `scope` entra no ETag (parâmetros e formato da resposta). `not_before` é
+    o menor Last-Modified aceito, para respostas que dependem da data atual.
+    """
+    count, last_updated = version
+    etag = hashlib.sha1(json.dumps([count, last_updated, *scope], default=str).encode()).hexdigest()
+    last_modified = last_updated.replace(tzinfo=timezone.utc) if last_updated else None
+    if not_before and (last_modified is None or not_before > last_modified):
+        last_modified = not_before
+    return etag, last_modified
+
+def with_validators(response, etag, last_modified):
+    """Validadores na resposta; o navegador guarda o corpo e revalida a cada uso"""
+    response.set_etag(etag)
+    if last_modified:
+        response.last_modified = last_modified
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+def not_modified(etag, last_modified):
+    """
+    Resposta 304 se o cliente já tem essa versão, senão None
+
+    If-None-Match tem precedência sobre If-Modified-Since (o ETag também
+    muda quando um lead é removido sem alterar o último updated_at).
+    """
+    if is_resource_modified(request.environ, etag=etag, last_modified=last_modified):
+        return None
+    return with_validators(Response(status=304), etag, last_modified)
+
+def use_keyset_pagination(ranked=False):
+    """
+    Indica se a listagem deve usar paginação por cursor
+
+    Ativada por PAGINATION_MODE=keyset ou pelo parâmetro ?cursor= na URL.
+    Buscas ordenadas por relevância continuam com paginação numerada.
+    """
+    if ranked:
+        return False
+    return current_app.config.get('PAGINATION_MODE') == 'keyset' or 'cursor' in request.args
 
 def register_routes(app):
     @app.route('/')
     @login_required
+    @query_budget.limit(6)
     def dashboard():
         """Dashboard principal com métricas e resumos"""
-        # Métricas básicas
-        total_clients = Client.query.count()
-        total_leads = Lead.query.count()
-        active_leads = Lead.query.filter(Lead.status.in_(['novo', 'qualificado', 'proposta', 'negociacao'])).count()
-        closed_leads = Lead.query.filter_by(status='fechado').count()
-        pending_tasks = Task.query.filter_by(status='pendente').count()
-        
-        # Leads por status para o gráfico
-        leads_by_status = db.session.query(Lead.status, func.count(Lead.id)).group_by(Lead.status).all()
-        
-        # Tarefas próximas do vencimento (próximos 7 dias)
-        upcoming_tasks = Task.query.filter(
-            Task.due_date >= datetime.now(),
-            Task.due_date <= datetime.now() + timedelta(days=7),
-            Task.status.in_(['pendente', 'em_progresso'])
-        ).order_by(Task.due_date).limit(5).all()
-        
-        # Leads recentes
-        recent_leads = Lead.query.order_by(Lead.created_at.desc()).limit(5).all()
-        
-        return render_template('dashboard.html',
-                             total_clients=total_clients,
-                             total_leads=total_leads,
-                             active_leads=active_leads,
-                             closed_leads=closed_leads,
-                             pending_tasks=pending_tasks,
-                             leads_by_status=leads_by_status,
-                             upcoming_tasks=upcoming_tasks,
-                             recent_leads=recent_leads)
+        # Métricas vêm do snapshot em cache (invalidado a cada escrita)
+        snapshot = dashboard_cache.get()
+        
+        return render_template('dashboard.html', **snapshot)
+
+    @app.route('/api/dashboard/cache')
+    @login_required
+    def dashboard_cache_stats():
+        """API com contadores do cache do dashboard"""
+        return jsonify({'success': True, 'cache': dashboard_cache.stats()})
+
+    @app.route('/api/mail/outbox')
+    @login_required
+    def mail_outbox_stats():
+        """API com a profundidade da fila de e-mails"""
+        return jsonify({'success': True, 'outbox': mail_outbox.stats()})
+
+    @app.route('/api/jobs')
+    @login_required
+    def job_queue_stats():
+        """API com a profundidade da fila de jobs"""
+        return jsonify({'success': True, 'jobs': job_queue.stats()})
 
     @app.route('/login', methods=['GET', 'POST'])
     def login():
@@ -71,32 +161,35 @@ def register_routes(app):
     # CLIENTES
     @app.route('/clients')
     @login_required
+    @query_budget.limit(4)
     def clients():
         """Lista de clientes com busca e filtros"""
         search_form = SearchForm()
         page = request.args.get('page', 1, type=int)
         per_page = 20
         
-        query = Client.query
-        
         # Aplicar filtros de busca
-        search_query = request.args.get('query', '').strip()
-        if search_query:
-            query = query.filter(or_(
-                Client.name.contains(search_query),
-                Client.email.contains(search_query),
-                Client.document.contains(search_query)
-            ))
-        
-        status_filter = request.args.get('status', '').strip()
-        if status_filter:
-            query = query.filter_by(status=status_filter)
-        
-        clients = query.order_by(Client.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        query = filter_clients(Client.query, request.args)
+        
+        if use_keyset_pagination(ranked=bool(search_term(request.args))):
+            clients = keyset_paginate(
+                query, Client.created_at, Client.id,
+                cursor=request.args.get('cursor'), per_page=per_page
+            )
+        else:
+            clients = query.order_by(Client.created_at.desc()).paginate(
+                page=page, per_page=per_page, error_out=False
+            )
+        
+        # Quantidade de leads por cliente da página (evita um COUNT por linha)
+        client_ids = [client.id for client in clients.items]
+        lead_counts = dict(
+            db.session.query(Lead.client_id, func.count(Lead.id))
+            .filter(Lead.client_id.in_(client_ids))
+            .group_by(Lead.client_id).all()
+        ) if client_ids else {}
         
-        return render_template('clients/list.html', clients=clients, search_form=search_form)
+        return render_template('clients/list.html', clients=clients, search_form=search_form, lead_counts=lead_counts)
 
     @app.route('/clients/new', methods=['GET', 'POST'])
     @login_required
@@ -128,6 +221,7 @@ def register_routes(app):
 
     @app.route('/clients/<int:id>')
     @login_required
+    @query_budget.limit(5)
     def view_client(id):
         """Visualizar detalhes do cliente"""
         client = Client.query.get_or_404(id)
@@ -160,39 +254,34 @@ def register_routes(app):
     # LEADS
     @app.route('/leads')
     @login_required
+    @query_budget.limit(6)
     def leads():
         """Lista de leads com pipeline visual"""
         search_form = SearchForm()
         page = request.args.get('page', 1, type=int)
         per_page = 20
         
-        query = Lead.query
+        query = Lead.query.options(
+            joinedload(Lead.client),
+            joinedload(Lead.assigned_user)
+        )
         
         # Aplicar filtros
-        search_query = request.args.get('query', '').strip()
-        if search_query:
-            query = query.join(Client).filter(or_(
-                Lead.title.contains(search_query),
-                Client.name.contains(search_query)
-            ))
-        
-        status_filter = request.args.get('status', '').strip()
-        if status_filter:
-            query = query.filter_by(status=status_filter)
-        
-        user_filter = request.args.get('user_id', type=int)
-        if user_filter:
-            query = query.filter_by(user_id=user_filter)
-        
-        leads = query.order_by(Lead.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        query = filter_leads(query, request.args)
         
-        # Dados para o pipeline
-        pipeline_data = {}
-        statuses = ['novo', 'qualificado', 'proposta', 'negociacao', 'fechado', 'perdido']
-        for status in statuses:
-            pipeline_data[status] = Lead.query.filter_by(status=status).all()
+        if use_keyset_pagination(ranked=bool(search_term(request.args))):
+            leads = keyset_paginate(
+                query, Lead.created_at, Lead.id,
+                cursor=request.args.get('cursor'), per_page=per_page
+            )
+        else:
+            leads = query.order_by(Lead.created_at.desc()).paginate(
+                page=page, per_page=per_page, error_out=False
+            )
+        
+        # Dados para o pipeline (totais por status + prévia de cada coluna)
+        pipeline = LeadManager.get_pipeline_board(limit=PIPELINE_PREVIEW_SIZE)
+        pipeline_data = pipeline['pipeline'] if pipeline['success'] else {}
         
         users = User.query.filter_by(active=True).all()
         
@@ -208,10 +297,6 @@ def register_routes(app):
         """Criar novo lead"""
         form = LeadForm()
         
-        # Carregar opções para selects
-        form.client_id.choices = [(0, 'Selecione...')] + [(c.id, c.name) for c in Client.query.all()]
-        form.user_id.choices = [(u.id, f"{u.first_name} {u.last_name}") for u in User.query.filter_by(active=True).all()]
-        
         if form.validate_on_submit():
             lead = Lead(
                 title=form.title.data,
@@ -221,7 +306,7 @@ def register_routes(app):
                 priority=form.priority.data,
                 source=form.source.data,
                 expected_close_date=form.expected_close_date.data,
-                client_id=form.client_id.data if form.client_id.data != 0 else None,
+                client_id=form.client_id.data or None,
                 user_id=form.user_id.data
             )
             
@@ -234,30 +319,32 @@ def register_routes(app):
 
     @app.route('/tasks')
     @login_required
+    @query_budget.limit(4)
     def tasks():
         """Lista de tarefas"""
         search_form = SearchForm()
         page = request.args.get('page', 1, type=int)
         per_page = 20
         
-        query = Task.query
+        query = Task.query.options(
+            joinedload(Task.assigned_user),
+            joinedload(Task.client),
+            joinedload(Task.lead)
+        )
         
         # Aplicar filtros
-        search_query = request.args.get('query', '').strip()
-        if search_query:
-            query = query.filter(Task.title.contains(search_query))
-        
-        status_filter = request.args.get('status', '').strip()
-        if status_filter:
-            query = query.filter_by(status=status_filter)
-        
-        user_filter = request.args.get('user_id', type=int)
-        if user_filter:
-            query = query.filter_by(user_id=user_filter)
+        query = filter_tasks(query, request.args)
         
-        tasks = query.order_by(Task.due_date.asc().nullslast(), Task.created_at.desc()).paginate(
-            page=page, per_page=per_page, error_out=False
-        )
+        if use_keyset_pagination():
+            tasks = keyset_paginate(
+                query, Task.due_date, Task.id,
+                cursor=request.args.get('cursor'), per_page=per_page,
+                descending=False, nulls_last=True
+            )
+        else:
+            tasks = query.order_by(Task.due_date.asc().nullslast(), Task.created_at.desc()).paginate(
+                page=page, per_page=per_page, error_out=False
+            )
         
         users = User.query.filter_by(active=True).all()
         
@@ -266,6 +353,7 @@ def register_routes(app):
     # API AVANÇADAS PARA LEADS
     @app.route('/api/leads/analytics')
     @login_required
+    @query_budget.limit(8)
     def leads_analytics():
         """API para análises de leads"""
         period_days = request.args.get('period', 30, type=int)
@@ -275,8 +363,18 @@ def register_routes(app):
         if current_user.role == 'vendedor':
             user_id = current_user.id
         
+        # Versão barata dos dados primeiro: se o navegador já tem esta versão, nada é agregado
+        etag, last_modified = data_validators(
+            LeadManager.get_lead_analytics_version(user_id, period_days), 'analytics', user_id, period_days
+        )
+        cached = not_modified(etag, last_modified)
+        if cached is not None:
+            return cached
+        
         result = LeadManager.get_lead_analytics(user_id, period_days)
-        return jsonify(result)
+        if not result['success']:
+            return jsonify(result)
+        return with_validators(jsonify(result), etag, last_modified)
 
     @app.route('/api/leads/priority')
     @login_required
@@ -288,18 +386,112 @@ def register_routes(app):
 
     @app.route('/api/leads/forecast')
     @login_required
+    @query_budget.limit(4)
     def revenue_forecast():
         """API para previsão de receita"""
         months = request.args.get('months', 3, type=int)
-        result = LeadManager.forecast_revenue(months)
+        if wants_ndjson():
+            return ndjson_response(LeadManager.iter_forecast_leads(months))
+        
+        limit = min(request.args.get('limit', FORECAST_PAGE_SIZE, type=int), 500)
+        result = LeadManager.forecast_revenue(months, cursor=request.args.get('cursor'), limit=limit)
         return jsonify(result)
 
+    @app.route('/api/leads/pipeline')
+    @login_required
+    @query_budget.limit(3)
+    def leads_pipeline():
+        """API para o quadro do pipeline"""
+        limit = min(request.args.get('limit', PIPELINE_PREVIEW_SIZE, type=int), 100)
+        user_id = request.args.get('user_id', type=int)
+        result = LeadManager.get_pipeline_board(limit=limit, user_id=user_id)
+        return jsonify(result)
+
+    @app.route('/api/leads/pipeline/<status>')
+    @login_required
+    @query_budget.limit(2)
+    def leads_pipeline_column(status):
+        """API para carregar mais leads de uma coluna do pipeline"""
+        limit = min(request.args.get('limit', PIPELINE_PREVIEW_SIZE, type=int), 100)
+        user_id = request.args.get('user_id', type=int)
+        cursor = request.args.get('cursor')
+        result = LeadManager.get_pipeline_column(status, cursor=cursor, limit=limit, user_id=user_id)
+        return jsonify(result), (200 if result['success'] else 400)
+
     @app.route('/api/leads/overdue')
     @login_required
+    @query_budget.limit(3)
     def overdue_leads():
         """API para leads em atraso"""
+        # Dias de atraso mudam com a data: o dia atual faz parte da versão
+        today = datetime.now().date()
+        ndjson = wants_ndjson()
+        etag, last_modified = data_validators(
+            LeadManager.get_overdue_version(today), 'overdue', today, 'ndjson' if ndjson else 'json',
+            not_before=datetime.combine(today, datetime.min.time()).astimezone(timezone.utc)
+        )
+        cached = not_modified(etag, last_modified)
+        if cached is not None:
+            return cached
+        
+        if ndjson:
+            return with_validators(ndjson_response(LeadManager.iter_overdue_leads()), etag, last_modified)
+        
         result = LeadManager.get_overdue_leads()
-        return jsonify(result)
+        if not result['success']:
+            return jsonify(result)
+        return with_validators(jsonify(result), etag, last_modified)
+
+    # BUSCA RÁPIDA (TYPEAHEAD) PARA FORMULÁRIOS
+    @app.route('/api/lookup/clients')
+    @login_required
+    @query_budget.limit(2)
+    def lookup_clients():
+        """API de busca de clientes por prefixo do nome"""
+        prefix = request.args.get('q', '').strip().lower()
+        limit = min(request.args.get('limit', LOOKUP_LIMIT, type=int), 50)
+        
+        sort_key = func.lower(Client.name)
+        query = db.session.query(Client.id, Client.name, sort_key.label('sort_key'))
+        if prefix:
+            query = query.filter(sort_key >= prefix, sort_key < prefix + '\uffff')
+        
+        result = lookup_page(query, sort_key, Client.id, request.args.get('cursor'), limit)
+        if result is None:
+            return jsonify({'success': False, 'error': 'Cursor inválido'}), 400
+        rows, next_cursor = result
+        
+        return jsonify({
+            'success': True,
+            'results': [{'id': row.id, 'text': row.name} for row in rows],
+            'next_cursor': next_cursor
+        })
+
+    @app.route('/api/lookup/users')
+    @login_required
+    @query_budget.limit(2)
+    def lookup_users():
+        """API de busca de usuários ativos por prefixo do nome"""
+        prefix = request.args.get('q', '').strip().lower()
+        limit = min(request.args.get('limit', LOOKUP_LIMIT, type=int), 50)
+        
+        sort_key = func.lower(User.first_name)
+        query = db.session.query(
+            User.id, User.first_name, User.last_name, sort_key.label('sort_key')
+        ).filter(User.active == True)
+        if prefix:
+            query = query.filter(sort_key >= prefix, sort_key < prefix + '\uffff')
+        
+        result = lookup_page(query, sort_key, User.id, request.args.get('cursor'), limit)
+        if result is None:
+            return jsonify({'success': False, 'error': 'Cursor inválido'}), 400
+        rows, next_cursor = result
+        
+        return jsonify({
+            'success': True,
+            'results': [{'id': row.id, 'text': f"{row.first_name} {row.last_name}"} for row in rows],
+            'next_cursor': next_cursor
+        })
 
     @app.route('/leads/<int:id>/update-status', methods=['POST'])
     @login_required
@@ -318,16 +510,52 @@ def register_routes(app):
         
         return jsonify(result)
 
+    @app.route('/api/leads/bulk-status', methods=['POST'])
+    @login_required
+    @query_budget.limit(8)
+    def bulk_update_lead_status():
+        """API para mudança de status de vários leads de uma vez"""
+        data = request.get_json(silent=True) or {}
+        lead_ids = data.get('lead_ids') or []
+        
+        # Vendedores só podem alterar os próprios leads
+        owner_id = current_user.id if current_user.role == 'vendedor' else None
+        
+        result = LeadManager.bulk_update_lead_status(
+            lead_ids, data.get('status'), current_user.id, data.get('notes'), owner_id=owner_id
+        )
+        return jsonify(result), (200 if result['success'] else 400)
+
+    @app.route('/api/workflow/task-templates', methods=['GET', 'POST'])
+    @login_required
+    def workflow_task_templates():
+        """API dos modelos de tarefas automáticas (POST recarrega no processo atual)"""
+        if request.method == 'POST':
+            if current_user.role != 'admin':
+                return jsonify({'success': False, 'error': 'Acesso restrito a administradores'}), 403
+            task_templates.reload()
+        
+        return jsonify({
+            'success': True,
+            'source': task_templates.source,
+            'templates': {
+                status: [
+                    {
+                        'title': template.title,
+                        'description': template.description,
+                        'days': template.delta.days,
+                        'priority': template.priority
+                    } for template in templates
+                ] for status, templates in task_templates.all().items()
+            }
+        })
+
     @app.route('/leads/new-advanced', methods=['GET', 'POST'])
     @login_required
     def new_lead_advanced():
         """Criar lead com validações avançadas"""
         form = LeadForm()
         
-        # Carregar opções para selects
-        form.client_id.choices = [(0, 'Selecione...')] + [(c.id, c.name) for c in Client.query.all()]
-        form.user_id.choices = [(u.id, f"{u.first_name} {u.last_name}") for u in User.query.filter_by(active=True).all()]
-        
         if form.validate_on_submit():
             lead_data = {
                 'title': form.title.data,
@@ -336,7 +564,7 @@ def register_routes(app):
                 'priority': form.priority.data,
                 'source': form.source.data,
                 'expected_close_date': form.expected_close_date.data,
-                'client_id': form.client_id.data if form.client_id.data != 0 else None
+                'client_id': form.client_id.data or None
             }
             
             result = LeadManager.create_lead_with_validation(lead_data, form.user_id.data)
@@ -345,7 +573,10 @@ def register_routes(app):
                 flash(result['message'], 'success')
                 return redirect(url_for('leads'))
             else:
-                flash(result['error'], 'error')
+                error = result['error']
+                if result.get('duplicates'):
+                    error += ': ' + ', '.join(f"#{lead['id']} {lead['title']}" for lead in result['duplicates'])
+                flash(error, 'error')
         
         return render_template('leads/form_advanced.html', form=form, title='Novo Lead Profissional')
 
@@ -361,6 +592,97 @@ def register_routes(app):
         """Página de previsão de receita"""
         return render_template('leads/forecast.html')
 
+    # IMPORTAÇÃO EM MASSA
+    @app.route('/import/<kind>', methods=['POST'])
+    @login_required
+    def import_csv(kind):
+        """Importa clientes ou leads de um CSV enviado (campo 'file')"""
+        if current_user.role not in ('admin', 'gerente'):
+            return jsonify({'success': False, 'error': 'Acesso restrito a administradores e gerentes'}), 403
+        if kind not in IMPORTERS:
+            return jsonify({'success': False, 'error': 'Tipo de importação inválido'}), 404
+        
+        upload = request.files.get('file')
+        if upload is None:
+            return jsonify({'success': False, 'error': 'Arquivo não enviado'}), 400
+        
+        options = {}
+        if kind == 'leads':
+            options['default_user_id'] = current_user.id
+        
+        rejects_dir = os.path.join(current_app.instance_path, 'imports')
+        os.makedirs(rejects_dir, exist_ok=True)
+        # uuid no nome: importações no mesmo segundo não sobrescrevem os rejeitados umas das outras
+        rejects_name = f"rejeitados-{kind}-{datetime.now().strftime('%Y%m%d%H%M%S')}-{uuid.uuid4().hex}.csv"
+        
+        stream = io.TextIOWrapper(upload.stream, encoding='utf-8-sig', newline='')
+        with open(os.path.join(rejects_dir, rejects_name), 'w', newline='', encoding='utf-8') as rejects:
+            report = IMPORTERS[kind](rejects=rejects, **options).run(
+                stream, delimiter=request.form.get('delimiter', ',')
+            )
+        
+        if report['rejected']:
+            report['rejects_file'] = url_for('import_rejects', name=rejects_name)
+        else:
+            os.remove(os.path.join(rejects_dir, rejects_name))
+        return jsonify(report)
+
+    @app.route('/import/rejects/<name>')
+    @login_required
+    def import_rejects(name):
+        """Download do arquivo de linhas rejeitadas de uma importação"""
+        if current_user.role not in ('admin', 'gerente'):
+            return jsonify({'success': False, 'error': 'Acesso restrito a administradores e gerentes'}), 403
+        return send_from_directory(os.path.join(current_app.instance_path, 'imports'), name, as_attachment=True)
+
+    # EXPORTAÇÃO
+    @app.route('/export/<kind>')
+    @login_required
+    @query_budget.limit(1)
+    def export_data(kind):
+        """Exporta clientes, leads, tarefas ou interações (?format=csv|xlsx) com os filtros da listagem"""
+        if current_user.role not in ('admin', 'gerente'):
+            return jsonify({'success': False, 'error': 'Acesso restrito a administradores e gerentes'}), 403
+        if kind not in EXPORTS:
+            return jsonify({'success': False, 'error': 'Tipo de exportação inválido'}), 404
+        
+        export_format = request.args.get('format', 'csv')
+        if export_format not in EXPORT_FORMATS:
+            return jsonify({'success': False, 'error': 'Formato inválido (csv ou xlsx)'}), 400
+        
+        chunks = export_stream(kind, request.args, export_format, delimiter=request.args.get('delimiter', ','))
+        filename = f"{kind}-{datetime.now().strftime('%Y%m%d%H%M%S')}.{export_format}"
+        return Response(
+            stream_with_context(chunks),
+            mimetype=EXPORT_FORMATS[export_format],
+            headers={'Content-Disposition': f'attachment; filename={filename}'}
+        )
+
+    # DIAGNÓSTICO
+    @app.route('/metrics')
+    def prometheus_metrics():
+        """Métricas no formato do Prometheus (somadas entre os workers)"""
+        if not metrics.authorized():
+            message = 'Não autorizado\n' if metrics.token else 'Defina METRICS_TOKEN para coletar fora do modo debug\n'
+            return Response(message, status=401, mimetype='text/plain')
+        
+        content, content_type = metrics.render()
+        return Response(content, content_type=content_type)
+
+    @app.route('/debug/perf')
+    @login_required
+    def debug_perf():
+        """Requisições mais lentas de cada rota (perfil com PROFILER_ENABLED)"""
+        if current_user.role != 'admin':
+            return render_template('errors/404.html'), 404
+        
+        return render_template(
+            'debug/perf.html',
+            enabled=request_profiler.enabled,
+            history_size=request_profiler.history_size,
+            report=request_profiler.report()
+        )
+
     # ERROR HANDLERS
     @app.errorhandler(404)
     def not_found_error(error):
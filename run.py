@@ -6,69 +6,22 @@ Script para executar o CRM Profissional
 import sys
 import os
 
-def create_default_users_if_needed():
-    """Cria usuários padrão se necessário"""
-    try:
-        from app import app
-        from database import db
-        from models import User, Team
-        
-        with app.app_context():
-            # Verificar se admin existe
-            admin_user = User.query.filter_by(username='admin').first()
-            if admin_user:
-                return True
-            
-            print("🔄 Criando usuário admin automaticamente...")
-            
-            # Criar equipe padrão se não existir
-            default_team = Team.query.filter_by(name='Equipe Geral').first()
-            if not default_team:
-                default_team = Team(
-                    name='Equipe Geral',
-                    description='Equipe padrão do sistema'
-                )
-                db.session.add(default_team)
-                db.session.flush()
-            
-            # Criar usuário administrador
-            admin_user = User(
-                username='admin',
-                email='admin@crm.com',
-                first_name='Administrador',
-                last_name='Sistema',
-                role='admin',
-                active=True,
-                team_id=default_team.id
-            )
-            admin_user.set_password('admin123')
-            db.session.add(admin_user)
-            db.session.commit()
-            
-            print("✅ Usuário admin criado: admin / admin123")
-            return True
-            
-    except Exception as e:
-        print(f"❌ Erro ao criar usuário admin: {e}")
-        return False
-
 def main():
     print("🚀 Iniciando CRM Profissional...")
     
     try:
         # Importar a aplicação
-        from app import app
-        from database import db
+        from app import app, init_database
         
-        # Inicializar banco e criar usuários se necessário
+        # Inicializar banco (migrações) e criar usuários se necessário
         with app.app_context():
             print("🔄 Verificando banco de dados...")
-            db.create_all()
-            create_default_users_if_needed()
+            init_database()
         
         print("✅ CRM Profissional iniciado!")
         print("📱 Acesse: http://localhost:5000")
         print("👤 Login: admin / admin123")
+        print("ℹ️ Servidor de desenvolvimento; em produção use wsgi.py (gunicorn/waitress)")
         print("\n🛑 Para parar: Ctrl+C")
         print("-" * 50)
         
@@ -76,7 +29,7 @@ def main():
         
     except ImportError as e:
         print(f"❌ Erro de importação: {e}")
-        print("Instale as dependências: pip install Flask Flask-SQLAlchemy Flask-Login Flask-WTF Flask-Mail WTForms python-dotenv email-validator")
+        print("Instale as dependências: pip install Flask Flask-SQLAlchemy Flask-Login Flask-WTF Flask-Mail WTForms python-dotenv email-validator prometheus-client")
     except Exception as e:
         print(f"❌ Erro ao executar: {e}")
 
@@ -0,0 +1,227 @@
+"""
+Busca textual de clientes e leads
+Sistema CRM Profissional
+
+SQLite: tabelas FTS5 (tokenizer unicode61 sem acentos) mantidas por triggers.
+PostgreSQL: índices GIN de trigramas sobre expressões sem acento (pg_trgm +
+unaccent), atualizados automaticamente pelo próprio banco.
+
+Em ambos os casos "Joao" encontra "João" e os resultados vêm ordenados por
+relevância.
+"""
+
+import re
+from sqlalchemy import event, func, literal_column, select, text, or_, union
+from database import db
+from models import Client, Lead
+
+# Remove pontuação do documento (CPF/CNPJ) para busca só por dígitos
+_SQLITE_DIGITS = "replace(replace(replace(replace(coalesce({col}, ''), '.', ''), '-', ''), '/', ''), ' ', '')"
+
+SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS clients_fts USING fts5(
+        name, email, document, document_digits,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS leads_fts USING fts5(
+        title, client_name,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )""",
+    f"""CREATE TRIGGER IF NOT EXISTS clients_fts_insert AFTER INSERT ON clients BEGIN
+        INSERT INTO clients_fts(rowid, name, email, document, document_digits)
+        VALUES (new.id, new.name, new.email, new.document, {_SQLITE_DIGITS.format(col='new.document')});
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS clients_fts_update AFTER UPDATE OF name, email, document ON clients BEGIN
+        DELETE FROM clients_fts WHERE rowid = old.id;
+        INSERT INTO clients_fts(rowid, name, email, document, document_digits)
+        VALUES (new.id, new.name, new.email, new.document, {_SQLITE_DIGITS.format(col='new.document')});
+        UPDATE leads_fts SET client_name = new.name
+        WHERE rowid IN (SELECT id FROM leads WHERE client_id = new.id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS clients_fts_delete AFTER DELETE ON clients BEGIN
+        DELETE FROM clients_fts WHERE rowid = old.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS leads_fts_insert AFTER INSERT ON leads BEGIN
+        INSERT INTO leads_fts(rowid, title, client_name)
+        VALUES (new.id, new.title, (SELECT name FROM clients WHERE id = new.client_id));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS leads_fts_update AFTER UPDATE OF title, client_id ON leads BEGIN
+        DELETE FROM leads_fts WHERE rowid = old.id;
+        INSERT INTO leads_fts(rowid, title, client_name)
+        VALUES (new.id, new.title, (SELECT name FROM clients WHERE id = new.client_id));
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS leads_fts_delete AFTER DELETE ON leads BEGIN
+        DELETE FROM leads_fts WHERE rowid = old.id;
+    END""",
+]
+
+SQLITE_REBUILD = [
+    "DELETE FROM clients_fts",
+    f"""INSERT INTO clients_fts(rowid, name, email, document, document_digits)
+        SELECT id, name, email, document, {_SQLITE_DIGITS.format(col='document')} FROM clients""",
+    "DELETE FROM leads_fts",
+    """INSERT INTO leads_fts(rowid, title, client_name)
+        SELECT leads.id, leads.title, clients.name
+        FROM leads LEFT JOIN clients ON clients.id = leads.client_id""",
+]
+
+SQLITE_DROP = [
+    "DROP TRIGGER IF EXISTS clients_fts_insert",
+    "DROP TRIGGER IF EXISTS clients_fts_update",
+    "DROP TRIGGER IF EXISTS clients_fts_delete",
+    "DROP TRIGGER IF EXISTS leads_fts_insert",
+    "DROP TRIGGER IF EXISTS leads_fts_update",
+    "DROP TRIGGER IF EXISTS leads_fts_delete",
+    "DROP TABLE IF EXISTS clients_fts",
+    "DROP TABLE IF EXISTS leads_fts",
+]
+
+# Expressões indexadas no PostgreSQL (devem ser idênticas às usadas na busca)
+_PG_CLIENT_DOCUMENT = (
+    "f_unaccent(lower(coalesce(name, '') || ' ' || coalesce(email, '') || ' ' || "
+    "coalesce(document, '') || ' ' || regexp_replace(coalesce(document, ''), '\\D', '', 'g')))"
+)
+
+POSTGRESQL_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    # unaccent() não é IMMUTABLE; o wrapper permite usá-lo em índices
+    """CREATE OR REPLACE FUNCTION f_unaccent(text) RETURNS text
+        AS $$ SELECT public.unaccent('public.unaccent', $1) $$
+        LANGUAGE sql IMMUTABLE PARALLEL SAFE STRICT""",
+    f"CREATE INDEX IF NOT EXISTS ix_clients_search_trgm ON clients USING gin ({_PG_CLIENT_DOCUMENT} gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_clients_name_trgm ON clients USING gin (f_unaccent(lower(name)) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_leads_title_trgm ON leads USING gin (f_unaccent(lower(title)) gin_trgm_ops)",
+]
+
+POSTGRESQL_DROP = [
+    "DROP INDEX IF EXISTS ix_leads_title_trgm",
+    "DROP INDEX IF EXISTS ix_clients_name_trgm",
+    "DROP INDEX IF EXISTS ix_clients_search_trgm",
+    "DROP FUNCTION IF EXISTS f_unaccent(text)",
+]
+
+
+def create_search_index(connection, rebuild=True):
+    """Cria as estruturas de busca no banco da conexão informada"""
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        for statement in SQLITE_DDL:
+            connection.exec_driver_sql(statement)
+        if rebuild:
+            rebuild_search_index(connection)
+    elif dialect == 'postgresql':
+        for statement in POSTGRESQL_DDL:
+            connection.exec_driver_sql(statement)
+
+
+def rebuild_search_index(connection):
+    """Repopula o índice FTS a partir das tabelas (apenas SQLite)"""
+    if connection.dialect.name == 'sqlite':
+        for statement in SQLITE_REBUILD:
+            connection.exec_driver_sql(statement)
+
+
+def drop_search_index(connection):
+    """Remove as estruturas de busca"""
+    dialect = connection.dialect.name
+    if dialect == 'sqlite':
+        for statement in SQLITE_DROP:
+            connection.exec_driver_sql(statement)
+    elif dialect == 'postgresql':
+        for statement in POSTGRESQL_DROP:
+            connection.exec_driver_sql(statement)
+
+
+def exclude_search_tables(name, type_, parent_names):
+    """Filtro do autogenerate do Alembic: ignora as tabelas FTS (e suas tabelas internas)"""
+    if type_ == 'table' and name and name.startswith(('clients_fts', 'leads_fts')):
+        return False
+    return True
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_search_index_after_create_all(target, connection, **kw):
+    """Garante o índice de busca em bancos criados com db.create_all()"""
+    if connection.dialect.name == 'sqlite':
+        exists = connection.exec_driver_sql(
+            "SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'clients_fts'"
+        ).first()
+        create_search_index(connection, rebuild=not exists)
+    else:
+        create_search_index(connection)
+
+
+def _fts_match_expression(search_query):
+    """Converte o texto digitado em uma consulta FTS5 por prefixo"""
+    tokens = re.findall(r'\w+', search_query, flags=re.UNICODE)
+    return ' '.join(f'"{token}"*' for token in tokens)
+
+
+def _pg_unaccent(value):
+    return func.f_unaccent(func.lower(value))
+
+
+def search_clients(query, search_query):
+    """Aplica a busca textual a uma query de clientes, ordenando por relevância"""
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect == 'sqlite':
+        match = _fts_match_expression(search_query)
+        if not match:
+            return query
+        ranked = select(
+            literal_column('rowid').label('id'),
+            literal_column('rank').label('rank')
+        ).select_from(text('clients_fts')).where(
+            text('clients_fts MATCH :client_match').bindparams(client_match=match)
+        ).subquery()
+        return query.join(ranked, ranked.c.id == Client.id).order_by(ranked.c.rank)
+
+    if dialect == 'postgresql':
+        # Mesma expressão do índice ix_clients_search_trgm
+        document = literal_column(_PG_CLIENT_DOCUMENT)
+        term = _pg_unaccent(search_query)
+        return query.filter(
+            document.ilike(func.concat('%', term, '%'))
+        ).order_by(func.word_similarity(term, document).desc())
+
+    return query.filter(or_(
+        Client.name.contains(search_query),
+        Client.email.contains(search_query),
+        Client.document.contains(search_query)
+    ))
+
+
+def search_leads(query, search_query):
+    """Aplica a busca textual (título do lead e nome do cliente) a uma query de leads"""
+    dialect = db.session.get_bind().dialect.name
+
+    if dialect == 'sqlite':
+        match = _fts_match_expression(search_query)
+        if not match:
+            return query
+        ranked = select(
+            literal_column('rowid').label('id'),
+            literal_column('rank').label('rank')
+        ).select_from(text('leads_fts')).where(
+            text('leads_fts MATCH :lead_match').bindparams(lead_match=match)
+        ).subquery()
+        return query.join(ranked, ranked.c.id == Lead.id).order_by(ranked.c.rank)
+
+    if dialect == 'postgresql':
+        term = _pg_unaccent(search_query)
+        pattern = func.concat('%', term, '%')
+        title = _pg_unaccent(Lead.title)
+        # Um SELECT por índice de trigramas: com OR + IN (subconsulta) o
+        # planejador não combina os índices (BitmapOr) e lê a tabela leads inteira
+        matching = union(
+            select(Lead.id).where(title.ilike(pattern)),
+            select(Lead.id).join(Client, Lead.client_id == Client.id).where(_pg_unaccent(Client.name).ilike(pattern))
+        ).subquery()
+        return query.join(matching, matching.c.id == Lead.id).order_by(func.word_similarity(term, title).desc())
+
+    return query.outerjoin(Client, Lead.client_id == Client.id).filter(or_(
+        Lead.title.contains(search_query),
+        Client.name.contains(search_query)
+    ))
@@ -42,7 +42,8 @@ def install_dependencies():
         ("wtforms", "WTForms"),
         ("werkzeug", "Werkzeug"),
         ("dotenv", "python-dotenv"),
-        ("email_validator", "email-validator")
+        ("email_validator", "email-validator"),
+        ("prometheus_client", "prometheus-client")
     ]
     
     all_success = True
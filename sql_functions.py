@@ -0,0 +1,35 @@
+"""
+Expressões SQL portáveis (SQLite / PostgreSQL)
+Sistema CRM Profissional
+"""
+
+from sqlalchemy import func, cast, Date
+from database import db
+
+
+def month_bucket(column):
+    """Expressão SQL portável para o mês ('AAAA-MM') de uma coluna Date/DateTime"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        return func.strftime('%Y-%m', column)
+    return func.to_char(column, 'YYYY-MM')
+
+
+def day_bucket(column):
+    """Expressão SQL portável para o dia de uma coluna DateTime (comparável a uma coluna Date)"""
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        # Mesmo formato ('AAAA-MM-DD') em que o SQLite guarda colunas Date
+        return func.date(column)
+    return cast(column, Date)
+
+
+def days_between(start, end):
+    """
+    Expressão SQL portável para a diferença em dias entre duas colunas
+    DateTime (SQLite usa julianday, PostgreSQL usa extract(epoch))
+    """
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'sqlite':
+        return func.julianday(end) - func.julianday(start)
+    return func.extract('epoch', end - start) / 86400.0
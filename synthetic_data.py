@@ -0,0 +1,388 @@
+"""
+Gerador de dados sintéticos para benchmarks e testes de carga
+Sistema CRM Profissional
+
+Monta volumes realistas de um CRM brasileiro (nomes, cidades/UF, CEP,
+CPF/CNPJ com dígitos verificadores válidos, funil de leads) direto com
+INSERTs em lote (executemany), sem passar pelo ORM. Os ids são atribuídos
+pelo gerador (a partir do maior id existente), o que permite relacionar
+interações e tarefas aos leads sem reler o banco.
+
+Durante a carga o índice de busca textual é removido e reconstruído no
+final (mais rápido do que os gatilhos linha a linha), e os totais diários
+de leads são recalculados.
+
+Volumes padrão (escala 1): 100 mil clientes, 1 milhão de leads, 5 milhões
+de interações e 2 milhões de tarefas.
+"""
+
+import random
+import time
+from array import array
+from itertools import accumulate
+from datetime import datetime, timedelta
+from sqlalchemy import func, insert, text
+from werkzeug.security import generate_password_hash
+from database import db
+from fingerprints import strip_accents, title_fingerprint
+from models import Client, Lead, Task, Interaction, Team, User
+
+# Volumes na escala 1
+DEFAULT_VOLUMES = {
+    'clients': 100_000,
+    'leads': 1_000_000,
+    'interactions': 5_000_000,
+    'tasks': 2_000_000
+}
+
+# Linhas por INSERT em lote e lotes por commit
+GENERATOR_BATCH_SIZE = 5000
+GENERATOR_COMMIT_EVERY = 20
+
+# Senha de todos os usuários gerados (vendedor001, vendedor002, ...)
+SYNTHETIC_PASSWORD = 'senha123'
+
+FIRST_NAMES = [
+    'Ana', 'Maria', 'Juliana', 'Fernanda', 'Patrícia', 'Aline', 'Camila', 'Beatriz', 'Larissa', 'Gabriela',
+    'João', 'José', 'Carlos', 'Paulo', 'Lucas', 'Pedro', 'Rafael', 'Marcos', 'Gustavo', 'Felipe',
+    'Antônio', 'Francisco', 'Luiz', 'Bruno', 'Rodrigo', 'Thiago', 'Letícia', 'Renata', 'Vanessa', 'Débora'
+]
+LAST_NAMES = [
+    'Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira', 'Lima', 'Gomes',
+    'Costa', 'Ribeiro', 'Martins', 'Carvalho', 'Almeida', 'Lopes', 'Soares', 'Fernandes', 'Vieira', 'Barbosa',
+    'Rocha', 'Dias', 'Nascimento', 'Andrade', 'Moreira', 'Nunes', 'Marques', 'Machado', 'Mendes', 'Freitas'
+]
+COMPANY_WORDS = [
+    'Comércio', 'Distribuidora', 'Indústria', 'Tecnologia', 'Serviços', 'Logística', 'Alimentos',
+    'Construtora', 'Consultoria', 'Transportes', 'Agropecuária', 'Farmácia', 'Materiais', 'Engenharia'
+]
+COMPANY_SUFFIXES = ['Ltda', 'ME', 'EIRELI', 'S.A.', 'EPP']
+# (cidade, UF, prefixo do CEP)
+CITIES = [
+    ('São Paulo', 'SP', '01'), ('Campinas', 'SP', '13'), ('Santos', 'SP', '11'), ('Rio de Janeiro', 'RJ', '20'),
+    ('Niterói', 'RJ', '24'), ('Belo Horizonte', 'MG', '30'), ('Uberlândia', 'MG', '38'), ('Curitiba', 'PR', '80'),
+    ('Londrina', 'PR', '86'), ('Porto Alegre', 'RS', '90'), ('Florianópolis', 'SC', '88'), ('Salvador', 'BA', '40'),
+    ('Recife', 'PE', '50'), ('Fortaleza', 'CE', '60'), ('Brasília', 'DF', '70'), ('Goiânia', 'GO', '74'),
+    ('Manaus', 'AM', '69'), ('Belém', 'PA', '66'), ('Vitória', 'ES', '29'), ('Natal', 'RN', '59')
+]
+STREETS = ['Rua das Flores', 'Av. Brasil', 'Rua XV de Novembro', 'Av. Paulista', 'Rua Sete de Setembro',
+           'Av. Getúlio Vargas', 'Rua Tiradentes', 'Av. Rio Branco', 'Rua Dom Pedro II', 'Rua da Consolação']
+EMAIL_DOMAINS = ['gmail.com', 'hotmail.com', 'outlook.com', 'yahoo.com.br', 'uol.com.br', 'bol.com.br']
+
+PRODUCTS = ['Software de Gestão', 'ERP', 'Licenças Office', 'Consultoria Fiscal', 'Treinamento', 'Suporte Anual',
+            'Implantação CRM', 'Servidores', 'Notebooks', 'Link Dedicado', 'Site Institucional', 'App Mobile',
+            'Plano de Saúde Empresarial', 'Seguro Frota', 'Máquinas de Cartão', 'Sistema PDV']
+LEAD_KINDS = ['Proposta', 'Orçamento', 'Renovação', 'Expansão', 'Projeto', 'Contrato']
+SOURCES = ['website', 'telefone', 'email', 'indicacao', 'evento', 'linkedin']
+
+# Distribuição do funil (status, peso)
+LEAD_STATUSES = [('novo', 25), ('qualificado', 20), ('proposta', 15), ('negociacao', 10),
+                 ('fechado', 15), ('perdido', 15)]
+PRIORITIES = [('baixa', 30), ('media', 50), ('alta', 20)]
+INTERACTION_TYPES = ['email', 'telefone', 'reuniao', 'visita']
+INTERACTION_SUBJECTS = {
+    'email': ['Envio de proposta', 'Dúvidas sobre o orçamento', 'Retorno do cliente', 'Envio de contrato'],
+    'telefone': ['Ligação de follow-up', 'Apresentação inicial', 'Negociação de valores', 'Confirmação de reunião'],
+    'reuniao': ['Reunião de alinhamento', 'Demonstração do produto', 'Reunião de fechamento'],
+    'visita': ['Visita técnica', 'Visita comercial', 'Visita de implantação']
+}
+TASK_TITLES = ['Ligar para o cliente', 'Enviar proposta', 'Agendar reunião', 'Follow-up', 'Preparar contrato',
+               'Revisar orçamento', 'Enviar material', 'Confirmar pagamento']
+TASK_STATUSES = [('pendente', 35), ('em_progresso', 15), ('concluida', 45), ('cancelada', 5)]
+
+
+def _check_digit(digits, weights):
+    remainder = sum(digit * weight for digit, weight in zip(digits, weights)) % 11
+    return 0 if remainder < 2 else 11 - remainder
+
+
+def make_cpf(rng):
+    """CPF formatado com dígitos verificadores válidos"""
+    digits = [rng.randint(0, 9) for _ in range(9)]
+    digits.append(_check_digit(digits, range(10, 1, -1)))
+    digits.append(_check_digit(digits, range(11, 1, -1)))
+    text_digits = ''.join(map(str, digits))
+    return f'{text_digits[:3]}.{text_digits[3:6]}.{text_digits[6:9]}-{text_digits[9:]}'
+
+
+def make_cnpj(rng):
+    """CNPJ formatado (matriz 0001) com dígitos verificadores válidos"""
+    digits = [rng.randint(0, 9) for _ in range(8)] + [0, 0, 0, 1]
+    digits.append(_check_digit(digits, [5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]))
+    digits.append(_check_digit(digits, [6, 5, 4, 3, 2, 9, 8, 7, 6, 5, 4, 3, 2]))
+    text_digits = ''.join(map(str, digits))
+    return f'{text_digits[:2]}.{text_digits[2:5]}.{text_digits[5:8]}/{text_digits[8:12]}-{text_digits[12:]}'
+
+
+def _weighted(choices):
+    """Valores e pesos acumulados (rng.choices com cum_weights evita refazer a soma a cada linha)"""
+    values = [value for value, _ in choices]
+    return values, list(accumulate(weight for _, weight in choices))
+
+
+def _ascii_slug(value):
+    return strip_accents(value).lower().replace(' ', '.').replace("'", '')
+
+
+class SyntheticDataGenerator:
+    """Gera usuários, clientes, leads, interações e tarefas em lote"""
+
+    def __init__(self, users=50, seed=42, days=730, batch_size=GENERATOR_BATCH_SIZE,
+                 commit_every=GENERATOR_COMMIT_EVERY, progress=None):
+        self.users = users
+        self.days = days
+        self.batch_size = batch_size
+        self.commit_every = commit_every
+        self.progress = progress or (lambda message: None)
+        self.rng = random.Random(seed)
+        self.now = datetime.utcnow().replace(microsecond=0)
+        self.user_ids = []
+        self.client_ids = array('l')
+        # Por lead gerado: id, cliente, responsável e data de criação (segundos desde o início da janela)
+        self.lead_ids = array('l')
+        self.lead_clients = array('l')
+        self.lead_users = array('l')
+        self.lead_created = array('l')
+        self.report = {}
+
+    # Infraestrutura da carga
+    def _next_id(self, model):
+        return (db.session.query(func.max(model.id)).scalar() or 0) + 1
+
+    def _load(self, name, model, rows):
+        """Insere as linhas (gerador de dicts) em lotes e registra volume e tempo"""
+        started = time.perf_counter()
+        table = model.__table__
+        batch, batches, total = [], 0, 0
+        for row in rows:
+            batch.append(row)
+            if len(batch) >= self.batch_size:
+                db.session.execute(insert(table), batch)
+                total += len(batch)
+                batch = []
+                batches += 1
+                if batches % self.commit_every == 0:
+                    db.session.commit()
+                    self.progress(f'{name}: {total:,} linhas')
+        if batch:
+            db.session.execute(insert(table), batch)
+            total += len(batch)
+        db.session.commit()
+
+        elapsed = time.perf_counter() - started
+        self.report[name] = {
+            'rows': total,
+            'seconds': round(elapsed, 2),
+            'rows_per_second': round(total / elapsed) if elapsed else total
+        }
+        self.progress(f'{name}: {total:,} linhas em {elapsed:.1f}s')
+        self._fix_sequence(table)
+
+    @staticmethod
+    def _fix_sequence(table):
+        """Ids explícitos não avançam a sequence do PostgreSQL"""
+        if db.session.get_bind().dialect.name == 'postgresql':
+            db.session.execute(text(
+                f"SELECT setval(pg_get_serial_sequence('{table.name}', 'id'), "
+                f"(SELECT COALESCE(MAX(id), 1) FROM {table.name}))"
+            ))
+            db.session.commit()
+
+    def _moment(self, start_seconds=0):
+        """Data aleatória dentro da janela (a partir de start_seconds)"""
+        window = self.days * 86400
+        return self.rng.randint(start_seconds, window)
+
+    def _at(self, seconds):
+        return self.now - timedelta(seconds=self.days * 86400 - seconds)
+
+    # Geração
+    def run(self, clients, leads, interactions, tasks):
+        """Gera os volumes informados e retorna o relatório por tabela"""
+        from search import create_search_index, drop_search_index
+        from lead_rollups import lead_rollups
+
+        started = time.perf_counter()
+        self._create_users()
+
+        connection = db.session.connection()
+        drop_search_index(connection)
+        db.session.commit()
+        pragmas = self._fast_sqlite()
+        try:
+            self._load('clients', Client, self._client_rows(clients))
+            self._load('leads', Lead, self._lead_rows(leads))
+            self._load('interactions', Interaction, self._interaction_rows(interactions))
+            self._load('tasks', Task, self._task_rows(tasks))
+        finally:
+            self._restore_sqlite(pragmas)
+
+        self.progress('Reconstruindo índice de busca e totais diários...')
+        with db.engine.begin() as connection:
+            create_search_index(connection, rebuild=True)
+        lead_rollups.rebuild()
+
+        self.report['total_seconds'] = round(time.perf_counter() - started, 2)
+        return self.report
+
+    def _fast_sqlite(self):
+        """Carga sem fsync a cada commit no SQLite (valores originais para restaurar)"""
+        if db.session.get_bind().dialect.name != 'sqlite':
+            return None
+        connection = db.session.connection()
+        previous = connection.exec_driver_sql('PRAGMA synchronous').scalar()
+        connection.exec_driver_sql('PRAGMA synchronous = OFF')
+        return {'synchronous': previous}
+
+    def _restore_sqlite(self, pragmas):
+        if pragmas:
+            db.session.connection().exec_driver_sql(f"PRAGMA synchronous = {pragmas['synchronous']}")
+
+    def _create_users(self):
+        """Equipes e vendedores (vendedor001...) com a mesma senha; reaproveita os existentes"""
+        team = Team.query.filter_by(name='Equipe Sintética').first()
+        if team is None:
+            team = Team(name='Equipe Sintética', description='Usuários gerados para benchmarks')
+            db.session.add(team)
+            db.session.flush()
+
+        existing = {username: user_id for user_id, username in
+                    db.session.query(User.id, User.username).filter(User.username.like('vendedor%'))}
+        password_hash = generate_password_hash(SYNTHETIC_PASSWORD)
+        for number in range(1, self.users + 1):
+            username = f'vendedor{number:03d}'
+            if username in existing:
+                continue
+            first_name, last_name = self.rng.choice(FIRST_NAMES), self.rng.choice(LAST_NAMES)
+            user = User(username=username, email=f'{username}@crm-sintetico.com.br', first_name=first_name,
+                        last_name=last_name, role='vendedor', active=True, team_id=team.id)
+            user.password_hash = password_hash
+            db.session.add(user)
+        db.session.commit()
+
+        self.user_ids = [user_id for user_id, in db.session.query(User.id).filter(
+            User.username.in_([f'vendedor{number:03d}' for number in range(1, self.users + 1)])
+        )]
+        self.report['users'] = {'rows': len(self.user_ids)}
+
+    def _client_rows(self, total):
+        rng = self.rng
+        statuses, weights = _weighted([('ativo', 70), ('prospecto', 20), ('inativo', 10)])
+        next_id = self._next_id(Client)
+        for offset in range(total):
+            client_id = next_id + offset
+            city, state, zip_prefix = rng.choice(CITIES)
+            if rng.random() < 0.6:
+                name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)} {rng.choice(LAST_NAMES)}'
+                document, document_type = make_cpf(rng), 'CPF'
+                email = f'{_ascii_slug(name)}{client_id}@{rng.choice(EMAIL_DOMAINS)}'
+            else:
+                name = f'{rng.choice(LAST_NAMES)} {rng.choice(COMPANY_WORDS)} {rng.choice(COMPANY_SUFFIXES)}'
+                document, document_type = make_cnpj(rng), 'CNPJ'
+                email = f'contato{client_id}@{_ascii_slug(name.split()[0])}.com.br'
+            created_at = self._at(self._moment())
+            self.client_ids.append(client_id)
+            yield {
+                'id': client_id,
+                'name': name,
+                'email': email,
+                'phone': f'({rng.randint(11, 99)}) 9{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}',
+                'document': document,
+                'document_type': document_type,
+                'address': f'{rng.choice(STREETS)}, {rng.randint(1, 3000)}',
+                'city': city,
+                'state': state,
+                'zip_code': f'{zip_prefix}{rng.randint(100, 999)}-{rng.randint(0, 999):03d}',
+                'status': rng.choices(statuses, cum_weights=weights)[0],
+                'notes': None,
+                'created_at': created_at,
+                'updated_at': created_at
+            }
+
+    def _lead_rows(self, total):
+        rng = self.rng
+        statuses, status_weights = _weighted(LEAD_STATUSES)
+        priorities, priority_weights = _weighted(PRIORITIES)
+        next_id = self._next_id(Lead)
+        window = self.days * 86400
+        for offset in range(total):
+            lead_id = next_id + offset
+            client_id = rng.choice(self.client_ids) if self.client_ids and rng.random() < 0.9 else None
+            user_id = rng.choice(self.user_ids)
+            created = self._moment()
+            # Leads antigos tendem a estar encerrados
+            if created < window - 120 * 86400 and rng.random() < 0.7:
+                status = 'fechado' if rng.random() < 0.45 else 'perdido'
+            else:
+                status = rng.choices(statuses, cum_weights=status_weights)[0]
+            updated = min(created + rng.randint(0, 90 * 86400), window)
+            created_at, updated_at = self._at(created), self._at(updated)
+            title = f'{rng.choice(LEAD_KINDS)} {rng.choice(PRODUCTS)} #{lead_id}'
+
+            self.lead_ids.append(lead_id)
+            self.lead_clients.append(client_id or 0)
+            self.lead_users.append(user_id)
+            self.lead_created.append(created)
+            yield {
+                'id': lead_id,
+                'title': title,
+                'title_fingerprint': title_fingerprint(title),
+                'description': None,
+                'value': round(rng.lognormvariate(9, 1), 2),
+                'status': status,
+                'priority': rng.choices(priorities, cum_weights=priority_weights)[0],
+                'source': rng.choice(SOURCES),
+                'expected_close_date': (created_at + timedelta(days=rng.randint(7, 120))).date(),
+                'created_at': created_at,
+                'updated_at': updated_at,
+                'client_id': client_id,
+                'user_id': user_id
+            }
+
+    def _random_lead(self):
+        index = self.rng.randrange(len(self.lead_ids))
+        return (self.lead_ids[index], self.lead_clients[index] or None,
+                self.lead_users[index], self.lead_created[index])
+
+    def _interaction_rows(self, total):
+        rng = self.rng
+        next_id = self._next_id(Interaction)
+        window = self.days * 86400
+        for offset in range(total):
+            lead_id, client_id, user_id, created = self._random_lead()
+            kind = rng.choice(INTERACTION_TYPES)
+            subject = rng.choice(INTERACTION_SUBJECTS[kind])
+            yield {
+                'id': next_id + offset,
+                'type': kind,
+                'subject': subject,
+                'description': f'{subject} registrada pelo vendedor',
+                'date': self._at(min(created + rng.randint(0, 120 * 86400), window)),
+                'client_id': client_id,
+                'lead_id': lead_id,
+                'user_id': user_id
+            }
+
+    def _task_rows(self, total):
+        rng = self.rng
+        statuses, weights = _weighted(TASK_STATUSES)
+        priorities, priority_weights = _weighted(PRIORITIES)
+        next_id = self._next_id(Task)
+        for offset in range(total):
+            lead_id, client_id, user_id, created = self._random_lead()
+            created_at = self._at(created)
+            due_date = created_at + timedelta(days=rng.randint(1, 30), hours=rng.randint(8, 18))
+            status = rng.choices(statuses, cum_weights=weights)[0]
+            yield {
+                'id': next_id + offset,
+                'title': rng.choice(TASK_TITLES),
+                'description': None,
+                'due_date': due_date,
+                'status': status,
+                'priority': rng.choices(priorities, cum_weights=priority_weights)[0],
+                'created_at': created_at,
+                'completed_at': due_date if status == 'concluida' else None,
+                'user_id': user_id,
+                'lead_id': lead_id,
+                'client_id': client_id
+            }
@@ -0,0 +1,103 @@
+"""
+Fixtures dos testes
+Sistema CRM Profissional
+
+Cada teste recebe um app novo com um banco SQLite em arquivo temporário
+(criado com db.create_all(), que também cria o índice de busca), a fila de
+jobs fora do processo e os orçamentos de consultas em modo estrito: um
+orçamento excedido em qualquer requisição faz o teste falhar no final.
+
+O app não deixa um contexto aberto: cada requisição do cliente de teste tem
+o seu (como no servidor). Para acessar o banco direto use
+`with app.app_context():`.
+"""
+
+from contextlib import contextmanager
+import pytest
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'crm.db'}")
+    monkeypatch.setenv('JOBS_IN_PROCESS', 'false')
+    monkeypatch.setenv('QUERY_BUDGET_MODE', 'strict')
+    monkeypatch.delenv('DATABASE_READ_URL', raising=False)
+
+    from app import create_app
+    from database import db
+
+    from query_budget import query_budget
+
+    app = create_app()
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    with app.app_context():
+        db.create_all()
+    query_budget.violations.clear()
+
+    yield app
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+    # Orçamentos de consultas excedidos durante o teste fazem o teste falhar
+    query_budget.raise_violations()
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+@pytest.fixture
+def users(app):
+    """Um usuário de cada cargo: {'admin': id, 'gerente': id, 'vendedor': id}"""
+    from database import db
+    from models import User
+
+    ids = {}
+    with app.app_context():
+        for role in ('admin', 'gerente', 'vendedor'):
+            user = User(
+                username=role, email=f'{role}@crm.test', first_name=role.title(),
+                last_name='Teste', role=role, active=True
+            )
+            user.set_password('senha123')
+            db.session.add(user)
+            db.session.flush()
+            ids[role] = user.id
+        db.session.commit()
+    return ids
+
+
+@pytest.fixture
+def login(client):
+    """login(user_id): autentica o cliente de teste sem passar pelo formulário"""
+    def login_as(user_id):
+        with client.session_transaction() as session:
+            session['_user_id'] = str(user_id)
+            session['_fresh'] = True
+        return client
+    return login_as
+
+
+@contextmanager
+def count_queries():
+    """Lista dos comandos SQL executados dentro do bloco"""
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    event.listen(Engine, 'before_cursor_execute', record)
+    try:
+        yield statements
+    finally:
+        event.remove(Engine, 'before_cursor_execute', record)
+
+
+@pytest.fixture
+def queries():
+    """Context manager que coleta os comandos SQL executados (ver count_queries)"""
+    return count_queries
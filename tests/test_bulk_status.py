@@ -0,0 +1,73 @@
+"""
+Mudança de status em lote: resultados por lead e INSERTs em lote de verdade
+"""
+
+from datetime import datetime, timedelta
+from database import db
+from lead_functions import LeadManager
+from models import Client, Interaction, Lead, Task
+
+
+def seed_leads(users, count=30):
+    client = Client(name='Cliente Teste')
+    db.session.add(client)
+    db.session.flush()
+    now = datetime.utcnow()
+    ids = []
+    for index in range(count):
+        lead = Lead(
+            title=f'Lead {index}',
+            user_id=users['vendedor'],
+            client_id=client.id if index % 2 else None,
+            created_at=now - timedelta(days=index)
+        )
+        db.session.add(lead)
+        db.session.flush()
+        ids.append(lead.id)
+    db.session.commit()
+    return ids
+
+
+def inserts_into(statements, table):
+    return [statement for statement in statements if statement.startswith(f'INSERT INTO {table} ')]
+
+
+def test_bulk_status_results(app, users):
+    with app.app_context():
+        lead_ids = seed_leads(users, 4)
+        other = Lead(title='De outro vendedor', user_id=users['gerente'])
+        db.session.add(other)
+        db.session.commit()
+
+        result = LeadManager.bulk_update_lead_status(
+            lead_ids + [other.id, 999999], 'qualificado', users['vendedor'], owner_id=users['vendedor']
+        )
+        assert result['success']
+        assert result['updated'] == 4
+        errors = {item['id']: item.get('error') for item in result['results'] if not item['success']}
+        assert set(errors) == {other.id, 999999}
+        assert Lead.query.filter_by(status='qualificado').count() == 4
+        assert Interaction.query.count() == 4
+
+
+def test_interactions_inserted_with_one_statement(app, users, queries):
+    with app.app_context():
+        lead_ids = seed_leads(users, 30)
+        with queries() as statements:
+            result = LeadManager.bulk_update_lead_status(lead_ids, 'proposta', users['admin'])
+        assert result['updated'] == 30
+        # Metade dos leads sem cliente: client_id NULL não divide o executemany
+        assert len(inserts_into(statements, 'interactions')) == 1
+        assert Interaction.query.filter(Interaction.client_id.is_(None)).count() == 15
+
+
+def test_status_tasks_inserted_with_one_statement(app, users, queries):
+    with app.app_context():
+        lead_ids = seed_leads(users, 2)
+        for lead_id in lead_ids:
+            with queries() as statements:
+                created = LeadManager.create_status_tasks(db.session.get(Lead, lead_id), 'proposta', users['admin'])
+            assert created > 1
+            assert len(inserts_into(statements, 'tasks')) == 1
+        db.session.commit()
+        assert Task.query.filter(Task.client_id.is_(None)).count() == created
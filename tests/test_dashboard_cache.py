@@ -0,0 +1,42 @@
+"""
+Cache do dashboard: invalidação por escrita e corrida entre cálculo e invalidação
+"""
+
+from database import db
+from dashboard_cache import DashboardCache, dashboard_cache
+from models import Lead
+
+
+def test_write_invalidates_snapshot(app, users):
+    with app.app_context():
+        dashboard_cache.invalidate()
+        assert dashboard_cache.get()['total_leads'] == 0
+        assert dashboard_cache.get()['total_leads'] == 0  # acerto
+
+        db.session.add(Lead(title='Novo lead', user_id=users['vendedor']))
+        db.session.commit()
+
+        assert dashboard_cache.get()['total_leads'] == 1
+
+
+def test_snapshot_built_during_invalidation_is_not_stored(app, users, monkeypatch):
+    build = DashboardCache._build_snapshot
+    calls = []
+
+    def build_with_concurrent_write():
+        snapshot = build()
+        if not calls:
+            # Outra requisição grava um lead enquanto este snapshot era calculado
+            # (o commit invalida o cache pelos eventos da sessão)
+            db.session.add(Lead(title='Gravado durante o cálculo', user_id=users['vendedor']))
+            db.session.commit()
+        calls.append(snapshot)
+        return snapshot
+
+    monkeypatch.setattr(dashboard_cache, '_build_snapshot', build_with_concurrent_write)
+    with app.app_context():
+        dashboard_cache.invalidate()
+        assert dashboard_cache.get()['total_leads'] == 0  # quem pediu recebe o que foi calculado
+        assert dashboard_cache.get()['total_leads'] == 1  # mas ele não ficou no cache
+        assert dashboard_cache.get()['total_leads'] == 1
+        assert len(calls) == 2
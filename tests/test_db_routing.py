@@ -0,0 +1,114 @@
+"""
+Leituras na réplica: um segundo arquivo SQLite faz o papel de DATABASE_READ_URL
+"""
+
+from datetime import date, timedelta
+import pytest
+from sqlalchemy import func
+import db_routing
+from database import db
+from db_routing import REPLICA_BIND, read_replica
+from models import Lead
+from query_budget import query_budget
+
+
+@pytest.fixture
+def app(tmp_path, monkeypatch):
+    monkeypatch.setenv('DATABASE_URL', f"sqlite:///{tmp_path / 'principal.db'}")
+    monkeypatch.setenv('DATABASE_READ_URL', f"sqlite:///{tmp_path / 'replica.db'}")
+    monkeypatch.setenv('DATABASE_READ_CHECK_INTERVAL', '0')
+    monkeypatch.setenv('JOBS_IN_PROCESS', 'false')
+    monkeypatch.setenv('QUERY_BUDGET_MODE', 'strict')
+
+    from app import create_app
+
+    app = create_app()
+    app.config.update(TESTING=True, WTF_CSRF_ENABLED=False)
+    with app.app_context():
+        # Mesmo esquema nos dois arquivos; os dados diferem para sabermos de onde veio a leitura
+        for engine in db.engines.values():
+            db.metadata.create_all(engine)
+    query_budget.violations.clear()
+
+    yield app
+
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose()
+    # init_app registrou um metadata para o bind; os apps dos outros testes não têm réplica
+    db.metadatas.pop(REPLICA_BIND, None)
+    query_budget.raise_violations()
+
+
+@pytest.fixture
+def leads(app, users):
+    """Três leads no principal e um só na réplica (atrasada); todos com fechamento vencido"""
+    overdue = date.today() - timedelta(days=5)
+    with app.app_context():
+        for index in range(3):
+            db.session.add(Lead(title=f'Lead principal {index}', status='proposta', expected_close_date=overdue,
+                                user_id=users['vendedor']))
+        db.session.commit()
+        with db.engines[REPLICA_BIND].begin() as connection:
+            connection.execute(Lead.__table__.insert().values(
+                title='Lead réplica', status='proposta', expected_close_date=overdue, user_id=users['vendedor']
+            ))
+
+
+@read_replica.reads
+def count_leads():
+    return db.session.query(func.count(Lead.id)).scalar()
+
+
+def test_marked_reads_go_to_the_replica(app, leads):
+    with app.app_context():
+        assert count_leads() == 1
+        # Leituras fora de @read_replica.reads continuam no principal
+        assert db.session.query(func.count(Lead.id)).scalar() == 3
+
+
+def test_routes_read_from_the_replica(app, users, login, leads):
+    response = login(users['admin']).get('/api/leads/overdue')
+    assert response.status_code == 200
+    assert [lead['title'] for lead in response.get_json()['overdue_leads']] == ['Lead réplica']
+
+
+def test_reads_after_a_write_stay_on_primary(app, users, leads):
+    with app.app_context():
+        db.session.add(Lead(title='Novo', user_id=users['vendedor']))
+        db.session.flush()
+        # A transação lê o que escreveu, mesmo nas funções marcadas
+        assert count_leads() == 4
+        db.session.commit()
+        assert count_leads() == 1
+
+        db.session.execute(db.update(Lead).where(Lead.title == 'Novo').values(status='qualificado'))
+        assert count_leads() == 4
+        db.session.rollback()
+        assert count_leads() == 1
+
+
+def test_lagging_replica_falls_back_to_primary(app, leads, monkeypatch):
+    monkeypatch.setattr(db_routing, 'replica_lag', lambda connection: read_replica.max_lag + 1)
+    with app.app_context():
+        assert count_leads() == 3
+        assert read_replica.lag == read_replica.max_lag + 1
+
+        # Atraso de volta à tolerância: a próxima verificação devolve as leituras à réplica
+        monkeypatch.setattr(db_routing, 'replica_lag', lambda connection: 0.0)
+        assert count_leads() == 1
+
+
+def test_unreachable_replica_falls_back_to_primary(app, leads, tmp_path):
+    replica = tmp_path / 'replica.db'
+    with app.app_context():
+        db.engines[REPLICA_BIND].dispose()
+        # Um diretório no lugar do arquivo: o SQLite não consegue abrir a réplica
+        replica.rename(tmp_path / 'replica.bak')
+        replica.mkdir()
+        assert count_leads() == 3
+        assert read_replica.lag is None
+
+        replica.rmdir()
+        (tmp_path / 'replica.bak').rename(replica)
+        assert count_leads() == 1
@@ -0,0 +1,51 @@
+"""
+Detecção de leads duplicados: títulos equivalentes, parecidos e consulta indexada no PostgreSQL
+"""
+
+from sqlalchemy.dialects import postgresql
+from database import db
+from lead_functions import LeadManager, DEDUP_CANDIDATE_LIMIT
+from models import Client, Lead
+
+
+def test_equivalent_titles_of_same_client(app, users):
+    with app.app_context():
+        client = Client(name='ACME')
+        db.session.add(client)
+        db.session.flush()
+        db.session.add_all([
+            Lead(title='Licença Anual - ERP', client_id=client.id, user_id=users['vendedor']),
+            Lead(title='Licença anual ERP', user_id=users['vendedor']),
+        ])
+        db.session.commit()
+
+        duplicates = LeadManager.find_duplicate_leads('  licenca ANUAL erp ', client.id)
+        assert [lead['client_id'] for lead in duplicates] == [client.id]
+        assert duplicates[0]['score'] == 1.0
+
+        assert len(LeadManager.find_duplicate_leads('Licenca anual ERP')) == 1
+        assert LeadManager.find_duplicate_leads('Outro assunto', client.id) == []
+
+
+def test_similar_titles_are_capped(app, users):
+    with app.app_context():
+        for index in range(DEDUP_CANDIDATE_LIMIT + 3):
+            db.session.add(Lead(title=f'Implantação CRM filial {index}', user_id=users['vendedor']))
+        db.session.add(Lead(title='Consultoria tributária', user_id=users['vendedor']))
+        db.session.commit()
+
+        duplicates = LeadManager.find_duplicate_leads('Implantacao CRM filial', min_similarity=0.5)
+        assert len(duplicates) == DEDUP_CANDIDATE_LIMIT
+        assert all(lead['title'].startswith('Implantação') for lead in duplicates)
+        assert all(0.5 <= lead['score'] < 1 for lead in duplicates)
+
+
+def test_postgresql_query_uses_trigram_operator(app):
+    with app.app_context():
+        query = LeadManager._similar_titles_query('implantacao crm', Lead.client_id.is_(None), 5)
+        sql = str(query.statement.compile(dialect=postgresql.dialect()))
+
+    # % (indexável pelo GIN gin_trgm_ops) em vez de similarity(...) >= x, que não usa índice
+    assert 'leads.title_fingerprint %% %(title_fingerprint_1)s' in sql
+    assert 'similarity(leads.title_fingerprint' in sql.split('ORDER BY')[1]
+    assert 'LIMIT' in sql
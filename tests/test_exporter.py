@@ -0,0 +1,79 @@
+"""
+Exportação: acesso por cargo, fórmulas neutralizadas no CSV e XLSX válido
+"""
+
+import csv
+import io
+import zipfile
+from xml.etree import ElementTree
+from database import db
+from importer import ClientImporter
+from models import Client
+
+FORMULA = '=HYPERLINK("http://exemplo.com","clique")'
+
+
+def seed_clients():
+    db.session.add_all([
+        Client(name=FORMULA, phone='+55 11 99999-0000', notes='@SUM(A1:A2)'),
+        Client(name='Cliente\x01 com\x0b controle\x1f', notes='linha 1\nlinha 2\tfim'),
+        Client(name='-2+3', city='São Paulo')
+    ])
+    db.session.commit()
+
+
+def read_csv(data):
+    return list(csv.DictReader(io.StringIO(data.decode('utf-8-sig'))))
+
+
+def test_export_requires_manager(app, users, login):
+    response = login(users['vendedor']).get('/export/clients')
+    assert response.status_code == 403
+
+    response = login(users['gerente']).get('/export/clients')
+    assert response.status_code == 200
+
+
+def test_csv_neutralizes_formulas(app, users, login):
+    with app.app_context():
+        seed_clients()
+
+    rows = read_csv(login(users['admin']).get('/export/clients').data)
+    by_id = {row['id']: row for row in rows}
+    assert by_id['1']['name'] == "'" + FORMULA
+    assert by_id['1']['phone'] == "'+55 11 99999-0000"
+    assert by_id['1']['notes'] == "'@SUM(A1:A2)"
+    assert by_id['3']['name'] == "'-2+3"
+    assert by_id['3']['city'] == 'São Paulo'
+
+
+def test_csv_round_trip_restores_values(app, users, login):
+    with app.app_context():
+        seed_clients()
+    data = login(users['admin']).get('/export/clients').data.decode('utf-8-sig')
+
+    with app.app_context():
+        Client.query.delete()
+        db.session.commit()
+        report = ClientImporter().run(io.StringIO(data))
+        assert report['inserted'] == 3
+        names = {client.name for client in Client.query}
+        assert FORMULA in names and '-2+3' in names
+        assert Client.query.filter_by(name='-2+3').one().city == 'São Paulo'
+
+
+def test_xlsx_drops_xml_control_characters(app, users, login):
+    with app.app_context():
+        seed_clients()
+
+    response = login(users['admin']).get('/export/clients?format=xlsx')
+    assert response.status_code == 200
+    with zipfile.ZipFile(io.BytesIO(response.data)) as archive:
+        assert archive.testzip() is None
+        sheet = ElementTree.fromstring(archive.read('xl/worksheets/sheet1.xml'))
+
+    namespace = {'x': 'http://schemas.openxmlformats.org/spreadsheetml/2006/main'}
+    texts = [node.text for node in sheet.iterfind('.//x:t', namespace)]
+    assert 'Cliente com controle' in texts
+    assert 'linha 1\nlinha 2\tfim' in texts
+    assert FORMULA in texts
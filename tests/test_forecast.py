@@ -0,0 +1,32 @@
+"""
+Previsão de receita: probabilidades por status zeradas pelo administrador
+"""
+
+from datetime import date, timedelta
+from database import db
+from lead_functions import DEFAULT_STAGE_PROBABILITIES, LeadManager
+from models import Lead, StageProbability
+
+
+def test_forecast_without_positive_probabilities_is_empty(app, users, login, queries):
+    with app.app_context():
+        db.session.add(Lead(title='Proposta', status='proposta', value=1000, user_id=users['vendedor'],
+                            expected_close_date=date.today() + timedelta(days=10)))
+        for status in DEFAULT_STAGE_PROBABILITIES:
+            db.session.add(StageProbability(status=status, probability=0))
+        db.session.commit()
+
+        with queries() as statements:
+            result = LeadManager.forecast_revenue(months=3)
+        assert result['success'], result.get('error')
+        assert result['forecast']['total_forecast'] == 0
+        assert result['forecast']['leads_count'] == 0
+        assert result['forecast']['months'] == [] and result['forecast']['details'] == []
+        # Só a leitura das probabilidades: nenhuma consulta de leads
+        assert not any('FROM leads' in statement for statement in statements)
+        assert list(LeadManager.iter_forecast_leads(months=3)) == []
+
+    http = login(users['gerente'])
+    assert http.get('/api/leads/forecast?months=3').get_json()['forecast']['details'] == []
+    response = http.get('/api/leads/forecast?months=3', headers={'Accept': 'application/x-ndjson'})
+    assert response.status_code == 200 and response.get_data() == b''
@@ -0,0 +1,80 @@
+"""
+Importação CSV: lotes com um INSERT cada e arquivo de rejeitados por importação
+"""
+
+import io
+import os
+from database import db
+from importer import ClientImporter, LeadImporter
+from models import Client, Lead
+
+
+def clients_csv(rows):
+    lines = ['name,email,phone,document,document_type,city,status']
+    for index in range(rows):
+        # Campos opcionais preenchidos ou vazios em combinações diferentes
+        email = f'cliente{index}@exemplo.com.br' if index % 2 else ''
+        phone = f'1199999{index:04d}' if index % 3 else ''
+        city = 'São Paulo' if index % 5 else ''
+        lines.append(f'Cliente {index},{email},{phone},,,{city},')
+    lines.append(',sem-nome@exemplo.com.br,,,,,')  # rejeitada
+    return '\n'.join(lines) + '\n'
+
+
+def test_client_import_batches(app, queries):
+    with app.app_context():
+        rejects = io.StringIO()
+        with queries() as statements:
+            report = ClientImporter(rejects=rejects, batch_size=1000).run(io.StringIO(clients_csv(2000)))
+
+        assert report['inserted'] == 2000
+        assert report['rejected'] == 1
+        assert Client.query.count() == 2000
+        assert Client.query.filter(Client.email.is_(None)).count() == 1000
+        inserts = [statement for statement in statements if statement.startswith('INSERT INTO clients ')]
+        assert len(inserts) == 2
+        assert 'line,error' in rejects.getvalue().splitlines()[0]
+
+
+def test_lead_import_batches(app, users, queries):
+    with app.app_context():
+        db.session.add(Client(name='Cliente', document='123.456.789-09'))
+        db.session.commit()
+        lines = ['title,value,expected_close_date,client_document,user']
+        for index in range(500):
+            value = f'{index}.50' if index % 2 else ''
+            close = '2030-01-15' if index % 3 else ''
+            document = '12345678909' if index % 4 else ''
+            lines.append(f'Lead {index},{value},{close},{document},vendedor')
+        with queries() as statements:
+            report = LeadImporter(default_user_id=users['admin']).run(io.StringIO('\n'.join(lines) + '\n'))
+
+        assert report['inserted'] == 500
+        assert Lead.query.filter(Lead.user_id == users['vendedor']).count() == 500
+        assert Lead.query.filter(Lead.title_fingerprint.is_(None)).count() == 0
+        inserts = [statement for statement in statements if statement.startswith('INSERT INTO leads ')]
+        assert len(inserts) == 1
+
+
+def test_import_route_keeps_rejects_of_each_import(app, users, login):
+    client = login(users['gerente'])
+    names = []
+    for _ in range(2):
+        response = client.post('/import/clients', data={
+            'file': (io.BytesIO(clients_csv(3).encode()), 'clientes.csv')
+        })
+        assert response.status_code == 200
+        assert response.json['rejected'] == 1
+        names.append(response.json['rejects_file'].rsplit('/', 1)[-1])
+
+    assert names[0] != names[1]
+    for name in names:
+        assert os.path.exists(os.path.join(app.instance_path, 'imports', name))
+        assert client.get(f'/import/rejects/{name}').status_code == 200
+
+
+def test_import_route_requires_manager(app, users, login):
+    response = login(users['vendedor']).post('/import/clients', data={
+        'file': (io.BytesIO(clients_csv(3).encode()), 'clientes.csv')
+    })
+    assert response.status_code == 403
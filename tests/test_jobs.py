@@ -0,0 +1,138 @@
+"""
+Fila de jobs: idempotência, repetição com espera exponencial, retomada de jobs
+presos e limpeza dos jobs antigos
+"""
+
+from datetime import datetime, timedelta
+import pytest
+from database import db
+from jobs import PURGE_BATCH_SIZE, job_queue
+from lead_functions import LeadManager
+from models import Job, Task
+
+
+@pytest.fixture
+def flaky_handler():
+    """Handler `teste_falha` que sempre falha; registra as chamadas"""
+    calls = []
+
+    def handler(payload):
+        calls.append(payload)
+        raise RuntimeError('serviço indisponível')
+
+    job_queue.handler('teste_falha')(handler)
+    yield calls
+    job_queue._handlers.pop('teste_falha', None)
+
+
+def make_due(job_id):
+    db.session.execute(db.update(Job).where(Job.id == job_id).values(run_at=datetime.utcnow() - timedelta(seconds=1)))
+    db.session.commit()
+
+
+def test_duplicate_key_is_ignored(app):
+    with app.app_context():
+        job_queue.enqueue('teste', {'ordem': 1}, key='evento:1')
+        job_queue.enqueue_many('teste', [({'ordem': 2}, 'evento:1'), ({'ordem': 3}, 'evento:2'), ({}, None)])
+        db.session.commit()
+        job_queue.enqueue('teste', {'ordem': 4}, key='evento:2')
+        db.session.commit()
+
+        jobs = Job.query.order_by(Job.id).all()
+        assert [(job.idempotency_key, job.payload) for job in jobs] == [
+            ('evento:1', '{"ordem": 1}'), ('evento:2', '{"ordem": 3}'), (None, '{}')
+        ]
+
+
+def test_failing_job_is_retried_with_backoff_then_failed(app, flaky_handler):
+    with app.app_context():
+        job_queue.enqueue('teste_falha', {'lead_id': 1})
+        db.session.commit()
+        job_id = Job.query.one().id
+
+        for attempt in range(1, job_queue.max_attempts):
+            started = datetime.utcnow()
+            assert job_queue.run_pending() == 1
+            job = db.session.get(Job, job_id)
+            assert (job.status, job.attempts, job.lock_token) == ('pendente', attempt, None)
+            assert 'serviço indisponível' in job.last_error
+            delay = (job.run_at - started).total_seconds()
+            assert job_queue.retry_delay_for(attempt) <= delay < job_queue.retry_delay_for(attempt) + 5
+            # Ainda não venceu: fica fora do próximo lote
+            assert job_queue.run_pending() == 0
+            make_due(job_id)
+
+        assert job_queue.run_pending() == 1
+        job = db.session.get(Job, job_id)
+        assert (job.status, job.attempts) == ('falhou', job_queue.max_attempts)
+        assert job.finished_at is not None
+        assert len(flaky_handler) == job_queue.max_attempts
+        assert job_queue.retry_delay_for(2) == 2 * job_queue.retry_delay_for(1)
+
+
+def test_stale_lock_is_reclaimed_and_applied_once(app, users):
+    with app.app_context():
+        result = LeadManager.create_lead_with_validation({'title': 'Lead novo'}, users['vendedor'])
+        lead_id = result['lead'].id
+
+        # Um processo reserva o job e para antes de executá-lo
+        stale, = job_queue.claim()
+        assert job_queue.claim() == []
+        db.session.execute(db.update(Job).values(
+            locked_at=datetime.utcnow() - timedelta(seconds=job_queue.lock_timeout + 1)
+        ))
+        db.session.commit()
+
+        # Outro processo retoma o job preso
+        assert job_queue.run_pending() == 1
+        # O processo antigo volta: o resultado dele é descartado
+        assert job_queue.execute(stale) is None
+
+        job = Job.query.one()
+        assert (job.status, job.attempts) == ('concluido', 1)
+        assert Task.query.filter_by(lead_id=lead_id).count() == 1
+
+
+def test_lead_created_job_creates_one_followup_task(app, users):
+    with app.app_context():
+        result = LeadManager.create_lead_with_validation({'title': 'Implantação'}, users['vendedor'])
+        lead_id = result['lead'].id
+        assert Task.query.count() == 0
+
+        assert job_queue.run_pending() == 1
+        assert job_queue.run_pending() == 0
+        tasks = Task.query.filter_by(lead_id=lead_id).all()
+        assert [(task.title, task.user_id, task.status) for task in tasks] == [
+            ('Follow-up: Implantação', users['vendedor'], 'pendente')
+        ]
+
+
+def test_finished_jobs_are_purged_after_retention(app):
+    old = datetime.utcnow() - timedelta(days=job_queue.retention_days + 1)
+    recent = datetime.utcnow() - timedelta(hours=1)
+    with app.app_context():
+        rows = [Job(name='teste', status='concluido', run_at=old, finished_at=old)
+                for _ in range(PURGE_BATCH_SIZE + 5)]
+        rows += [
+            Job(name='teste', status='falhou', run_at=old, finished_at=old, idempotency_key='antigo'),
+            # Repetido por dias: terminou há pouco
+            Job(name='teste', status='falhou', run_at=old, finished_at=recent),
+            Job(name='teste', status='concluido', run_at=recent, finished_at=recent),
+            Job(name='teste', status='pendente', run_at=old)
+        ]
+        db.session.add_all(rows)
+        db.session.commit()
+
+        assert job_queue.purge_finished() == PURGE_BATCH_SIZE + 6
+        assert sorted((job.status, job.finished_at is not None) for job in Job.query) == [
+            ('concluido', True), ('falhou', True), ('pendente', False)
+        ]
+        # A chave apagada pode ser usada de novo
+        job_queue.enqueue('teste', key='antigo')
+        db.session.commit()
+        assert Job.query.filter_by(idempotency_key='antigo').count() == 1
+
+        # Uma limpeza por intervalo em cada processo
+        job_queue._purged_at = None
+        assert job_queue.run(once=True) == 2
+        assert job_queue._purged_at is not None
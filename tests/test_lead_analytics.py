@@ -0,0 +1,159 @@
+"""
+LeadManager.get_lead_analytics: número de consultas e paridade com a
+implementação anterior (uma consulta por métrica, direto na tabela leads)
+"""
+
+import random
+from datetime import datetime, timedelta
+import pytest
+from sqlalchemy import func
+from database import db
+from lead_functions import LeadManager
+from lead_rollups import lead_rollups
+from models import Lead, User
+
+STATUSES = ['novo', 'qualificado', 'proposta', 'negociacao', 'fechado', 'perdido']
+
+
+def legacy_lead_analytics(user_id=None, period_days=30):
+    """Implementação original de get_lead_analytics (oito consultas, SQLite)"""
+    date_filter = datetime.now() - timedelta(days=period_days)
+
+    query = Lead.query.filter(Lead.created_at >= date_filter)
+    if user_id:
+        query = query.filter(Lead.user_id == user_id)
+
+    total_leads = query.count()
+
+    leads_by_status = db.session.query(Lead.status, func.count(Lead.id)).filter(Lead.created_at >= date_filter)
+    if user_id:
+        leads_by_status = leads_by_status.filter(Lead.user_id == user_id)
+    leads_by_status = leads_by_status.group_by(Lead.status).all()
+
+    fechados = query.filter(Lead.status == 'fechado').count()
+    perdidos = query.filter(Lead.status == 'perdido').count()
+    conversion_rate = (fechados / total_leads * 100) if total_leads > 0 else 0
+    loss_rate = (perdidos / total_leads * 100) if total_leads > 0 else 0
+
+    total_value = db.session.query(func.sum(Lead.value)).filter(
+        Lead.created_at >= date_filter,
+        Lead.status.in_(['novo', 'qualificado', 'proposta', 'negociacao'])
+    )
+    if user_id:
+        total_value = total_value.filter(Lead.user_id == user_id)
+    total_value = total_value.scalar() or 0
+
+    closed_value = db.session.query(func.sum(Lead.value)).filter(
+        Lead.created_at >= date_filter, Lead.status == 'fechado'
+    )
+    if user_id:
+        closed_value = closed_value.filter(Lead.user_id == user_id)
+    closed_value = closed_value.scalar() or 0
+
+    avg_conversion_time = db.session.query(
+        func.avg(func.julianday(Lead.updated_at) - func.julianday(Lead.created_at))
+    ).filter(Lead.created_at >= date_filter, Lead.status == 'fechado')
+    if user_id:
+        avg_conversion_time = avg_conversion_time.filter(Lead.user_id == user_id)
+    avg_conversion_time = avg_conversion_time.scalar() or 0
+
+    top_users = db.session.query(
+        User.first_name, User.last_name,
+        func.count(Lead.id).label('leads_count'),
+        func.sum(Lead.value).label('total_value')
+    ).join(Lead).filter(
+        Lead.created_at >= date_filter, Lead.status == 'fechado'
+    ).group_by(User.id).order_by(func.sum(Lead.value).desc()).limit(5).all()
+
+    return {
+        'total_leads': total_leads,
+        'leads_by_status': {status: count for status, count in leads_by_status},
+        'conversion_rate': round(conversion_rate, 2),
+        'loss_rate': round(loss_rate, 2),
+        'total_value': float(total_value),
+        'closed_value': float(closed_value),
+        'avg_conversion_days': round(avg_conversion_time, 1),
+        'top_performers': [
+            {'name': f"{user.first_name} {user.last_name}", 'leads': user.leads_count, 'value': float(user.total_value or 0)}
+            for user in top_users
+        ]
+    }
+
+
+def assert_same_analytics(user_id, period_days):
+    result = LeadManager.get_lead_analytics(user_id, period_days)
+    assert result['success'], result.get('error')
+    current = result['analytics']
+    expected = legacy_lead_analytics(user_id, period_days)
+
+    assert current['avg_conversion_days'] == pytest.approx(expected.pop('avg_conversion_days'), abs=0.1)
+    current.pop('avg_conversion_days')
+    assert current == expected
+
+
+@pytest.fixture
+def seeded(app, users):
+    """Leads dos últimos 90 dias (três vendedores) com os totais diários construídos"""
+    rng = random.Random(7)
+    with app.app_context():
+        sellers = [users['vendedor'], users['gerente'], users['admin']]
+        now = datetime.utcnow()
+        for index in range(600):
+            created_at = now - timedelta(days=rng.uniform(0, 90))
+            status = rng.choice(STATUSES)
+            db.session.add(Lead(
+                title=f'Lead {index}',
+                status=status,
+                value=None if index % 17 == 0 else round(rng.uniform(100, 50000), 2),
+                user_id=rng.choice(sellers),
+                created_at=created_at,
+                updated_at=created_at + timedelta(hours=rng.uniform(0, 24 * 40))
+            ))
+        db.session.commit()
+        lead_rollups.rebuild()
+    return users
+
+
+@pytest.mark.parametrize('period_days', [7, 30, 90, 365])
+def test_matches_legacy_results(app, seeded, period_days):
+    with app.app_context():
+        assert_same_analytics(None, period_days)
+        assert_same_analytics(seeded['vendedor'], period_days)
+
+
+def test_matches_legacy_after_status_changes(app, seeded):
+    with app.app_context():
+        old_leads = [lead_id for lead_id, in db.session.query(Lead.id).filter(
+            Lead.created_at < datetime.utcnow() - timedelta(days=3), Lead.status != 'fechado'
+        ).limit(40)]
+        lead = db.session.get(Lead, old_leads[0])
+        lead.status = 'fechado'
+        db.session.commit()
+        result = LeadManager.bulk_update_lead_status(old_leads[1:], 'perdido', seeded['admin'])
+        assert result['success'], result.get('error')
+
+        assert_same_analytics(None, 30)
+        assert_same_analytics(None, 90)
+
+
+def test_query_count(app, seeded, queries):
+    with app.app_context():
+        LeadManager.get_lead_analytics(None, 90)  # consolida os dias pendentes
+        db.session.commit()
+
+        with queries() as statements:
+            assert LeadManager.get_lead_analytics(None, 90)['success']
+        # Último dia consolidado, métricas por status e top performers
+        assert len(statements) == 3
+
+        with queries() as statements:
+            legacy_lead_analytics(None, 90)
+        assert len(statements) == 8
+
+
+def test_empty_period(app, users):
+    with app.app_context():
+        result = LeadManager.get_lead_analytics(None, 30)
+        assert result['success']
+        assert result['analytics']['total_leads'] == 0
+        assert result['analytics']['top_performers'] == []
@@ -0,0 +1,102 @@
+"""
+Totais diários: recálculo em lote dos dias alterados e consolidação pela fila de jobs
+"""
+
+from datetime import datetime, timedelta
+from sqlalchemy import event
+from database import db
+from jobs import job_queue
+from lead_functions import LeadManager
+from lead_rollups import ROLLUP_NAME, lead_rollups
+from models import Job, Lead, LeadDailyStat, RollupState
+
+
+def stats_rows():
+    return sorted(
+        (str(row.day), row.user_id, row.status, row.leads_count, row.value_sum, round(row.duration_days_sum or 0, 6))
+        for row in LeadDailyStat.query
+    )
+
+
+def seed_old_leads(users, count=86):
+    now = datetime.utcnow()
+    for index in range(count):
+        # Dias alternados: nenhuma sequência de dias consecutivos
+        db.session.add(Lead(
+            title=f'Lead {index}', value=100 + index, user_id=users['vendedor'],
+            created_at=now - timedelta(days=2 * index + 1, hours=1)
+        ))
+    db.session.commit()
+    lead_rollups.rebuild()
+    return [lead_id for lead_id, in db.session.query(Lead.id)]
+
+
+def test_bulk_refresh_uses_one_delete_and_one_insert(app, users, queries):
+    with app.app_context():
+        lead_ids = seed_old_leads(users)
+        with queries() as statements:
+            result = LeadManager.bulk_update_lead_status(lead_ids, 'fechado', users['admin'])
+        assert result['updated'] == 86
+
+        rollup_statements = [statement for statement in statements if 'lead_daily_stats' in statement]
+        assert len(rollup_statements) == 2
+        assert rollup_statements[0].startswith('DELETE FROM lead_daily_stats WHERE lead_daily_stats.day IN')
+        assert rollup_statements[1].startswith('INSERT INTO lead_daily_stats')
+
+        refreshed = stats_rows()
+        lead_rollups.rebuild()
+        assert refreshed == stats_rows()
+        assert sum(row[3] for row in refreshed if row[2] == 'fechado') == 86
+
+
+def test_orm_change_refreshes_its_day(app, users):
+    with app.app_context():
+        lead_ids = seed_old_leads(users, 5)
+        lead = db.session.get(Lead, lead_ids[2])
+        lead.status = 'perdido'
+        lead.created_at = lead.created_at - timedelta(days=30)
+        db.session.commit()
+
+        refreshed = stats_rows()
+        lead_rollups.rebuild()
+        assert refreshed == stats_rows()
+
+
+def test_open_days_are_not_materialized(app, users):
+    with app.app_context():
+        lead_rollups.rebuild()
+        assert lead_rollups.refresh_days({datetime.utcnow().date()}) == 0
+        assert lead_rollups.refresh_days({None}) == 0
+
+
+def test_analytics_schedules_the_catch_up_without_writing(app, users):
+    with app.app_context():
+        seed_old_leads(users, 10)
+        expected = LeadManager.get_lead_analytics(period_days=30)
+        state = db.session.get(RollupState, ROLLUP_NAME)
+        state.closed_through -= timedelta(days=3)
+        db.session.commit()
+        behind = state.closed_through
+
+        # A análise não confirma a sessão do chamador: o job vai numa transação própria
+        commits = []
+        record = commits.append
+        event.listen(db.session, 'after_commit', record)
+        try:
+            for _ in range(2):
+                assert LeadManager.get_lead_analytics(period_days=30) == expected
+        finally:
+            event.remove(db.session, 'after_commit', record)
+        assert commits == []
+        assert lead_rollups.closed_through() == behind
+
+        jobs = Job.query.filter_by(name='rollup_catch_up').all()
+        assert [job.idempotency_key for job in jobs] == [f'rollup:{lead_rollups.closing_day().isoformat()}']
+
+        assert job_queue.run_pending() == 1
+        assert lead_rollups.closed_through() == lead_rollups.closing_day()
+        refreshed = stats_rows()
+        lead_rollups.rebuild()
+        assert refreshed == stats_rows()
+        assert LeadManager.get_lead_analytics(period_days=30) == expected
+        assert Job.query.filter_by(name='rollup_catch_up').count() == 1
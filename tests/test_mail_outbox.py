@@ -0,0 +1,174 @@
+"""
+Fila de e-mails contra um servidor SMTP local (aiosmtpd): lotes, repetição, falha permanente e queda de conexão
+"""
+
+import socket
+from datetime import datetime, timedelta
+import pytest
+from aiosmtpd.controller import Controller
+from database import db
+from mail_outbox import mail_outbox
+from models import OutboxEmail
+
+
+class RecordingHandler:
+    """
+    Servidor SMTP de teste: aceita e registra as mensagens
+
+    Destinatários temporario@ recebem 451, recusado@ recebem 550 e queda@
+    derrubam a conexão no DATA.
+    """
+
+    def __init__(self):
+        self.sessions = set()
+        self.messages = []
+
+    async def handle_RCPT(self, server, session, envelope, address, rcpt_options):
+        if address.startswith('temporario@'):
+            return '451 4.3.0 Caixa ocupada, tente mais tarde'
+        if address.startswith('recusado@'):
+            return '550 5.1.1 Caixa inexistente'
+        envelope.rcpt_tos.append(address)
+        return '250 OK'
+
+    async def handle_DATA(self, server, session, envelope):
+        if any(address.startswith('queda@') for address in envelope.rcpt_tos):
+            server.transport.close()
+            return '421 4.4.2 Conexão encerrada'
+        self.sessions.add(id(session))
+        self.messages.extend(envelope.rcpt_tos)
+        return '250 Mensagem aceita'
+
+
+def free_port():
+    with socket.socket() as probe:
+        probe.bind(('127.0.0.1', 0))
+        return probe.getsockname()[1]
+
+
+@pytest.fixture
+def smtp_server(monkeypatch):
+    handler = RecordingHandler()
+    controller = Controller(handler, hostname='127.0.0.1', port=free_port())
+    controller.start()
+    monkeypatch.setenv('MAIL_SERVER', controller.hostname)
+    monkeypatch.setenv('MAIL_PORT', str(controller.port))
+    monkeypatch.setenv('MAIL_USE_TLS', 'false')
+    monkeypatch.setenv('MAIL_DEFAULT_SENDER', 'crm@exemplo.com.br')
+    monkeypatch.delenv('MAIL_USERNAME', raising=False)
+    monkeypatch.delenv('MAIL_PASSWORD', raising=False)
+    yield handler
+    controller.stop()
+
+
+@pytest.fixture
+def app(smtp_server, app):
+    # O servidor SMTP sobe antes: create_app lê MAIL_SERVER/MAIL_PORT do ambiente
+    return app
+
+
+def enqueue(*recipients):
+    emails = [mail_outbox.enqueue(recipient, f'Assunto {index}', body='Olá')
+              for index, recipient in enumerate(recipients)]
+    db.session.commit()
+    return [email.id for email in emails]
+
+
+def statuses(ids):
+    return [db.session.get(OutboxEmail, email_id).status for email_id in ids]
+
+
+def test_batch_is_sent_over_one_connection(app, smtp_server):
+    with app.app_context():
+        ids = enqueue(*[f'cliente{index}@exemplo.com.br' for index in range(5)])
+        connections = mail_outbox.connections
+
+        assert mail_outbox.send_batch() == 5
+        assert statuses(ids) == ['enviado'] * 5
+
+    assert len(smtp_server.messages) == 5
+    assert len(smtp_server.sessions) == 1
+    assert mail_outbox.connections == connections + 1
+
+
+def test_temporary_failure_is_retried_with_backoff(app, smtp_server):
+    with app.app_context():
+        email_id, = enqueue('temporario@exemplo.com.br')
+
+        started = datetime.utcnow()
+        mail_outbox.send_batch()
+        email = db.session.get(OutboxEmail, email_id)
+        assert (email.status, email.attempts) == ('pendente', 1)
+        assert '451' in email.last_error
+        delay = (email.next_attempt_at - started).total_seconds()
+        assert mail_outbox.retry_delay <= delay < mail_outbox.retry_delay + 5
+
+        # Ainda não venceu: fica fora do próximo lote
+        assert mail_outbox.send_batch() == 0
+
+        email.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        db.session.commit()
+        started = datetime.utcnow()
+        assert mail_outbox.send_batch() == 1
+        email = db.session.get(OutboxEmail, email_id)
+        assert (email.status, email.attempts) == ('pendente', 2)
+        delay = (email.next_attempt_at - started).total_seconds()
+        assert 2 * mail_outbox.retry_delay <= delay < 2 * mail_outbox.retry_delay + 5
+
+
+def test_permanent_failure_does_not_stop_the_batch(app, smtp_server):
+    with app.app_context():
+        ids = enqueue('cliente@exemplo.com.br', 'recusado@exemplo.com.br', 'outro@exemplo.com.br')
+
+        assert mail_outbox.send_batch() == 3
+        assert statuses(ids) == ['enviado', 'falhou', 'enviado']
+        failed = db.session.get(OutboxEmail, ids[1])
+        assert failed.attempts == 1 and '550' in failed.last_error
+
+    assert smtp_server.messages == ['cliente@exemplo.com.br', 'outro@exemplo.com.br']
+    assert len(smtp_server.sessions) == 1
+
+
+def test_dropped_connection_releases_the_rest_of_the_batch(app, smtp_server):
+    with app.app_context():
+        ids = enqueue('cliente@exemplo.com.br', 'queda@exemplo.com.br', 'outro@exemplo.com.br')
+
+        assert mail_outbox.send_batch() == 3
+        assert statuses(ids) == ['enviado', 'pendente', 'pendente']
+        dropped, untried = (db.session.get(OutboxEmail, email_id) for email_id in ids[1:])
+        # O e-mail em envio conta como tentativa; o seguinte volta à fila sem tentativa
+        assert dropped.attempts == 1 and dropped.last_error
+        assert untried.attempts == 0 and untried.lock_token is None
+
+        dropped.next_attempt_at = untried.next_attempt_at = datetime.utcnow() - timedelta(seconds=1)
+        dropped.recipients = 'cliente2@exemplo.com.br'
+        db.session.commit()
+        assert mail_outbox.send_batch() == 2
+        assert statuses(ids) == ['enviado'] * 3
+
+    assert smtp_server.messages == ['cliente@exemplo.com.br', 'cliente2@exemplo.com.br', 'outro@exemplo.com.br']
+
+
+def test_queue_depth_metrics(app, client):
+    with app.app_context():
+        ids = enqueue('a@exemplo.com.br', 'b@exemplo.com.br', 'c@exemplo.com.br')
+        oldest = db.session.get(OutboxEmail, ids[0])
+        oldest.created_at = datetime.utcnow() - timedelta(minutes=10)
+        db.session.get(OutboxEmail, ids[1]).status = 'enviando'
+        db.session.get(OutboxEmail, ids[2]).status = 'pendente'
+        db.session.add(OutboxEmail(recipients='d@exemplo.com.br', subject='Enviado', status='enviado'))
+        db.session.commit()
+
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'crm_outbox_depth{status="pendente"} 2.0' in body
+    assert 'crm_outbox_depth{status="enviando"} 1.0' in body
+    age = next(float(line.split()[-1]) for line in body.splitlines()
+               if line.startswith('crm_outbox_oldest_pending_age_seconds '))
+    assert 600 <= age < 660
+
+    with app.app_context():
+        OutboxEmail.query.filter(OutboxEmail.status != 'enviado').update({'status': 'enviado'})
+        db.session.commit()
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'crm_outbox_depth{status="pendente"} 0.0' in body
+    assert 'crm_outbox_oldest_pending_age_seconds 0.0' in body
@@ -0,0 +1,29 @@
+"""
+/metrics: token obrigatório fora do modo debug
+"""
+
+from metrics import metrics
+
+
+def test_metrics_closed_in_production_without_token(app, client):
+    app.config['TESTING'] = False
+    response = client.get('/metrics')
+    assert response.status_code == 401
+    assert 'METRICS_TOKEN' in response.get_data(as_text=True)
+
+    # benchmark e check-query-plans chamam a rota no próprio processo
+    app.config['METRICS_OPEN_ACCESS'] = True
+    assert client.get('/metrics').status_code == 200
+    app.config['METRICS_OPEN_ACCESS'] = False
+
+    app.debug = True
+    assert client.get('/metrics').status_code == 200
+
+
+def test_metrics_token_is_required(app, client, monkeypatch):
+    monkeypatch.setattr(metrics, 'token', 'segredo')
+    assert client.get('/metrics').status_code == 401
+    assert client.get('/metrics', headers={'Authorization': 'Bearer errado'}).status_code == 401
+    response = client.get('/metrics', headers={'Authorization': 'Bearer segredo'})
+    assert response.status_code == 200
+    assert 'crm_http_request_duration_seconds' in response.get_data(as_text=True)
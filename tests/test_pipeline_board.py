@@ -0,0 +1,54 @@
+"""
+Quadro do pipeline: colunas limitadas, lidas pelo índice (status, created_at, id)
+"""
+
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from database import db
+from lead_functions import LeadManager, PIPELINE_STATUSES
+from models import Lead
+
+
+def seed_leads(users):
+    now = datetime.utcnow()
+    for index in range(120):
+        db.session.add(Lead(
+            title=f'Lead {index}',
+            status=PIPELINE_STATUSES[index % 5],
+            value=index,
+            user_id=users['vendedor'] if index % 3 else users['gerente'],
+            created_at=now - timedelta(hours=index)
+        ))
+    db.session.commit()
+
+
+def test_board_columns(app, users):
+    with app.app_context():
+        seed_leads(users)
+        for user_id in (None, users['vendedor']):
+            result = LeadManager.get_pipeline_board(limit=4, user_id=user_id)
+            assert result['success'], result.get('error')
+
+            for status in PIPELINE_STATUSES:
+                query = Lead.query.filter(Lead.status == status)
+                if user_id:
+                    query = query.filter(Lead.user_id == user_id)
+                expected = query.order_by(Lead.created_at.desc(), Lead.id.desc()).all()
+
+                column = result['pipeline'][status]
+                assert column['count'] == len(expected)
+                assert [card['id'] for card in column['leads']] == [lead.id for lead in expected[:4]]
+                assert bool(column['next_cursor']) == (len(expected) > 4)
+
+
+def test_board_reads_columns_from_index(app, users):
+    with app.app_context():
+        seed_leads(users)
+        db.session.execute(text('ANALYZE'))
+        top_ids = LeadManager._pipeline_top_ids(10)
+        query = Lead.query.join(top_ids, top_ids.c.id == Lead.id).order_by(Lead.created_at.desc())
+        sql = str(query.statement.compile(db.engine, compile_kwargs={'literal_binds': True}))
+        plan = [row[3] for row in db.session.execute(text(f'EXPLAIN QUERY PLAN {sql}'))]
+
+        assert not [step for step in plan if step.startswith('SCAN leads')], plan
+        assert sum('ix_leads_status_created_at' in step for step in plan) == len(PIPELINE_STATUSES)
@@ -0,0 +1,110 @@
+"""
+Planos de execução: as consultas reais das rotas e do LeadManager usam índices
+"""
+
+from datetime import datetime, timedelta
+from types import SimpleNamespace
+from sqlalchemy.dialects import postgresql
+from database import db
+from lead_rollups import lead_rollups
+from models import Client, Lead, Task
+from query_plans import QueryPlanCheck, explain, find_full_scans
+from search import search_leads
+
+
+def seed(users):
+    now = datetime.utcnow()
+    clients = [Client(name=f'Cliente Silva {index}', status='ativo') for index in range(5)]
+    db.session.add_all(clients)
+    db.session.flush()
+    for index, status in enumerate(['novo', 'qualificado', 'proposta', 'negociacao', 'fechado', 'perdido'] * 5):
+        db.session.add(Lead(
+            title=f'Proposta de software {index}', status=status, value=1000 + index,
+            client_id=clients[index % 5].id, user_id=users['vendedor'],
+            expected_close_date=(now + timedelta(days=index * 7 - 60)).date(),
+            created_at=now - timedelta(days=index * 12, hours=3)
+        ))
+        db.session.add(Task(title=f'Tarefa {index}', status='pendente', client_id=clients[index % 5].id,
+                            user_id=users['vendedor'], due_date=now + timedelta(days=index - 10)))
+    db.session.commit()
+    lead_rollups.rebuild()
+
+
+def plan(app, sql, parameters=()):
+    with app.app_context():
+        with db.engine.connect() as connection:
+            return explain(connection, sql, parameters)
+
+
+def test_hot_queries_use_indexes(app, users):
+    with app.app_context():
+        seed(users)
+
+    results = QueryPlanCheck(app).run()
+    # Todo cenário executou o código real (e chegou ao banco)
+    assert all(result['queries'] for result in results.values())
+    assert {name: [query['sql'] for query in result['failures']]
+            for name, result in results.items() if result['failures']} == {}
+    assert {name: result['missing_indexes'] for name, result in results.items() if result['missing_indexes']} == {}
+    assert find_full_scans(app) == {}
+
+
+def test_analytics_union_reads_only_open_days(app, users):
+    with app.app_context():
+        seed(users)
+
+    result = QueryPlanCheck(app).run()['analytics']
+    union = next(query for query in result['queries'] if 'UNION ALL' in query['sql'])
+    assert any(line.startswith('SEARCH lead_daily_stats') for line in union['plan'])
+    assert not any(line.startswith('SCAN leads') for line in union['plan'])
+
+
+def test_full_index_scan_is_a_failure(app):
+    lines, scans = plan(app, 'SELECT status, count(id) FROM leads GROUP BY status')
+    assert lines[0].startswith('SCAN leads USING') and 'INDEX' in lines[0]
+    assert scans == ['leads']
+
+    lines, scans = plan(app, 'SELECT id FROM clients WHERE notes = ?', ('x',))
+    assert scans == ['clients']
+
+    # Sem índice para a ordenação, o LIMIT não limita a leitura
+    lines, scans = plan(app, 'SELECT id FROM clients ORDER BY notes LIMIT 20')
+    assert scans == ['clients']
+
+
+def test_bounded_scans_are_not_failures(app):
+    # Em ordem de índice, a leitura para no LIMIT
+    lines, scans = plan(app, 'SELECT id FROM leads ORDER BY created_at DESC LIMIT 20')
+    assert lines == ['SCAN leads USING COVERING INDEX ix_leads_created_at'] and scans == []
+
+    lines, scans = plan(app, 'SELECT id FROM leads WHERE status = ? AND created_at >= ?', ('novo', '2026-01-01'))
+    assert scans == []
+
+
+def test_lead_search_reads_each_index(app, users):
+    with app.app_context():
+        seed(users)
+
+    results = QueryPlanCheck(app).run()
+    for name in ('leads: busca', 'leads: busca por cliente'):
+        assert results[name]['missing_indexes'] == []
+        assert any('leads_fts' in line for query in results[name]['queries'] for line in query['plan'])
+
+    # Um índice que o plano não usa é falha
+    check = QueryPlanCheck(app)
+    with app.app_context():
+        check._load_sample()
+    scenario = next(scenario for scenario in check.scenarios() if scenario.name == 'leads: busca')
+    scenario.indexes = {'sqlite': ('ix_inexistente',)}
+    assert check.check(scenario)['missing_indexes'] == ['ix_inexistente']
+
+
+def test_postgresql_lead_search_is_a_union_of_indexed_selects(app, monkeypatch):
+    dialect = postgresql.dialect()
+    with app.app_context():
+        monkeypatch.setattr(db.session, 'get_bind', lambda *args, **kwargs: SimpleNamespace(dialect=dialect))
+        sql = str(search_leads(Lead.query, 'silva').statement.compile(dialect=dialect))
+
+    # Sem OR entre os ramos: cada SELECT usa o seu índice de trigramas
+    assert ' UNION ' in sql and ' OR ' not in sql
+    assert 'ILIKE' in sql.split(' UNION ')[0] and 'JOIN clients' in sql.split(' UNION ')[1]
@@ -0,0 +1,223 @@
+"""
+Registro dos modelos de tarefas automáticas do workflow de leads
+Sistema CRM Profissional
+
+Os modelos vêm da tabela task_templates ou, se ela estiver vazia, de um
+arquivo JSON (TASK_TEMPLATES_FILE) ou dos modelos padrão abaixo. São
+compilados uma vez e reaproveitados; cada processo verifica periodicamente
+(TASK_TEMPLATES_CHECK_INTERVAL) se a origem mudou e recarrega sem precisar
+reiniciar os workers.
+"""
+
+import json
+import os
+import threading
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta
+from sqlalchemy import func
+from database import db
+from models import TaskTemplate
+
+# Modelos padrão (usados enquanto a tabela task_templates estiver vazia)
+DEFAULT_TASK_TEMPLATES = {
+    'qualificado': [
+        {
+            'title': 'Qualificar necessidades: {title}',
+            'description': 'Identificar necessidades específicas do cliente',
+            'days': 2,
+            'priority': 'alta'
+        },
+        {
+            'title': 'Análise de orçamento: {title}',
+            'description': 'Verificar orçamento disponível do cliente',
+            'days': 3,
+            'priority': 'media'
+        }
+    ],
+    'proposta': [
+        {
+            'title': 'Elaborar proposta: {title}',
+            'description': 'Criar proposta comercial detalhada',
+            'days': 3,
+            'priority': 'alta'
+        },
+        {
+            'title': 'Enviar proposta: {title}',
+            'description': 'Enviar proposta para o cliente',
+            'days': 5,
+            'priority': 'alta'
+        },
+        {
+            'title': 'Follow-up proposta: {title}',
+            'description': 'Verificar se cliente recebeu e analisar proposta',
+            'days': 7,
+            'priority': 'media'
+        }
+    ],
+    'negociacao': [
+        {
+            'title': 'Negociar condições: {title}',
+            'description': 'Negociar preços, prazos e condições comerciais',
+            'days': 2,
+            'priority': 'alta'
+        }
+    ],
+    'fechado': [
+        {
+            'title': 'Onboarding cliente: {title}',
+            'description': 'Processo de integração do novo cliente',
+            'days': 1,
+            'priority': 'alta'
+        },
+        {
+            'title': 'Follow-up satisfação: {title}',
+            'description': 'Verificar satisfação do cliente após fechamento',
+            'days': 7,
+            'priority': 'media'
+        }
+    ]
+}
+
+# Modelo compilado: prazo já convertido em timedelta
+CompiledTemplate = namedtuple('CompiledTemplate', 'title description delta priority')
+
+
+def compile_templates(definitions):
+    """Valida e compila {status: [definições]} em {status: (CompiledTemplate, ...)}"""
+    compiled = {}
+    for status, templates in definitions.items():
+        items = []
+        for template in templates:
+            title = template['title']
+            # Falha na carga (e não na mudança de status) se o título for inválido
+            title.format(title='')
+            items.append(CompiledTemplate(
+                title=title,
+                description=template.get('description') or '',
+                delta=timedelta(days=int(template.get('days', 1))),
+                priority=template.get('priority') or 'media'
+            ))
+        compiled[status] = tuple(items)
+    return compiled
+
+
+class TaskTemplateRegistry:
+    """Modelos de tarefas por status, compilados e recarregados sob demanda"""
+
+    def __init__(self, app=None):
+        self.check_interval = 30
+        self.templates_file = None
+        self.source = None
+        self._lock = threading.Lock()
+        self._compiled = None
+        self._version = None
+        self._checked_at = 0
+        self.reloads = 0
+        if app is not None:
+            self.init_app(app)
+
+    def init_app(self, app):
+        self.check_interval = app.config.get('TASK_TEMPLATES_CHECK_INTERVAL', 30)
+        self.templates_file = app.config.get('TASK_TEMPLATES_FILE')
+        app.extensions['task_templates'] = self
+
+    def get(self, status):
+        """Modelos compilados do status (tupla vazia se não houver)"""
+        return self.all().get(status, ())
+
+    def all(self):
+        """Todos os modelos compilados, recarregando se a origem mudou"""
+        now = time.monotonic()
+        if self._compiled is not None and now - self._checked_at < self.check_interval:
+            return self._compiled
+
+        with self._lock:
+            if self._compiled is None or now - self._checked_at >= self.check_interval:
+                version = self._current_version()
+                if self._compiled is None or version != self._version:
+                    self._load(version)
+                self._checked_at = now
+        return self._compiled
+
+    def reload(self):
+        """Força a recarga dos modelos no processo atual"""
+        with self._lock:
+            self._load(self._current_version())
+            self._checked_at = time.monotonic()
+        return self._compiled
+
+    def _current_version(self):
+        """Marcador barato de versão da origem (tabela ou arquivo)"""
+        count, last_update = db.session.query(
+            func.count(TaskTemplate.id), func.max(TaskTemplate.updated_at)
+        ).one()
+        if count:
+            return ('table', count, last_update)
+        if self.templates_file and os.path.exists(self.templates_file):
+            return ('file', os.path.getmtime(self.templates_file))
+        return ('default',)
+
+    def _load(self, version):
+        source = version[0]
+        if source == 'table':
+            definitions = {}
+            rows = TaskTemplate.query.filter_by(active=True).order_by(
+                TaskTemplate.status, TaskTemplate.position, TaskTemplate.id
+            ).all()
+            for row in rows:
+                definitions.setdefault(row.status, []).append({
+                    'title': row.title,
+                    'description': row.description,
+                    'days': row.days,
+                    'priority': row.priority
+                })
+        elif source == 'file':
+            with open(self.templates_file, encoding='utf-8') as handle:
+                definitions = json.load(handle)
+        else:
+            definitions = DEFAULT_TASK_TEMPLATES
+
+        self._compiled = compile_templates(definitions)
+        self._version = version
+        self.source = source
+        self.reloads += 1
+
+    def build_rows(self, lead, status, user_id, now=None):
+        """Linhas (dicts) das tarefas do status para um lead, prontas para insert em lote"""
+        now = now or datetime.now()
+        return [
+            {
+                'title': template.title.format(title=lead.title),
+                'description': template.description,
+                'due_date': now + template.delta,
+                'status': 'pendente',
+                'priority': template.priority,
+                'user_id': user_id,
+                'lead_id': lead.id,
+                'client_id': lead.client_id
+            } for template in self.get(status)
+        ]
+
+
+def seed_task_templates(definitions=None):
+    """Grava os modelos (padrão ou informados) na tabela task_templates"""
+    definitions = definitions or DEFAULT_TASK_TEMPLATES
+    rows = [
+        TaskTemplate(
+            status=status,
+            title=template['title'],
+            description=template.get('description'),
+            days=template.get('days', 1),
+            priority=template.get('priority', 'media'),
+            position=position
+        )
+        for status, templates in definitions.items()
+        for position, template in enumerate(templates)
+    ]
+    db.session.add_all(rows)
+    db.session.commit()
+    return len(rows)
+
+
+task_templates = TaskTemplateRegistry()
@@ -0,0 +1,30 @@
+"""
+Ponto de entrada WSGI para produção
+Sistema CRM Profissional
+
+gunicorn (Linux/Mac):   gunicorn -c gunicorn.conf.py wsgi:app
+waitress (Windows):     python wsgi.py
+
+Este módulo não cria tabelas nem usuários: rode `flask init-db` uma vez por
+deploy, antes de subir os workers. Processos, threads e preload vêm de
+variáveis de ambiente (ver gunicorn.conf.py e .env.example).
+"""
+
+import os
+from app import app
+
+
+def serve_waitress():
+    """Servidor multi-thread em um único processo (waitress)"""
+    from waitress import serve
+    
+    serve(
+        app,
+        host=os.environ.get('HOST', '0.0.0.0'),
+        port=int(os.environ.get('PORT', 8000)),
+        threads=int(os.environ.get('WEB_THREADS', 8))
+    )
+
+
+if __name__ == '__main__':
+    serve_waitress()